@@ -1,6 +1,9 @@
 import agentgraph
 from agentgraph.core.graph import VarMap
 from agentgraph.core.llmmodel import LLMModel
+from agentgraph.core.llmpool import LLMModelPool
+from agentgraph.core.mockmodel import MockLLMModel, mock_tool_call
+from agentgraph.core.modelrouter import ModelRouter, ModelTier, TieredRouter
 from agentgraph.core.conversation import Conversation
 from agentgraph.core.prompts import Prompts
 from agentgraph.core.msgseq import create_tool_response
@@ -1,9 +1,49 @@
-MAX_WINDOW_SIZE = 64
-# Maximum number of outstanding tasks per scheduler
+MAX_WINDOW_SIZE = 0
+# Maximum number of outstanding tasks per scheduler, or 0 for no
+# limit.  Submitting more tasks blocks the submitter until the window
+# drains.
+
+ADAPTIVE_WINDOW = False
+# If set, schedulers adapt their window to task latency and memory
+# use, starting from MAX_WINDOW_SIZE (or MIN_WINDOW_SIZE if it is 0).
+
+MIN_WINDOW_SIZE = 8
+# Smallest window the adaptive controller shrinks to.  It is also the
+# step by which the window grows.
+
+ADAPTIVE_MAX_WINDOW_SIZE = 1024
+# Largest window the adaptive controller grows to.
+
+WINDOW_MEMORY_LIMIT = None
+# Resident set size in bytes above which adaptive windows shrink.
+# None for no limit.
+
+WINDOW_LATENCY_FACTOR = 2.0
+# Adaptive windows shrink when mean task latency exceeds this
+# multiple of the baseline latency.
+
+EARLY_COMPLETION = True
+# If set, nested tasks forward each output and release each heap
+# reference to their parent as soon as none of their remaining child
+# tasks can write it, rather than when all child tasks finish.
 
 DEBUG_PATH = "./debug"
 # Debug path.  None if debugging is not enabled.
 
+DEBUG_CACHE = "log"
+# Memoization store used under DEBUG_PATH.  Either "log" (append-only
+# log with an in-memory index) or "sqlite".
+
+CACHE_LRU_MAX_ENTRIES = 4096
+# Maximum number of responses kept in each model's in-memory cache.
+
+CACHE_LRU_MAX_BYTES = 64 * 1024 * 1024
+# Maximum encoded size of the requests and responses kept in each
+# model's in-memory cache.
+
+TOKEN_COUNT_CACHE_SIZE = 65536
+# Number of message strings whose token counts each model memoizes.
+
 VERBOSE = 1
 # Verbosity level.  Prints out messages sent to scheduler.
 
@@ -12,3 +52,40 @@ TIMING = 1
 
 THREAD_POOL_DEFAULT_SIZE = 20
 # Thread pool default size
+
+EVENT_LOOP_COUNT = 1
+# Number of event loop threads in an engine.  LLM agents and async
+# Python agents are spread across them, so raise this when a single
+# loop saturates a core handling many concurrent streams.
+
+EVENT_LOOP = "asyncio"
+# Event loop implementation for engines: "asyncio", "uvloop", or
+# "auto" for uvloop when it is installed and asyncio otherwise.  May
+# also be a function that returns a new event loop.
+
+THREAD_POOL_MAX_SIZE = 256
+# Hard cap on thread pool workers.  While workers block waiting on
+# other tasks, the pool starts compensating workers up to this many.
+# Pools larger than this never grow.
+
+PROCESS_POOL_DEFAULT_SIZE = None
+# Number of worker processes for Python agents run with useProcess.
+# None for one per CPU.
+
+PROCESS_START_METHOD = "spawn"
+# How worker processes are started.  "fork" is unsafe since the
+# engine runs several threads.
+
+PROCESS_SHARED_MEMORY_MIN_SIZE = 64 * 1024
+# str and bytes values at least this long are passed to and from
+# worker processes through shared memory instead of being pickled.
+
+LLM_MAX_RETRIES = 6
+# Number of times a failed LLM request is retried.
+
+LLM_BACKOFF_BASE = 0.5
+# Base delay in seconds for exponential backoff on rate limit, server
+# and connection errors.
+
+LLM_BACKOFF_MAX = 60
+# Maximum backoff delay in seconds.
@@ -4,7 +4,22 @@ from agentgraph.core.msgseq import MsgSeq
 class ConversationReader:
     def __init__(self, conv: 'Conversation'):
         self._system = conv._system
-        self._msgs = conv._msgs.copy()
+        # Shares the list until the Conversation is written again
+        self._msgs = conv._msgs
+        conv._shared = True
+
+    def size_msgs(self) -> int:
+        return len(self._msgs)
+
+    def get_msgs(self, index: int):
+        return self._msgs[index]
+
+    def exec(self, varMaps: dict):
+        l = list()
+        if self._system is not None:
+            l.append({"role": "system", "content": self._system})
+        l.extend(self._msgs)
+        return l
 
 class Conversation(Mutable, MsgSeq):
     def __init__(self, system = None, prompt = None, owner = None):
@@ -12,6 +27,8 @@ class Conversation(Mutable, MsgSeq):
         super(Mutable, self).__init__()
         self._system = system
         self._msgs = []
+        # Whether a snapshot shares self._msgs
+        self._shared = False
         if prompt is not None:
             self._msgs.push({"role": "user", "content": prompt})
 
@@ -19,6 +36,7 @@ class Conversation(Mutable, MsgSeq):
         self.wait_for_access()
         self._system = None
         self._msgs = []
+        self._shared = False
         for msg in conv:
             sender = msg["role"]
             if sender == "system":
@@ -29,10 +47,16 @@ class Conversation(Mutable, MsgSeq):
     def copy_state(self, conv):
         self._system = conv._system
         self._msgs = conv._msgs.copy()
+        self._shared = False
 
     def _snapshot(self) -> ConversationReader:
         return ConversationReader(self)
 
+    def _copy_on_write(self):
+        if self._shared:
+            self._msgs = self._msgs.copy()
+            self._shared = False
+
     def size_msgs(self) -> int:
         self.wait_for_access()
         return len(self._msgs)
@@ -43,11 +67,13 @@ class Conversation(Mutable, MsgSeq):
 
     def pop(self, n: int):
         self.wait_for_access()
+        self._copy_on_write()
         for l in range(n):
             self._msgs.pop()
 
     def push(self, text: str):
         self.wait_for_access()
+        self._copy_on_write()
         if len(self._msgs) == 0:
             self._msgs.append({"role": "user", "content": text})
         else:
@@ -62,6 +88,7 @@ class Conversation(Mutable, MsgSeq):
 
     def push_item(self, item):
         self.wait_for_access()
+        self._copy_on_write()
         self._msgs.append(item)
 
     def exec(self, varMaps:dict):
@@ -1,8 +1,10 @@
 import asyncio
+import inspect
 import json
+import pickle
 import traceback
 import threading
-from typing import Any, Callable, Dict, List, Optional, Set, Union
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
 
 from agentgraph.core.conversation import Conversation
 from agentgraph.data.filestore import FileStore
@@ -43,11 +45,15 @@ class GraphNode:
         return []
 
 class GraphVarWait(GraphNode):
-    def __init__(self, readList: list, condVar: threading.Condition):
+    def __init__(self, readList: list, condVar: Optional[threading.Condition], future: Optional[asyncio.Future] = None):
+        """Waits for the values of the Vars in readList.  Waiters
+        either wait on condVar or await future."""
+        
         super().__init__()
         self._readList = readList
         self._valMap : Dict[Var, Any] = dict()
         self._condVar = condVar
+        self._future = future
         self._done = False
 
     def set_done(self):
@@ -74,6 +80,13 @@ class GraphVarWait(GraphNode):
         for v in self._readList:
             self[v] = varMap[v]
 
+        future = self._future
+        if future is not None:
+            self.set_done()
+            # The waiter may be on another event loop
+            future.get_loop().call_soon_threadsafe(_resolve_future, future)
+            return dict()
+
         with self._condVar:
             # Set our done flag
             self.set_done()
@@ -82,6 +95,10 @@ class GraphVarWait(GraphNode):
 
         return dict()
             
+def _resolve_future(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
 class GraphNested(GraphNode):
     """Nested CFG Node."""
     
@@ -247,7 +264,7 @@ def handle_calls(calls: list, handlers: dict, varMap: dict):
 class GraphPythonAgent(GraphNested):
     """Run some action.  This is a Python Agent."""
     
-    def __init__(self, pythonFunc, pos: Optional[list], kw: Optional[dict], out: Optional[list]):
+    def __init__(self, pythonFunc, pos: Optional[list], kw: Optional[dict], out: Optional[list], useProcess: bool = False):
         """inVars is a map from names to Var objects that provide
         values for those variables.  The python function will be
         passed a dict that maps these names to values.
@@ -256,6 +273,10 @@ class GraphPythonAgent(GraphNested):
         names to values.  The out mapping maps those names to the
         Variables whose values should be updated with the values
         returned by the Python function.
+
+        If useProcess is set, the python function runs in a worker
+        process.  If pythonFunc is an async function, it runs as a
+        coroutine on the engine's event loop.
         """
         
         super().__init__(None)
@@ -263,6 +284,16 @@ class GraphPythonAgent(GraphNested):
         self.pos = pos if pos is not None else []
         self.kw = kw if kw is not None else {}
         self.out = out if out is not None else []
+        self.useProcess = useProcess
+        self.isAsync = inspect.iscoroutinefunction(pythonFunc)
+        assert not (useProcess and self.isAsync), 'Async Python agents cannot run in a worker process'
+        if useProcess:
+            # Functions pickle by name, so this is cheap, and fails
+            # for lambdas and nested functions the worker cannot find
+            try:
+                pickle.dumps(pythonFunc)
+            except Exception as e:
+                raise TypeError(f'Python agents run with useProcess must be picklable: {e}') from e
 
     def _get_read_set(self) -> list:
         return list(self.kw.values()) + self.pos
@@ -270,116 +301,104 @@ class GraphPythonAgent(GraphNested):
     def get_write_vars(self) -> list:
         return self.out
 
-    def execute(self, scheduler: 'agentgraph.exec.scheduler.Scheduler', varMap: dict) -> dict:
-        """Execute Python Agent.  Takes as input the scheduler object
-        for the python agent task (in case it generates child tasks)
-        and the varMap which maps Vars to the values to be used when
-        executing the python agent."""
+    @staticmethod
+    def _read_only_value(ro: 'agentgraph.core.mutable.ReadOnly', varMap: dict, snapshots: Optional[dict]):
+        """Returns what a task sees for a ReadOnly argument: the
+        snapshot taken for it when the task started, if there is one,
+        and otherwise a read only proxy of the mutable."""
+
+        m = ro.get_mutable()
+        mutable = varMap[m] if isinstance(m, agentgraph.core.var.Var) else m
+        if snapshots is not None and id(mutable) in snapshots:
+            return snapshots[id(mutable)]
+        proxy = mutable._get_read_only_proxy()
+        assert isinstance(proxy, agentgraph.core.mutable.ReadOnlyProxy), \
+            '_get_read_only_proxy() must return an instance of ReadOnlyProxy'
+        assert proxy._mutable == mutable, 'ReadOnlyProxy._mutable must be the original mutable'
+        return proxy
+
+    @staticmethod
+    def _arg_value(o, varMap: dict, snapshots: Optional[dict]):
+        """Returns the value passed to the python function for the
+        argument o."""
+
+        if isinstance(o, agentgraph.core.vardict.VarDict):
+            newdict = dict()
+            for key, value in o.items():
+                if isinstance(value, agentgraph.core.var.Var):
+                    newdict[key] = varMap[value]
+                elif isinstance(value, agentgraph.core.mutable.ReadOnly):
+                    newdict[key] = GraphPythonAgent._read_only_value(value, varMap, snapshots)
+                else:
+                    newdict[key] = value
+            return newdict
+        elif isinstance(o, agentgraph.core.varset.VarSet):
+            news = set()
+            for v in o:
+                if isinstance(v, agentgraph.core.var.Var):
+                    news.add(varMap[v])
+                elif isinstance(v, agentgraph.core.mutable.ReadOnly):
+                    news.add(GraphPythonAgent._read_only_value(v, varMap, snapshots))
+                else:
+                    news.add(v)
+            return news
+        elif isinstance(o, agentgraph.core.var.Var):
+            return varMap[o]
+        elif isinstance(o, agentgraph.core.mutable.ReadOnly):
+            return GraphPythonAgent._read_only_value(o, varMap, snapshots)
+        return o
+
+    def _get_args(self, varMap: dict, snapshots: Optional[dict]) -> Tuple[list, dict]:
+        """Returns the positional and keyword arguments to pass to the
+        python function."""
 
         # Build positional variables
-        posList : List[Any] = list()
-        for o in self.pos:
-            if isinstance(o, agentgraph.core.vardict.VarDict):
-                newdict = dict()
-                for key, value in o.items():
-                    if isinstance(value, agentgraph.core.var.Var):
-                        newdict[key] = varMap[value]
-                    elif isinstance(value, agentgraph.core.mutable.ReadOnly):
-                        m = value.get_mutable()
-                        mutable = varMap[m] if isinstance(m, agentgraph.core.var.Var) else m
-                        proxy = mutable._get_read_only_proxy()
-                        assert isinstance(proxy, agentgraph.core.mutable.ReadOnlyProxy), \
-                            '_get_read_only_proxy() must return an instance of ReadOnlyProxy'
-                        assert proxy._mutable == mutable, 'ReadOnlyProxy._mutable must be the original mutable'
-                        newdict[key] = proxy
-                    else:
-                        newdict[key] = value
-
-                posList.append(newdict)
-            elif isinstance(o, agentgraph.core.varset.VarSet):
-                news = set()
-                for v in o:
-                    if isinstance(v, agentgraph.core.var.Var):
-                        news.add(varMap[v])
-                    elif isinstance(v, agentgraph.core.mutable.ReadOnly):
-                        m = v.get_mutable()
-                        mutable = varMap[m] if isinstance(m, agentgraph.core.var.Var) else m
-                        proxy = mutable._get_read_only_proxy()
-                        assert isinstance(proxy, agentgraph.core.mutable.ReadOnlyProxy), \
-                            '_get_read_only_proxy() must return an instance of ReadOnlyProxy'
-                        assert proxy._mutable == mutable, 'ReadOnlyProxy._mutable must be the original mutable'
-                        news.add(proxy)
-                    else:
-                        news.add(v)
-                    
-                posList.append(news)
-            elif isinstance(o, agentgraph.core.var.Var):
-                posList.append(varMap[o])
-            elif isinstance(o, agentgraph.core.mutable.ReadOnly):
-                m = o.get_mutable()
-                mutable = varMap[m] if isinstance(m, agentgraph.core.var.Var) else m
-                proxy = mutable._get_read_only_proxy()
-                assert isinstance(proxy, agentgraph.core.mutable.ReadOnlyProxy), \
-                    '_get_read_only_proxy() must return an instance of ReadOnlyProxy'
-                assert proxy._mutable == mutable, 'ReadOnlyProxy._mutable must be the original mutable'
-                posList.append(proxy)
-            else:
-                posList.append(o)
+        posList : List[Any] = [self._arg_value(o, varMap, snapshots) for o in self.pos]
         
         # First, compose dictionary for inVars (str -> Var) and varMap
         # (Var -> Value) to generate inMap (str -> Value)
-        
         inMap : Dict[str, Any] = dict()
-        for name, o in self.kw:
-            if isinstance(o, agentgraph.core.vardict.VarDict):
-                newdict = dict()
-                for key, value in o.items():
-                    if isinstance(value, agentgraph.core.var.Var):
-                        newdict[key] = varMap[value]
-                    elif isinstance(value, agentgraph.core.mutable.ReadOnly):
-                        m = value.get_mutable()
-                        mutable = varMap[m] if isinstance(m, agentgraph.core.var.Var) else m
-                        proxy = mutable._get_read_only_proxy()
-                        assert isinstance(proxy, agentgraph.core.mutable.ReadOnlyProxy), \
-                            '_get_read_only_proxy() must return an instance of ReadOnlyProxy'
-                        assert proxy._mutable == mutable, 'ReadOnlyProxy._mutable must be the original mutable'
-                        newdict[key] = proxy
-                    else:
-                        newdict[key] = value
-
-                inMap[name] = newdict
-            elif isinstance(o, agentgraph.core.varset.VarSet):
-                news = set()
-                for v in o:
-                    if isinstance(v, agentgraph.core.var.Var):
-                        news.add(varMap[v])
-                    elif isinstance(v, agentgraph.core.mutable.ReadOnly):
-                        m = v.get_mutable()
-                        mutable = varMap[m] if isinstance(m, agentgraph.core.var.Var) else m
-                        proxy = mutable._get_read_only_proxy()
-                        assert isinstance(proxy, agentgraph.core.mutable.ReadOnlyProxy), \
-                            '_get_read_only_proxy() must return an instance of ReadOnlyProxy'
-                        assert proxy._mutable == mutable, 'ReadOnlyProxy._mutable must be the original mutable'
-                        news.add(proxy)
-                    else:
-                        news.add(v)
-                    
-                inMap[name] = news
-            elif isinstance(o, agentgraph.core.var.Var):
-                inMap[name] = varMap[o]
-            elif isinstance(o, agentgraph.core.mutable.ReadOnly):
-                m = o.get_mutable()
-                mutable = varMap[m] if isinstance(m, agentgraph.core.var.Var) else m
-                proxy = mutable._get_read_only_proxy()
-                assert isinstance(proxy, agentgraph.core.mutable.ReadOnlyProxy), \
-                    '_get_read_only_proxy() must return an instance of ReadOnlyProxy'
-                assert proxy._mutable == mutable, 'ReadOnlyProxy._mutable must be the original mutable'
-                inMap[name] = proxy
-            else:
-                inMap[name] = o
+        for name, o in self.kw.items():
+            inMap[name] = self._arg_value(o, varMap, snapshots)
+        return posList, inMap
+
+    def execute(self, scheduler: 'agentgraph.exec.scheduler.Scheduler', varMap: dict, snapshots: Optional[dict] = None) -> dict:
+        """Execute Python Agent.  Takes as input the scheduler object
+        for the python agent task (in case it generates child tasks)
+        and the varMap which maps Vars to the values to be used when
+        executing the python agent.  snapshots maps the ids of
+        mutables to the snapshots to pass for ReadOnly arguments."""
+
+        posList, inMap = self._get_args(varMap, snapshots)
                 
         # Next, actually call the formatFunc to generate the prompt
         retval = self.pythonFunc(scheduler, *posList, **inMap)
+        return self._get_out_map(scheduler.read_variable, retval)
+
+    async def execute_async(self, scheduler: 'agentgraph.exec.scheduler.Scheduler', varMap: dict, snapshots: Optional[dict] = None) -> dict:
+        """Execute an async Python Agent on the event loop.  Same
+        arguments as execute.  Vars the python function returns are
+        read without blocking the event loop."""
+
+        posList, inMap = self._get_args(varMap, snapshots)
+        retval = await self.pythonFunc(scheduler, *posList, **inMap)
+
+        values: Dict[Var, Any] = dict()
+        for index in range(len(self.out)):
+            val = retval[index]
+            if isinstance(val, VarDict):
+                val = val.values()
+            elif not isinstance(val, VarSet):
+                val = [val]
+            for v in val:
+                if isinstance(v, Var) and v not in values:
+                    values[v] = await scheduler.read_variable_async(v)
+        return self._get_out_map(values.__getitem__, retval)
+
+    def _get_out_map(self, read: Optional[Callable], retval) -> dict:
+        """Maps our output Vars to the values in retval, which the
+        python function returned.  Any Vars it returned are read with
+        read."""
 
         # Construct outMap (Var -> Object) from outVars (name -> Var)
         # and omap (name -> Value)
@@ -390,19 +409,19 @@ class GraphPythonAgent(GraphNested):
             assert not isinstance(val, agentgraph.core.mutable.ReadOnlyProxy), \
                 'Cannot return an instance of ReadOnlyProxy from a Python agent'
             if isinstance(val, Var):
-                newval = scheduler.read_variable(val)
+                newval = read(val)
             elif isinstance(val, VarSet):
                 newval = set()
                 for v in val:
                     if isinstance(v, Var):
-                        newval.add(scheduler.read_variable(v))
+                        newval.add(read(v))
                     else:
                         newval.add(v)
             elif isinstance(val, VarDict):
                 newval = dict()
-                for k, v in val:
+                for k, v in val.items():
                     if isinstance(v, Var):
-                        newval[k] = scheduler.read_variable(v)
+                        newval[k] = read(v)
                     else:
                         newval[k] = v
             else:
@@ -501,16 +520,17 @@ def create_llm_agent(outVar: Var, msg: Optional[MsgSeq] = None, conversation: Un
     llmAgent = GraphLLMAgent(outVar, conversation, model, msg, formatFunc, callVar, tools, pos, kw, llmopts)
     return GraphPair(llmAgent, llmAgent)
 
-def create_python_agent(pythonFunc, pos: Optional[list] = None, kw: Optional[dict] = None, out: Optional[list] = None) -> GraphPair:
+def create_python_agent(pythonFunc, pos: Optional[list] = None, kw: Optional[dict] = None, out: Optional[list] = None, useProcess: bool = False) -> GraphPair:
     """Creates a Python agent task.
     
     Arguments:
     pythonFunc --- a Python function to be executed.
     inVars --- a dict mapping from names to Vars for the input to the pythonFunc Python function. (default None)
     out --- a dict mapping from names to Vars for the output of the pythonFunc Python function.  (default None)
+    useProcess --- run pythonFunc in a worker process rather than a thread.  (default False)
     """
 
-    pythonAgent = GraphPythonAgent(pythonFunc, pos, kw, out)
+    pythonAgent = GraphPythonAgent(pythonFunc, pos, kw, out, useProcess)
     return GraphPair(pythonAgent, pythonAgent)
 
 def create_sequence(list) -> GraphPair:
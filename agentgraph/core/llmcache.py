@@ -0,0 +1,391 @@
+import argparse
+import atexit
+import copy
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import traceback
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+import agentgraph.config
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None # type: ignore
+
+class LLMCache:
+    """Base class for LLM query memoization stores.  Entries are keyed
+    by the hash of the encoded request and the encoded request itself
+    so that hash collisions never return the wrong response."""
+
+    def lookup(self, hash: str, encoded: str) -> Optional[str]:
+        """Returns the encoded response for the encoded request or
+        None if we have not seen the request."""
+
+        raise NotImplementedError
+
+    def store(self, hash: str, encoded: str, value: str):
+        """Stores the encoded response for the encoded request."""
+
+        raise NotImplementedError
+
+    def sync(self):
+        """Flushes stored entries to stable storage."""
+
+        pass
+
+    def close(self):
+        pass
+
+class LogCache(LLMCache):
+    """Append-only log file with an in-memory hash index.  Each record
+    is a header line 'hash keylen vallen' followed by the encoded
+    request and response.  The index is loaded once and then extended
+    incrementally with records appended by other processes, so lookups
+    cost a dictionary probe and a single pread."""
+
+    FILENAME = "cache.log"
+
+    def __init__(self, path: Union[str, Path]):
+        path = Path(path).absolute()
+        path.mkdir(parents=True, exist_ok=True)
+        self.path = path / LogCache.FILENAME
+        self.lock = threading.Lock()
+        self.index: Dict[str, List[Tuple[int, int, int]]] = dict()
+        self.indexed_end = 0
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        with self.lock:
+            self._file_lock(True)
+            try:
+                self._load_index(truncate = True)
+            finally:
+                self._file_unlock()
+
+    def _file_lock(self, exclusive: bool):
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+    def _file_unlock(self):
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def _load_index(self, truncate: bool = False):
+        """Indexes any records past indexed_end.  If truncate is set
+        (we hold the exclusive lock), a torn record left behind by a
+        crashed writer is cut off."""
+
+        size = os.fstat(self.fd).st_size
+        offset = self.indexed_end
+        while offset < size:
+            header = os.pread(self.fd, min(256, size - offset), offset)
+            newline = header.find(b"\n")
+            try:
+                if newline < 0:
+                    raise ValueError("Truncated header")
+                hash, keylen, vallen = header[:newline].decode().split(" ")
+                start = offset + newline + 1
+                end = start + int(keylen) + int(vallen) + 1
+                if end > size:
+                    raise ValueError("Truncated record")
+            except ValueError:
+                if truncate:
+                    os.ftruncate(self.fd, offset)
+                break
+            self.index.setdefault(hash, []).append((start, int(keylen), int(vallen)))
+            offset = end
+        self.indexed_end = offset
+
+    def _find(self, hash: str, encoded: bytes) -> Optional[str]:
+        for start, keylen, vallen in self.index.get(hash, ()):
+            if keylen != len(encoded):
+                continue
+            contents = os.pread(self.fd, keylen + vallen, start)
+            if contents[:keylen] == encoded:
+                return contents[keylen:].decode()
+        return None
+
+    def lookup(self, hash: str, encoded: str) -> Optional[str]:
+        key = encoded.encode()
+        with self.lock:
+            result = self._find(hash, key)
+            if result is None and os.fstat(self.fd).st_size > self.indexed_end:
+                # Pick up entries appended by other processes
+                self._file_lock(False)
+                try:
+                    self._load_index()
+                finally:
+                    self._file_unlock()
+                result = self._find(hash, key)
+            return result
+
+    def store(self, hash: str, encoded: str, value: str):
+        key = encoded.encode()
+        val = value.encode()
+        record = f"{hash} {len(key)} {len(val)}\n".encode() + key + val + b"\n"
+        with self.lock:
+            self._file_lock(True)
+            try:
+                self._load_index(truncate = True)
+                if self._find(hash, key) is not None:
+                    return
+                # O_APPEND plus the exclusive lock places the whole
+                # record at the current end of file.
+                os.write(self.fd, record)
+                start = self.indexed_end + record.index(b"\n") + 1
+                self.index.setdefault(hash, []).append((start, len(key), len(val)))
+                self.indexed_end += len(record)
+            finally:
+                self._file_unlock()
+
+    def sync(self):
+        os.fsync(self.fd)
+
+    def close(self):
+        with self.lock:
+            os.close(self.fd)
+
+class SqliteCache(LLMCache):
+    """Sqlite backed store.  Sqlite provides atomic, multi-process
+    safe writes."""
+
+    FILENAME = "cache.sqlite"
+
+    def __init__(self, path: Union[str, Path]):
+        path = Path(path).absolute()
+        path.mkdir(parents=True, exist_ok=True)
+        self.path = path / SqliteCache.FILENAME
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.path), timeout = 60, check_same_thread = False, isolation_level = None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS entries (hash TEXT NOT NULL, key TEXT NOT NULL, val TEXT NOT NULL)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_hash ON entries (hash)")
+
+    def _find(self, hash: str, encoded: str) -> Optional[str]:
+        for key, val in self.conn.execute("SELECT key, val FROM entries WHERE hash = ?", (hash,)):
+            if key == encoded:
+                return val
+        return None
+
+    def lookup(self, hash: str, encoded: str) -> Optional[str]:
+        with self.lock:
+            return self._find(hash, encoded)
+
+    def store(self, hash: str, encoded: str, value: str):
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._find(hash, encoded) is None:
+                    self.conn.execute("INSERT INTO entries VALUES (?, ?, ?)", (hash, encoded, value))
+            finally:
+                self.conn.execute("COMMIT")
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+CACHE_KINDS = {
+    "log": LogCache,
+    "sqlite": SqliteCache,
+}
+
+_open_caches: Dict[Tuple[Path, str], LLMCache] = dict()
+_open_caches_lock = threading.Lock()
+
+def open_cache(path: Union[str, Path], kind: Optional[str] = None) -> LLMCache:
+    """Returns the cache stored at path.  Caches are opened once per
+    process and shared by all models.  kind defaults to
+    agentgraph.config.DEBUG_CACHE."""
+
+    if kind is None:
+        kind = agentgraph.config.DEBUG_CACHE
+    key = (Path(path).absolute(), kind)
+    with _open_caches_lock:
+        cache = _open_caches.get(key)
+        if cache is None:
+            if kind not in CACHE_KINDS:
+                raise ValueError(f"Unknown cache kind {kind}")
+            cache = CACHE_KINDS[kind](key[0])
+            _open_caches[key] = cache
+        return cache
+
+class LRUCache:
+    """Bounded in-memory tier that sits in front of the on-disk
+    store.  Holds decoded responses keyed by request hash and is
+    bounded both by entry count and by the encoded size of the
+    entries."""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries: OrderedDict = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, hash: str, encoded: str) -> Optional[Any]:
+        """Returns a private copy of the decoded response or None."""
+
+        with self.lock:
+            entry = self.entries.get(hash)
+            if entry is None or entry[0] != encoded:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(hash)
+            self.hits += 1
+            value = entry[1]
+        return _copy_response(value)
+
+    def put(self, hash: str, encoded: str, value: Any, size: int):
+        """Inserts a decoded response.  size is the encoded size of
+        the request plus the response."""
+
+        if size > self.max_bytes or self.max_entries <= 0:
+            return
+        with self.lock:
+            old = self.entries.pop(hash, None)
+            if old is not None:
+                self.bytes -= old[2]
+            self.entries[hash] = (encoded, value, size)
+            self.bytes += size
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last = False)
+                self.bytes -= evicted[2]
+
+def _copy_response(value: Any) -> Any:
+    """Copies a cached response.  Callers annotate tool calls in
+    place, so nested containers must not be shared, but plain string
+    fields can be."""
+
+    if isinstance(value, dict):
+        return {k: copy.deepcopy(v) if isinstance(v, (list, dict)) else v for k, v in value.items()}
+    return copy.deepcopy(value)
+
+class WriteBehind:
+    """Applies cache stores on a background thread so that writers
+    never block on file I/O.  Stores are applied in order and the
+    touched caches are synced each time the queue drains, which
+    batches fsyncs under load.  Entries that are still queued are
+    visible to lookups through pending().  Failed stores are reported
+    by the next flush()."""
+
+    def __init__(self):
+        self.queue: queue.Queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.pending_map: Dict[Tuple[int, str], str] = dict()
+        self.thread: Optional[threading.Thread] = None
+        # Errors from stores and syncs since the last flush
+        self.errors: List[Exception] = []
+
+    def submit(self, cache: LLMCache, hash: str, encoded: str, value: str):
+        with self.lock:
+            self.pending_map[(id(cache), encoded)] = value
+            if self.thread is None:
+                self.thread = threading.Thread(target = self._run, name = "agentgraph-cache", daemon = True)
+                self.thread.start()
+        self.queue.put((cache, hash, encoded, value))
+
+    def pending(self, cache: LLMCache, encoded: str) -> Optional[str]:
+        """Returns the value for a store that has not been applied
+        yet."""
+
+        with self.lock:
+            return self.pending_map.get((id(cache), encoded))
+
+    def flush(self):
+        """Waits for all submitted stores to reach the caches.  Raises
+        the first error hit by a store since the last flush."""
+
+        self.queue.join()
+        with self.lock:
+            errors = self.errors
+            self.errors = []
+        if errors:
+            raise errors[0]
+
+    def _failed(self, e: Exception):
+        print('Error writing cache', e)
+        print(traceback.format_exc())
+        with self.lock:
+            self.errors.append(e)
+
+    def _run(self):
+        dirty: Set[LLMCache] = set()
+        while True:
+            cache, hash, encoded, value = self.queue.get()
+            try:
+                cache.store(hash, encoded, value)
+                dirty.add(cache)
+            except Exception as e:
+                self._failed(e)
+            with self.lock:
+                key = (id(cache), encoded)
+                if self.pending_map.get(key) is value:
+                    del self.pending_map[key]
+            if self.queue.empty():
+                for c in dirty:
+                    try:
+                        c.sync()
+                    except Exception as e:
+                        self._failed(e)
+                dirty.clear()
+            self.queue.task_done()
+
+_write_behind = WriteBehind()
+
+def lookup_entry(cache: LLMCache, hash: str, encoded: str) -> Optional[str]:
+    """Looks up an entry including stores still queued for writing."""
+
+    value = _write_behind.pending(cache, encoded)
+    if value is not None:
+        return value
+    return cache.lookup(hash, encoded)
+
+def store_entry(cache: LLMCache, hash: str, encoded: str, value: str):
+    """Queues a store to be written in the background."""
+
+    _write_behind.submit(cache, hash, encoded, value)
+
+def flush_writes():
+    """Waits for all queued cache stores to be written and synced.
+    Raises the first error hit while writing, so that a broken cache
+    is not silently lost."""
+
+    _write_behind.flush()
+
+atexit.register(flush_writes)
+
+def migrate_debug_tree(path: Union[str, Path], cache: LLMCache) -> int:
+    """Imports a sharded DEBUG_PATH tree written by older versions of
+    AgentGraph (hash/xx/yy/hash-N.entry plus .val files) into cache.
+    Returns the number of imported entries."""
+
+    count = 0
+    for key in sorted(Path(path).absolute().glob("*/*/*.entry")):
+        val_path = Path(str(key) + ".val")
+        if not val_path.exists():
+            continue
+        hash = key.name.split("-")[0]
+        cache.store(hash, key.read_text(), val_path.read_text())
+        count += 1
+    cache.sync()
+    return count
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description = "Import an old sharded AgentGraph debug tree into an indexed cache.")
+    parser.add_argument("source", help = "old DEBUG_PATH directory")
+    parser.add_argument("dest", nargs = "?", help = "directory for the new cache (default: source)")
+    parser.add_argument("--kind", choices = sorted(CACHE_KINDS), default = agentgraph.config.DEBUG_CACHE)
+    args = parser.parse_args(argv)
+    dest = args.dest if args.dest is not None else args.source
+    cache = open_cache(dest, args.kind)
+    count = migrate_debug_tree(args.source, cache)
+    print(f"Imported {count} entries into {dest}")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,12 +1,26 @@
 import asyncio
+import concurrent.futures
+import functools
 import hashlib
 import agentgraph.config
 import json
+import threading
 import tiktoken
 import time
-from typing import Optional
-from pathlib import Path
-from openai import AsyncOpenAI, AsyncAzureOpenAI, APITimeoutError, BadRequestError
+import weakref
+from typing import Dict, Optional
+from agentgraph.core.modelrouter import ModelRouter, ModelTier, TieredRouter
+from agentgraph.core.ratelimit import RateLimiter, backoff_delay
+from agentgraph.core.llmcache import LRUCache, open_cache, lookup_entry, store_entry, _copy_response
+from openai import AsyncOpenAI, AsyncAzureOpenAI, APIConnectionError, BadRequestError, InternalServerError, RateLimitError
+
+class LLMRetryError(Exception):
+    """Raised when an endpoint keeps failing with retryable errors
+    (rate limits, server errors or connection problems)."""
+
+class _LeaderCancelled(Exception):
+    """Passed to coalesced requests when the request they were
+    waiting on was cancelled."""
 
 class ResponseObj:
     def __init__(self):
@@ -71,17 +85,34 @@ class ResponseObj:
         return json.dumps(self.to_dict())
 
 class LLMModel:
-    def __init__(self, endpoint, apikey, smallModel, largeModel, threshold, api_version="2023-05-15", useOpenAI: bool = False, timeout: float = 600, tokenizer_str: str = "gpt-4-0613", stream: bool = False):
+    def __init__(self, endpoint, apikey, smallModel, largeModel, threshold, api_version="2023-05-15", useOpenAI: bool = False, timeout: float = 600, tokenizer_str: str = "gpt-4-0613", stream: bool = False, coalesce: bool = True, router: Optional[ModelRouter] = None, max_inflight: Optional[int] = None, rpm: Optional[float] = None, tpm: Optional[float] = None, fail_fast: bool = False):
+        """smallModel and largeModel name the small and large context
+        versions of the model.  threshold is the context window of
+        the small model in tokens (it used to be a size in
+        characters).  Prompts are counted with the tokenizer_str
+        encoding or, if tokenizer_str is None, estimated from their
+        length.  router replaces the small/large policy.  max_inflight,
+        rpm and tpm bound the load sent to the endpoint.  fail_fast
+        turns off retries, see set_fail_fast."""
+
         if useOpenAI:
             if endpoint is not None:
-                self.client = AsyncOpenAI(base_url=endpoint,
-                                          api_key=apikey)
+                self._new_client = functools.partial(AsyncOpenAI, base_url=endpoint,
+                                                     api_key=apikey)
             else:
-                self.client = AsyncOpenAI(api_key=apikey)
+                self._new_client = functools.partial(AsyncOpenAI, api_key=apikey)
         else:
-            self.client = AsyncAzureOpenAI(azure_endpoint=endpoint,
-                                           api_version=api_version,
-                                           api_key=apikey)
+            self._new_client = functools.partial(AsyncAzureOpenAI, azure_endpoint=endpoint,
+                                                 api_version=api_version,
+                                                 api_key=apikey)
+        self.fail_fast = fail_fast
+        if fail_fast:
+            self._new_client = functools.partial(self._new_client, max_retries=0)
+        self.client = self._new_client()
+        # A client's connection pool belongs to the event loop it is
+        # first used on, so each engine loop gets its own client
+        self._clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._clients_lock = threading.Lock()
         self.timeout = timeout
         self.smallModel = smallModel
         self.switchThreshold = threshold
@@ -93,89 +124,94 @@ class LLMModel:
         self.tokenizer_str = tokenizer_str
         self.response_id = 0
         self.stream = stream
-
-    async def _lookup_cache(self, message_to_send) -> Optional[str]:
+        self.memcache = LRUCache(agentgraph.config.CACHE_LRU_MAX_ENTRIES, agentgraph.config.CACHE_LRU_MAX_BYTES)
+        self.disk_cache_hits = 0
+        self.coalesce = coalesce
+        self._inflight: Dict[str, concurrent.futures.Future] = dict()
+        self._inflight_lock = threading.Lock()
+        self.coalesced_requests = 0
+        self._count_tokens = functools.lru_cache(maxsize=agentgraph.config.TOKEN_COUNT_CACHE_SIZE)(_count_tokens)
+        if router is None:
+            router = TieredRouter([ModelTier(smallModel, threshold), ModelTier(largeModel)])
+        self.router = router
+        self.tier_tokens: Dict[str, list] = dict()
+        self.limiter = RateLimiter(max_inflight, rpm, tpm)
+        self.requests = 0
+        self.queue_time = 0.0
+        self.wire_time = 0.0
+        # Guards the statistics, which requests on different engine
+        # loops update at the same time
+        self._stats_lock = threading.Lock()
+
+    def set_fail_fast(self):
+        """Makes requests fail on the first rate limit, server or
+        connection error instead of retrying them, so that a pool can
+        fail over to another endpoint right away."""
+
+        with self._clients_lock:
+            if self.fail_fast:
+                return
+            self.fail_fast = True
+            self._new_client = functools.partial(self._new_client, max_retries=0)
+            self.client = self._new_client()
+            self._clients = weakref.WeakKeyDictionary()
+
+    def _get_client(self):
+        """Returns the client for the running event loop."""
+
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None:
+            with self._clients_lock:
+                client = self.client if not self._clients else self._new_client()
+                self._clients[loop] = client
+        return client
+
+    async def _lookup_cache(self, encoded: str) -> Optional[dict]:
         if agentgraph.config.DEBUG_PATH is None:
             return None
-        encoded = json.dumps(message_to_send)
         hash = _hash_message(encoded)
-        first = hash[0:2]
-        second = hash[2:4]
-        path = Path(agentgraph.config.DEBUG_PATH).absolute()
-        full_path = path / first / second
-        matches = full_path.glob(hash+"*.entry")
-        for key in matches:
-            contents = key.read_text()
-            if contents == encoded:
-                val_path = Path(str(key) + ".val")
-                if val_path.exists():
-                    contents = val_path.read_text()
-                    return json.loads(contents)
-        return None
+        result = self.memcache.get(hash, encoded)
+        if result is not None:
+            return result
+        # File reads and decoding happen off of the event loop so
+        # that cache hits never stall other requests.
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(None, self._lookup_cache_sync, hash, encoded, agentgraph.config.DEBUG_PATH)
+        if result is not None:
+            with self._stats_lock:
+                self.disk_cache_hits += 1
+        return result
+
+    def _lookup_cache_sync(self, hash, encoded, debug_path):
+        cache = open_cache(debug_path)
+        contents = lookup_entry(cache, hash, encoded)
+        if contents is None:
+            return None
+        result = json.loads(contents)
+        self.memcache.put(hash, encoded, result, len(encoded) + len(contents))
+        return _copy_response(result)
     
-    def _write_cache(self, message_to_send, response):
+    def _write_cache(self, encoded: str, response):
         if agentgraph.config.DEBUG_PATH is None:
             return
-        encoded = json.dumps(message_to_send)
         hash = _hash_message(encoded)
-        first = hash[0:2]
-        second = hash[2:4]
-        path = Path(agentgraph.config.DEBUG_PATH).absolute()
-        full_path = path / first / second
-        full_path.mkdir(parents=True, exist_ok=True)
-        count = 1
-        while True:
-            name = hash + "-" + str(count) + ".entry"
-            path = full_path / name
-            if not path.exists():
-                break
-            contents = path.read_text()
-            if contents == encoded:
-                break
-            count = count + 1
-            
-        val_path = Path(str(path) + ".val")
-        tmpkey = full_path / "tmp.key"
-        tmpval = full_path / "tmp.val"
-        tmpkey.write_text(encoded)
-        tmpval.write_text(json.dumps(response))
-        tmpval.rename(val_path)
-        tmpkey.rename(path)
+        contents = json.dumps(response)
+        self.memcache.put(hash, encoded, _copy_response(response), len(encoded) + len(contents))
+        cache = open_cache(agentgraph.config.DEBUG_PATH)
+        # Written behind by the cache thread
+        store_entry(cache, hash, encoded, contents)
 
     def num_tokens_from_messages(self, messages, model):
-        """Return the number of tokens used by a list of messages."""
+        """Return the number of tokens used by a list of messages.
+        Without a tokenizer the count is estimated from the length of
+        the messages."""
 
         if model is None:
-            return 0
+            return sum(_estimate_tokens(str(value)) for message in messages for value in message.values() if value is not None)
 
-        try:
-            encoding = tiktoken.encoding_for_model(model)
-        except KeyError:
-            print("Warning: model not found. Using cl100k_base encoding.")
-            encoding = tiktoken.get_encoding("cl100k_base")
-        if model in {
-            "gpt-3.5-turbo-0613",
-            "gpt-3.5-turbo-16k-0613",
-            "gpt-4-0314",
-            "gpt-4-32k-0314",
-            "gpt-4-0613",
-            "gpt-4-32k-0613",
-            }:
-            tokens_per_message = 3
-            tokens_per_name = 1
-        elif model == "gpt-3.5-turbo-0301":
-            tokens_per_message = 4  # every message follows <|start|>{role/name}\n{content}<|end|>\n
-            tokens_per_name = -1  # if there's a name, the role is omitted
-        elif "gpt-3.5-turbo" in model:
-            print("Warning: gpt-3.5-turbo may update over time. Returning num tokens assuming gpt-3.5-turbo-0613.")
-            return self.num_tokens_from_messages(messages, model="gpt-3.5-turbo-0613")
-        elif "gpt-4" in model:
-            print("Warning: gpt-4 may update over time. Returning num tokens assuming gpt-4-0613.")
-            return self.num_tokens_from_messages(messages, model="gpt-4-0613")
-        else:
-            raise NotImplementedError(
-                f"""num_tokens_from_messages() is not implemented for model {model}. See https://github.com/openai/openai-python/blob/main/chatml.md for information on how messages are converted to tokens."""
-            )
+        encoding, tokens_per_message, tokens_per_name = _get_encoding(model)
+        count_tokens = self._count_tokens
         num_tokens = 0
         for message in messages:
             num_tokens += tokens_per_message
@@ -185,15 +221,27 @@ class LLMModel:
                         value_str = value
                     else:
                         value_str = str(value)
-                    num_tokens += len(encoding.encode(value_str))
+                    # Memoized per string, so only new messages in a
+                    # growing conversation get encoded.
+                    num_tokens += count_tokens(encoding, value_str)
                     if key == "name":
                         num_tokens += tokens_per_name
                         num_tokens += 3  # every reply is primed with <|start|>assistant<|message|>
         return num_tokens
 
+    def _tool_token_counter(self):
+        """Returns a function counting the tokens of tool strings."""
+
+        if self.tokenizer_str is None:
+            return _estimate_tokens
+        encoding = _get_encoding(self.tokenizer_str)[0]
+        count_tokens = self._count_tokens
+        return lambda text: count_tokens(encoding, text)
+
     async def send_data(self, message_to_send, tools, llmopts: Optional[dict]):
         if llmopts is not None:
-            request_params = llmopts
+            # Copy so that agents sharing an llmopts dict don't race
+            request_params = dict(llmopts)
         else:
             request_params = dict()
             
@@ -201,35 +249,81 @@ class LLMModel:
         if tools:
             request_params["tools"] = tools
 
-        cache_result = await self._lookup_cache(request_params)
+        encoded = json.dumps(request_params)
+        cache_result = await self._lookup_cache(encoded)
         if cache_result is not None:
             return cache_result
 
-        totallen = 0
-        for msg in message_to_send:
-            if "content" in msg and msg["content"] is not None:
-                totallen += len(msg["content"])
-            if "tool_calls" in msg and msg["tool_calls"] is not None:
-                totallen += len(msg["tool_calls"])
-        if tools:
-            totallen += num_tokens_from_tools(tools)
+        if not self.coalesce:
+            return await self._send_request(request_params, encoded, message_to_send, tools)
 
-        #Save some money/speed things up by using small model if we can
-        if totallen > self.switchThreshold:
-            model_to_use = self.largeModel
-        else:
-            model_to_use = self.smallModel
+        # Single flight: identical requests that are already in flight
+        # wait for the first one instead of hitting the endpoint.
+        while True:
+            with self._inflight_lock:
+                future = self._inflight.get(encoded)
+                leader = future is None
+                if leader:
+                    future = concurrent.futures.Future()
+                    self._inflight[encoded] = future
+                else:
+                    self.coalesced_requests += 1
+
+            if leader:
+                break
+            try:
+                # Shielded so that cancelling one follower does not
+                # cancel the shared future
+                return _copy_response(await asyncio.shield(asyncio.wrap_future(future)))
+            except _LeaderCancelled:
+                # Retry, one of the followers takes over as leader
+                pass
+
+        try:
+            response = await self._send_request(request_params, encoded, message_to_send, tools)
+        except BaseException as e:
+            with self._inflight_lock:
+                del self._inflight[encoded]
+            if isinstance(e, asyncio.CancelledError):
+                future.set_exception(_LeaderCancelled())
+            else:
+                future.set_exception(e)
+            raise
+        with self._inflight_lock:
+            del self._inflight[encoded]
+        future.set_result(_copy_response(response))
+        return response
 
-        my_response_id = self.response_id
-        self.response_id = my_response_id + 1
+    async def _send_request(self, request_params: dict, encoded: str, message_to_send, tools):
+        """Sends a request that missed in the cache to the endpoint."""
 
+        # Count the prompt once and use it both for routing and for
+        # statistics.
         prompt_tokens = self.num_tokens_from_messages(message_to_send, self.tokenizer_str)
+        if tools:
+            prompt_tokens += num_tokens_from_tools(tools, self._tool_token_counter())
+
+        #Save some money/speed things up by using small model if we can
+        tiers = self.router.get_tiers()
+        tier = self.router.select(prompt_tokens, request_params.get("max_tokens"))
+        model_to_use = tiers[tier].name
+
+        with self._stats_lock:
+            my_response_id = self.response_id
+            self.response_id = my_response_id + 1
 
         retries = 0
+        max_retries = agentgraph.config.LLM_MAX_RETRIES
         while True:
+            queue_start = time.monotonic()
+            await self.limiter.acquire(prompt_tokens)
+            start = time.monotonic()
+            with self._stats_lock:
+                self.queue_time += start - queue_start
+            delay = None
             try:
                 start_time = time.clock_gettime_ns(time.CLOCK_REALTIME)
-                chat_completion = await self.client.chat.completions.create(**request_params, model=model_to_use, timeout=self.timeout, stream=self.stream)
+                chat_completion = await self._get_client().chat.completions.create(**request_params, model=model_to_use, timeout=self.timeout, stream=self.stream)
                 responseobj = ResponseObj()
                 count = 0
                 if self.stream:
@@ -243,20 +337,32 @@ class LLMModel:
 
                 endtime = time.clock_gettime_ns(time.CLOCK_REALTIME)
                 break
-            except APITimeoutError as e:
+            except (APIConnectionError, RateLimitError, InternalServerError) as e:
+                # Timeouts, connection failures, 429s and 5xx errors
+                if self.fail_fast:
+                    raise
                 retries+=1
-                if retries > 3:
-                    raise Exception(f"Exceeded 3 retries")
-                print("Retrying due to failure from openai\n")
+                if retries > max_retries:
+                    raise LLMRetryError(f"Exceeded {max_retries} retries") from e
+                delay = backoff_delay(retries, agentgraph.config.LLM_BACKOFF_BASE, agentgraph.config.LLM_BACKOFF_MAX, e)
+                print(f"Retrying in {delay:.2f}s due to {type(e).__name__} from openai\n")
             except BadRequestError as e:
                 retries+=1
                 print("Bad Request Error")
                 print(e)
-                if retries > 3:
-                    raise Exception(f"Exceeded 3 retries")
-                if model_to_use == self.largeModel:
+                if retries > max_retries:
+                    raise Exception(f"Exceeded {max_retries} retries")
+                next_tier = self.router.escalate(tier)
+                if next_tier is None:
                     raise Exception(f"Already using large model")
-                model_to_use = self.largeModel
+                tier = next_tier
+                model_to_use = tiers[tier].name
+            finally:
+                self.limiter.release()
+                with self._stats_lock:
+                    self.wire_time += time.monotonic() - start
+            if delay is not None:
+                await asyncio.sleep(delay)
 
         completion_tokens = self.num_tokens_from_messages([responseobj.to_dict()], self.tokenizer_str)
 
@@ -273,19 +379,83 @@ class LLMModel:
             difftime = (endtime - start_time) / 1000000000
             print(f"Response={my_response_id} Time={difftime} Prompt={prompt_tokens} Completion={completion_tokens}")
 
-        self._write_cache(request_params, response)
-        if model_to_use == self.smallModel:
-            self.scompletion_tokens += completion_tokens
-            self.sprompt_tokens += prompt_tokens
-        else:
-            self.lcompletion_tokens += completion_tokens
-            self.lprompt_tokens += prompt_tokens
+        self._write_cache(encoded, response)
+        self.limiter.consume(completion_tokens)
+        with self._stats_lock:
+            self.requests += 1
+            tier_tokens = self.tier_tokens.setdefault(model_to_use, [0, 0])
+            tier_tokens[0] += prompt_tokens
+            tier_tokens[1] += completion_tokens
+            if model_to_use == self.smallModel:
+                self.scompletion_tokens += completion_tokens
+                self.sprompt_tokens += prompt_tokens
+            else:
+                self.lcompletion_tokens += completion_tokens
+                self.lprompt_tokens += prompt_tokens
         return response
 
     def print_statistics(self):
         print(f"Large Prompt tokens: {self.lprompt_tokens} Completion tokens: {self.lcompletion_tokens}")
         print(f"Small Prompt tokens: {self.sprompt_tokens} Completion tokens: {self.scompletion_tokens}")
+        if len(self.router.get_tiers()) > 2:
+            with self._stats_lock:
+                tier_tokens = [(name, list(tokens)) for name, tokens in self.tier_tokens.items()]
+            for name, tokens in tier_tokens:
+                print(f"Model {name} Prompt tokens: {tokens[0]} Completion tokens: {tokens[1]}")
+        memcache = self.memcache
+        if memcache.hits + memcache.misses > 0:
+            print(f"Cache memory hits: {memcache.hits} misses: {memcache.misses} disk hits: {self.disk_cache_hits}")
+        if self.requests > 0:
+            print(f"Requests: {self.requests} Queued time: {self.queue_time:.2f}s Wire time: {self.wire_time:.2f}s")
+        if self.coalesced_requests > 0:
+            print(f"Coalesced requests: {self.coalesced_requests}")
     
+@functools.lru_cache(maxsize=None)
+def _get_encoding(model: str) -> tuple:
+    """Returns the tiktoken encoding, tokens per message and tokens
+    per name for model.  Resolved once per model name."""
+
+    try:
+        encoding = tiktoken.encoding_for_model(model)
+    except KeyError:
+        print("Warning: model not found. Using cl100k_base encoding.")
+        encoding = tiktoken.get_encoding("cl100k_base")
+    if model in {
+        "gpt-3.5-turbo-0613",
+        "gpt-3.5-turbo-16k-0613",
+        "gpt-4-0314",
+        "gpt-4-32k-0314",
+        "gpt-4-0613",
+        "gpt-4-32k-0613",
+        }:
+        tokens_per_message = 3
+        tokens_per_name = 1
+    elif model == "gpt-3.5-turbo-0301":
+        tokens_per_message = 4  # every message follows <|start|>{role/name}\n{content}<|end|>\n
+        tokens_per_name = -1  # if there's a name, the role is omitted
+    elif "gpt-3.5-turbo" in model:
+        print("Warning: gpt-3.5-turbo may update over time. Returning num tokens assuming gpt-3.5-turbo-0613.")
+        return _get_encoding("gpt-3.5-turbo-0613")
+    elif "gpt-4" in model:
+        print("Warning: gpt-4 may update over time. Returning num tokens assuming gpt-4-0613.")
+        return _get_encoding("gpt-4-0613")
+    else:
+        raise NotImplementedError(
+            f"""num_tokens_from_messages() is not implemented for model {model}. See https://github.com/openai/openai-python/blob/main/chatml.md for information on how messages are converted to tokens."""
+        )
+    return encoding, tokens_per_message, tokens_per_name
+
+def _count_tokens(encoding, text: str) -> int:
+    """Returns the number of tokens in text."""
+
+    return len(encoding.encode(text))
+
+def _estimate_tokens(text: str) -> int:
+    """Estimates the number of tokens in text when there is no
+    tokenizer (about four characters per token for English)."""
+
+    return len(text) // 4
+
 def _hash_message(message_to_send: str) -> str:
     """ Returns hash of message_to_send"""
     
@@ -294,33 +464,34 @@ def _hash_message(message_to_send: str) -> str:
     return hasher.digest().hex()
     
 # adapted from https://community.openai.com/t/how-to-calculate-the-tokens-when-using-function-call/266573/11
-# uses len instead of tiktoken's encoding method
-def num_tokens_from_tools(tools):
-   """Return the number of tokens used by a list of tools."""  
+def num_tokens_from_tools(tools, count = len):
+   """Return the number of tokens used by a list of tools.  count
+   returns the number of tokens in a string and defaults to its length
+   in characters."""
    num_tokens = 0
    for tool in tools:
        function = tool["function"]
-       function_tokens = len(function['name'])
-       function_tokens += len(function['description'])
+       function_tokens = count(function['name'])
+       function_tokens += count(function['description'])
 
        if 'parameters' in function:
            parameters = function['parameters']
            if 'properties' in parameters:
                for propertiesKey in parameters['properties']:
-                   function_tokens += len(propertiesKey)
+                   function_tokens += count(propertiesKey)
                    v = parameters['properties'][propertiesKey]
                    for field in v:
                        if field == 'type':
                            function_tokens += 2
-                           function_tokens += len(v['type'])
+                           function_tokens += count(v['type'])
                        elif field == 'description':
                            function_tokens += 2
-                           function_tokens += len(v['description'])
+                           function_tokens += count(v['description'])
                        elif field == 'enum':
                            function_tokens -= 3
                            for o in v['enum']:
                                function_tokens += 3
-                               function_tokens += len(o)
+                               function_tokens += count(o)
                        else:
                            print(f"Warning: not supported field {field}")
                function_tokens += 11
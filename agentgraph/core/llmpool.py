@@ -0,0 +1,133 @@
+import agentgraph.config
+import asyncio
+import threading
+import time
+from typing import List, Optional
+
+from openai import APIConnectionError, AuthenticationError, InternalServerError, PermissionDeniedError, RateLimitError
+from agentgraph.core.llmmodel import LLMModel, LLMRetryError
+from agentgraph.core.ratelimit import backoff_delay
+
+# Errors that indicate a problem with the endpoint rather than the request
+_ENDPOINT_ERRORS = (LLMRetryError, APIConnectionError, AuthenticationError, InternalServerError, PermissionDeniedError, RateLimitError)
+
+# Endpoint errors that may go away if we wait
+_RETRYABLE_ERRORS = (LLMRetryError, APIConnectionError, InternalServerError, RateLimitError)
+
+class _Endpoint:
+    def __init__(self, model: LLMModel, weight: float):
+        self.model = model
+        self.weight = weight
+        self.outstanding = 0
+        self.current_weight = 0.0
+        self.unhealthy_until = 0.0
+        self.failures = 0
+
+class LLMModelPool:
+    """Spreads requests over several LLMModel endpoints, e.g., Azure
+    deployments with separate quotas.  It implements the same
+    send_data/print_statistics interface as LLMModel, so it can be
+    used anywhere a model is expected."""
+
+    def __init__(self, models: List[LLMModel], weights: Optional[List[float]] = None, strategy: str = "least_outstanding", cooldown: float = 30):
+        """models is the list of endpoint models.  weights gives the
+        relative capacity of each endpoint (default 1).  strategy is
+        either "least_outstanding" or "weighted_round_robin".  An
+        endpoint that fails is taken out of rotation for cooldown
+        seconds.  The pool does the retrying, so the models are
+        switched to fail fast (see LLMModel.set_fail_fast).  Once every
+        endpoint failed a request, the request is retried with backoff
+        up to LLM_MAX_RETRIES times."""
+
+        assert len(models) > 0, "Need at least one model."
+        assert strategy in ("least_outstanding", "weighted_round_robin"), f"Unknown strategy {strategy}"
+        if weights is None:
+            weights = [1] * len(models)
+        assert len(weights) == len(models), "Need one weight per model."
+        for model in models:
+            set_fail_fast = getattr(model, "set_fail_fast", None)
+            if set_fail_fast is not None:
+                set_fail_fast()
+        self.endpoints = [_Endpoint(m, w) for m, w in zip(models, weights)]
+        self.strategy = strategy
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.next = 0
+        self.failovers = 0
+
+    def _pick(self, tried: set) -> Optional[_Endpoint]:
+        """Picks an endpoint that has not been tried for this request.
+        Prefers healthy endpoints and otherwise returns the one that
+        becomes healthy first."""
+
+        now = time.monotonic()
+        candidates = [e for e in self.endpoints if e not in tried]
+        if not candidates:
+            return None
+        healthy = [e for e in candidates if e.unhealthy_until <= now]
+        if not healthy:
+            return min(candidates, key = lambda e: e.unhealthy_until)
+
+        if self.strategy == "weighted_round_robin":
+            # Smooth weighted round robin
+            total = 0.0
+            best = None
+            for e in healthy:
+                e.current_weight += e.weight
+                total += e.weight
+                if best is None or e.current_weight > best.current_weight:
+                    best = e
+            best.current_weight -= total
+            return best
+
+        # Least outstanding requests relative to weight, rotating the
+        # starting point to break ties.
+        start = self.next
+        self.next = (start + 1) % len(healthy)
+        ordered = healthy[start % len(healthy):] + healthy[:start % len(healthy)]
+        return min(ordered, key = lambda e: e.outstanding / e.weight)
+
+    async def send_data(self, message_to_send, tools, llmopts: Optional[dict]):
+        tried: set = set()
+        retries = 0
+        max_retries = agentgraph.config.LLM_MAX_RETRIES
+        while True:
+            with self.lock:
+                endpoint = self._pick(tried)
+                if endpoint is not None:
+                    endpoint.outstanding += 1
+            if endpoint is None:
+                # Every endpoint failed this request
+                if not isinstance(last_error, _RETRYABLE_ERRORS):
+                    raise last_error
+                retries += 1
+                if retries > max_retries:
+                    raise LLMRetryError(f"Exceeded {max_retries} retries") from last_error
+                delay = backoff_delay(retries, agentgraph.config.LLM_BACKOFF_BASE, agentgraph.config.LLM_BACKOFF_MAX, last_error)
+                print(f"All endpoints failed, retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                tried.clear()
+                continue
+            try:
+                response = await endpoint.model.send_data(message_to_send, tools, llmopts)
+            except _ENDPOINT_ERRORS as e:
+                last_error = e
+                tried.add(endpoint)
+                with self.lock:
+                    endpoint.failures += 1
+                    endpoint.unhealthy_until = time.monotonic() + self.cooldown
+                    self.failovers += 1
+                print(f"Endpoint failed ({type(e).__name__}), failing over")
+                continue
+            finally:
+                with self.lock:
+                    endpoint.outstanding -= 1
+            with self.lock:
+                endpoint.unhealthy_until = 0.0
+            return response
+
+    def print_statistics(self):
+        for index, endpoint in enumerate(self.endpoints):
+            print(f"Endpoint {index} failures: {endpoint.failures}")
+            endpoint.model.print_statistics()
+        print(f"Failovers: {self.failovers}")
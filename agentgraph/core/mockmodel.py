@@ -0,0 +1,162 @@
+import asyncio
+import json
+import math
+import random
+import threading
+import time
+from typing import Callable, Optional, Union
+
+from agentgraph.core.llmmodel import _hash_message
+
+def mock_tool_call(name: str, arguments: dict, id: Optional[str] = None) -> dict:
+    """Builds a tool call entry in the format returned by the OpenAI
+    API for use in scripted MockLLMModel responses."""
+
+    if id is None:
+        id = "call_" + _hash_message(name + json.dumps(arguments, sort_keys=True))[:12]
+    return {"id": id, "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}
+
+def _sample(dist, rng: random.Random) -> float:
+    """Samples a delay in seconds.  dist is None, a constant, a
+    callable taking a random.Random, or a tuple naming a distribution:
+    ("uniform", low, high), ("normal", mean, stddev),
+    ("lognormal", mu, sigma) or ("exponential", mean)."""
+
+    if dist is None:
+        return 0.0
+    if callable(dist):
+        return max(0.0, dist(rng))
+    if isinstance(dist, (int, float)):
+        return float(dist)
+    kind = dist[0]
+    if kind == "uniform":
+        return rng.uniform(dist[1], dist[2])
+    elif kind == "normal":
+        return max(0.0, rng.gauss(dist[1], dist[2]))
+    elif kind == "lognormal":
+        return rng.lognormvariate(dist[1], dist[2])
+    elif kind == "exponential":
+        return rng.expovariate(1.0 / dist[1])
+    raise ValueError(f"Unknown latency distribution {kind}")
+
+class MockLLMModel:
+    """Deterministic, offline stand-in for LLMModel.  Implements the
+    same send_data contract without any network access so that the
+    scheduler and engine can be tested and benchmarked in isolation.
+
+    All randomness is drawn from a generator seeded with seed and the
+    hash of the request, so results do not depend on the order in
+    which parallel requests arrive."""
+
+    def __init__(self, responses: Union[None, str, list, Callable] = None, latency = None, chunk_latency = None, chunks: int = 1, stream: bool = False, completion_tokens: Optional[int] = None, seed: int = 0, chars_per_token: float = 4.0):
+        """
+        responses - None to answer each request with a deterministic
+        string derived from it, a string to always return, a list of
+        responses to return in order (cycling), or a function taking
+        (messages, tools, llmopts).  A response is either the content
+        string or a message dict, e.g., with tool calls built by
+        mock_tool_call.
+
+        latency - delay before the first (or only) chunk, see _sample.
+
+        chunk_latency - delay between streamed chunks.
+
+        chunks - number of chunks the content is streamed in.
+
+        stream - if set the response is delivered in chunks.
+
+        completion_tokens - completion token count to report.  By
+        default it is estimated from the response length.
+
+        seed - seed for the latency generators.
+
+        chars_per_token - used to estimate token counts.
+        """
+
+        self.responses = responses
+        self.latency = latency
+        self.chunk_latency = chunk_latency
+        self.chunks = chunks
+        self.stream = stream
+        self.completion_tokens = completion_tokens
+        self.seed = seed
+        self.chars_per_token = chars_per_token
+        self.lock = threading.Lock()
+        self.next_response = 0
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.total_completion_tokens = 0
+        self.latency_total = 0.0
+
+    def _count_tokens(self, value) -> int:
+        if value is None:
+            return 0
+        text = value if isinstance(value, str) else json.dumps(value)
+        return int(math.ceil(len(text) / self.chars_per_token))
+
+    def num_tokens_from_messages(self, messages, model = None) -> int:
+        """Estimates the number of tokens in a list of messages."""
+
+        num_tokens = 0
+        for message in messages:
+            num_tokens += 3
+            for value in message.values():
+                num_tokens += self._count_tokens(value)
+        return num_tokens
+
+    def _make_response(self, encoded: str, message_to_send, tools, llmopts) -> dict:
+        responses = self.responses
+        if responses is None:
+            response = f"Mock response {_hash_message(encoded)[:8]}"
+        elif isinstance(responses, str):
+            response = responses
+        elif isinstance(responses, list):
+            with self.lock:
+                response = responses[self.next_response % len(responses)]
+                self.next_response += 1
+        else:
+            response = responses(message_to_send, tools, llmopts)
+
+        if isinstance(response, str):
+            return {"role": "assistant", "content": response}
+        message = dict(response)
+        message.setdefault("role", "assistant")
+        return message
+
+    async def send_data(self, message_to_send, tools, llmopts: Optional[dict]):
+        request_params = dict(llmopts) if llmopts is not None else dict()
+        request_params["messages"] = message_to_send
+        if tools:
+            request_params["tools"] = tools
+        encoded = json.dumps(request_params)
+        rng = random.Random(f"{self.seed}:{_hash_message(encoded)}")
+        response = self._make_response(encoded, message_to_send, tools, llmopts)
+
+        start = time.monotonic()
+        delay = _sample(self.latency, rng)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.stream and self.chunks > 1:
+            for i in range(self.chunks - 1):
+                delay = _sample(self.chunk_latency, rng)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    # Still yield to the loop as real streams do
+                    await asyncio.sleep(0)
+
+        completion_tokens = self.completion_tokens
+        if completion_tokens is None:
+            completion_tokens = self.num_tokens_from_messages([response])
+        prompt_tokens = self.num_tokens_from_messages(message_to_send)
+        if tools:
+            prompt_tokens += self._count_tokens(tools)
+        with self.lock:
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens
+            self.total_completion_tokens += completion_tokens
+            self.latency_total += time.monotonic() - start
+        return response
+
+    def print_statistics(self):
+        print(f"Mock requests: {self.requests} Prompt tokens: {self.prompt_tokens} Completion tokens: {self.total_completion_tokens}")
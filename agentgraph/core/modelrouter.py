@@ -0,0 +1,58 @@
+from typing import List, Optional
+
+class ModelTier:
+    """A model that requests can be routed to."""
+
+    def __init__(self, name: str, context_limit: Optional[int] = None):
+        """name is the model (or deployment) name.  context_limit is
+        the number of tokens (prompt plus completion) the model
+        accepts, or None if there is no limit."""
+
+        self.name = name
+        self.context_limit = context_limit
+
+    def fits(self, tokens: int) -> bool:
+        return self.context_limit is None or tokens <= self.context_limit
+
+class ModelRouter:
+    """Routing policy that picks which model tier serves a request."""
+
+    def get_tiers(self) -> List[ModelTier]:
+        raise NotImplementedError
+
+    def select(self, prompt_tokens: int, completion_tokens: Optional[int]) -> int:
+        """Returns the index of the tier to use for a request with
+        prompt_tokens tokens.  completion_tokens is the completion
+        budget requested by the caller (max_tokens) or None."""
+
+        raise NotImplementedError
+
+    def escalate(self, index: int) -> Optional[int]:
+        """Returns the tier to retry with after tier index rejected
+        the request or None if there is no larger tier."""
+
+        if index + 1 < len(self.get_tiers()):
+            return index + 1
+        return None
+
+class TieredRouter(ModelRouter):
+    """Routes each request to the first (cheapest) tier whose context
+    window fits the prompt plus the completion reserve.  Tiers should
+    be ordered from cheapest to largest context."""
+
+    def __init__(self, tiers: List[ModelTier], completion_reserve: int = 0):
+        assert len(tiers) > 0, "Need at least one model tier."
+        self.tiers = tiers
+        self.completion_reserve = completion_reserve
+
+    def get_tiers(self) -> List[ModelTier]:
+        return self.tiers
+
+    def select(self, prompt_tokens: int, completion_tokens: Optional[int]) -> int:
+        reserve = completion_tokens if completion_tokens is not None else self.completion_reserve
+        needed = prompt_tokens + reserve
+        for index, tier in enumerate(self.tiers):
+            if tier.fits(needed):
+                return index
+        # Nothing fits, so try the largest model
+        return len(self.tiers) - 1
@@ -9,6 +9,9 @@ class Mutable:
         It is an ownership root iff it is owned by a task.
         """
         self._size = 1
+        # Schedulers with an access queue for us while we are an
+        # ownership root
+        self._schedulers: set = set()
         
         if owner is not None:
             root = owner._get_root_object()
@@ -63,6 +66,29 @@ class Mutable:
             
         return root
 
+    def _add_scheduler(self, scheduler: 'agentgraph.exec.scheduler.Scheduler'):
+        self._schedulers.add(scheduler)
+
+    def _remove_scheduler(self, scheduler: 'agentgraph.exec.scheduler.Scheduler'):
+        self._schedulers.discard(scheduler)
+
+    def _get_schedulers(self) -> list:
+        """Returns the Schedulers whose ScoreBoard has an access queue
+        for this ownership root."""
+
+        # Copy since other schedulers may add or remove themselves
+        return list(self._schedulers)
+
+    def _take_state(self, state: dict):
+        """Takes over state, the attributes of a copy of us that a
+        Python agent changed in a worker process.  References in it
+        to us and to the other mutables sent along with us already
+        point to the originals."""
+
+        for key, value in state.items():
+            if key != '_owner' and key != '_schedulers':
+                self.__dict__[key] = value
+
     def get_owning_task(self) -> Optional['agentgraph.exec.scheduler.ScheduleNode']:
         root = self._get_root_object()
         assert root._owner is None or isinstance(root._owner, agentgraph.exec.scheduler.ScheduleNode)
@@ -90,6 +116,23 @@ class Mutable:
         # We own this mutable now
         root._owner = currTask
     
+    async def wait_for_access_async(self):
+        """
+        Awaitable version of wait_for_access for async Python agents.
+        """
+        
+        from agentgraph.exec.scheduler import _get_current_task, _get_current_scheduler
+        currTask = _get_current_task()
+        root = self._get_root_object()
+
+        # See if we already own this mutable
+        if root._owner == currTask:
+            return
+        # No, so wait for access
+        await _get_current_scheduler().obj_access_async(root)
+        # We own this mutable now
+        root._owner = currTask
+    
     def wait_for_read_access(self):
         from agentgraph.exec.scheduler import _get_current_task, _get_current_scheduler
         currTask = _get_current_task()
@@ -104,7 +147,13 @@ class Mutable:
         # root._owner = currTask
 
     def _snapshot(self):
-        pass
+        """Returns a read only copy of this object that ReadOnly
+        readers can use instead of waiting on the object, or None if
+        the object does not support snapshots.  The copy must not
+        change when the object is written later.  Only called on
+        ownership roots while no task is writing the object."""
+
+        return None
     
     def _get_read_only_proxy(self):
         raise NotImplementedError
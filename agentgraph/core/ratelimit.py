@@ -0,0 +1,132 @@
+import asyncio
+import collections
+import random
+import threading
+import time
+from typing import Deque, Optional, Tuple
+
+class TokenBucket:
+    """Token bucket that refills continuously at a per minute rate.
+    Reservations are allowed to drive the balance negative, so callers
+    are served in the order they reserve and each caller only has to
+    sleep for the returned delay."""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        """Takes amount tokens from the bucket and returns the number
+        of seconds the caller must wait before using them."""
+
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+class ConcurrencyLimiter:
+    """Bounds the number of requests in flight.  Waiters may live on
+    different event loops, so slots are handed off with
+    call_soon_threadsafe instead of an asyncio.Semaphore."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.count = 0
+        self.waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = collections.deque()
+        self.lock = threading.Lock()
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            if self.count < self.limit:
+                self.count += 1
+                return
+            future = loop.create_future()
+            self.waiters.append((loop, future))
+        # The releasing task hands its slot directly to us
+        try:
+            await future
+        except BaseException:
+            # Cancelled after the slot was handed to us, so pass it on
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        with self.lock:
+            if self.waiters:
+                loop, future = self.waiters.popleft()
+                loop.call_soon_threadsafe(self._wake, future)
+                return
+            self.count -= 1
+
+    def _wake(self, future: asyncio.Future):
+        if future.cancelled():
+            # The waiter gave up, so pass the slot on
+            self.release()
+        else:
+            future.set_result(None)
+
+class RateLimiter:
+    """Combines a bound on in-flight requests with requests per minute
+    and tokens per minute buckets.  Callers wait asynchronously rather
+    than failing."""
+
+    def __init__(self, max_inflight: Optional[int] = None, rpm: Optional[float] = None, tpm: Optional[float] = None):
+        self.inflight = ConcurrencyLimiter(max_inflight) if max_inflight is not None else None
+        self.rpm = TokenBucket(rpm) if rpm is not None else None
+        self.tpm = TokenBucket(tpm) if tpm is not None else None
+
+    async def acquire(self, tokens: int):
+        """Waits until a request with the given number of tokens may
+        be sent."""
+
+        if self.inflight is not None:
+            await self.inflight.acquire()
+        delay = 0.0
+        if self.rpm is not None:
+            delay = self.rpm.reserve(1)
+        if self.tpm is not None:
+            delay = max(delay, self.tpm.reserve(tokens))
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            except BaseException:
+                # Our caller only releases the slot once we return
+                self.release()
+                raise
+
+    def release(self):
+        if self.inflight is not None:
+            self.inflight.release()
+
+    def consume(self, tokens: int):
+        """Charges tokens that were only known after the response
+        (i.e., completion tokens) against the tokens per minute
+        budget."""
+
+        if self.tpm is not None:
+            self.tpm.reserve(tokens)
+
+def backoff_delay(attempt: int, base: float, cap: float, error: Optional[Exception] = None) -> float:
+    """Returns a jittered exponential backoff delay for the given
+    attempt.  Honors a Retry-After header if the error carries one."""
+
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        try:
+            retry_after = headers.get("retry-after")
+            if retry_after is not None:
+                delay = max(delay, min(cap, float(retry_after)))
+        except (TypeError, ValueError):
+            pass
+    return delay
@@ -38,3 +38,11 @@ class Var(MsgSeq):
         
         from agentgraph.exec.scheduler import _get_current_scheduler
         return _get_current_scheduler().read_variable(self)
+
+    async def get_value_async(self):
+        """Awaitable version of get_value for async Python agents,
+        which must not block the event loop they run on.
+        """
+        
+        from agentgraph.exec.scheduler import _get_current_scheduler
+        return await _get_current_scheduler().read_variable_async(self)
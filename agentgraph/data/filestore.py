@@ -5,7 +5,9 @@ from agentgraph.core.mutable import Mutable
 
 class ReadFileStore:
     def __init__(self, store: 'FileStore'):
-        self.filestore = store.filestore.copy()
+        # Shares the dict until the FileStore is written again
+        self.filestore = store.filestore
+        store._shared = True
     
     def __contains__(self, key: str) -> bool:
         return key in self.filestore
@@ -31,9 +33,16 @@ class FileStore(Mutable):
     def __init__(self, owner = None):
         super().__init__(owner)
         self.filestore = dict()
+        # Whether a snapshot shares self.filestore
+        self._shared = False
 
     def _snapshot(self):
         return ReadFileStore(self)
+
+    def _copy_on_write(self):
+        if self._shared:
+            self.filestore = self.filestore.copy()
+            self._shared = False
         
     def __contains__(self, key: str) -> bool:
         self.wait_for_access()
@@ -56,6 +65,7 @@ class FileStore(Mutable):
             raise ValueError(f"File name {key} attempted to access parent path.")
 
         assert isinstance(val, str), "val must be str"
+        self._copy_on_write()
         self.filestore[key] = val
 
     def __iter__(self):
@@ -69,6 +79,7 @@ class FileStore(Mutable):
 
     def __delitem__(self, key: Union[str, Path]) -> None:
         self.wait_for_access()
+        self._copy_on_write()
         del self.filestore[key]
 
     def write_files(self, path: Union[str, Path]):
@@ -1,40 +1,113 @@
 import asyncio
+import itertools
 import janus
+import threading
 import traceback
 import sys
-import concurrent.futures
 import agentgraph.config
 
+from concurrent.futures import ProcessPoolExecutor
 from threading import Thread, Lock
+from typing import Callable, List, Optional, Union
 from agentgraph.core.graph import GraphNode, GraphPair, GraphNested, VarMap
+from agentgraph.exec.workstealing import WorkStealingPool
 
-class Engine:
-    def __init__(self, concurrency: int = 0):
-        self.loop = asyncio.new_event_loop()
-        self.event_loop_thread = Thread(target=self.run_event_loop)
-        self.event_loop_thread.start()
+# Records the shard whose loop runs on the current thread
+_loop_local = threading.local()
+
+def _uvloop_factory() -> Callable[[], asyncio.AbstractEventLoop]:
+    import uvloop
+    return uvloop.new_event_loop
+
+def get_loop_factory(loop: Union[str, Callable[[], asyncio.AbstractEventLoop], None] = None) -> Callable[[], asyncio.AbstractEventLoop]:
+    """Returns the function that creates event loops for loop, which
+    is either such a function or the name of an implementation:
+    "asyncio", "uvloop", or "auto" for uvloop if it is installed.
+    Defaults to agentgraph.config.EVENT_LOOP."""
+
+    if loop is None:
+        loop = agentgraph.config.EVENT_LOOP
+    if callable(loop):
+        return loop
+    if loop == "asyncio":
+        return asyncio.new_event_loop
+    if loop == "uvloop":
+        return _uvloop_factory()
+    if loop == "auto":
+        try:
+            return _uvloop_factory()
+        except ImportError:
+            return asyncio.new_event_loop
+    raise ValueError(f"Unknown event loop {loop}")
+
+class LoopShard:
+    """One event loop thread of an Engine along with the queue its
+    workers take LLM agent tasks from."""
+
+    def __init__(self, engine: 'Engine', index: int, loopFactory: Callable[[], asyncio.AbstractEventLoop]):
+        self.engine = engine
+        self.loop = loopFactory()
+        self.thread = Thread(target=self.run_event_loop, name=f"agentgraph-loop-{index}")
+        self.thread.start()
         future = asyncio.run_coroutine_threadsafe(create_queue(), self.loop)
         self.queue: janus.Queue = future.result()
-        self.concurrency = concurrency if concurrency > 0 else agentgraph.config.THREAD_POOL_DEFAULT_SIZE
-        self.threadPool = concurrent.futures.ThreadPoolExecutor(max_workers = self.concurrency)
-        self._pending_python_task_lock = Lock()
-        self._pending_python_task_count = 0 # number of tasks pending in thread pool
-        for i in range(self.concurrency):
-            asyncio.run_coroutine_threadsafe(self.worker(i), self.loop)
-        
+        self.workers = 0
+
     def run_event_loop(self):
         asyncio.set_event_loop(self.loop)
+        _loop_local.shard = self
         self.loop.run_forever()
 
-    async def worker(self, i):
+class Engine:
+    def __init__(self, concurrency: int = 0, loops: int = 0, loopFactory: Union[str, Callable[[], asyncio.AbstractEventLoop], None] = None):
+        self.concurrency = concurrency if concurrency > 0 else agentgraph.config.THREAD_POOL_DEFAULT_SIZE
+        numLoops = loops if loops > 0 else agentgraph.config.EVENT_LOOP_COUNT
+        # Every shard needs at least one worker
+        numLoops = min(numLoops, self.concurrency)
+        factory = get_loop_factory(loopFactory)
+        self.shards: List[LoopShard] = [LoopShard(self, i, factory) for i in range(numLoops)]
+        # The first shard's loop and queue, for code that assumes a
+        # single loop
+        self.loop = self.shards[0].loop
+        self.event_loop_thread = self.shards[0].thread
+        self.queue: janus.Queue = self.shards[0].queue
+        self._next_shard = itertools.count()
+        self.threadPool = WorkStealingPool(self.concurrency, agentgraph.config.THREAD_POOL_MAX_SIZE)
+        # Running async Python agents, so they are not garbage
+        # collected while waiting
+        self.asyncTasks: set = set()
+        # Created on first use by a Python agent with useProcess
+        self.processPool: Optional[ProcessPoolExecutor] = None
+        self._process_lock = Lock()
+        self._completion_lock = Lock()
+        self.completionCount = 0
+        self.completionLatency = 0.0
+        self.completionLatencyMax = 0.0
+        # The workers are dealt out across the shards
+        for i in range(self.concurrency):
+            shard = self.shards[i % numLoops]
+            shard.workers += 1
+            asyncio.run_coroutine_threadsafe(self.worker(i, shard.queue), shard.loop)
+
+    def _get_shard(self) -> LoopShard:
+        """Returns the shard to hand new work to.  Work is dealt out
+        round robin, even when it is started from one of our loops,
+        so that chains of LLM agents do not pile up on one loop."""
+
+        shards = self.shards
+        if len(shards) == 1:
+            return shards[0]
+        return shards[next(self._next_shard) % len(shards)]
+
+    async def worker(self, i, queue: janus.Queue):
         import agentgraph.exec.scheduler
         lastscheduler = None
         agentgraph.exec.scheduler._set_async(True)
 
         while True:
-            item = await self.queue.async_q.get()
+            item = await queue.async_q.get()
             if item == None:
-                self.queue.async_q.task_done()
+                queue.async_q.task_done()
                 break
             scheduleNode, scheduler = item
             agentgraph.exec.scheduler._set_current_task(scheduleNode)
@@ -43,70 +116,176 @@ class Engine:
                 lastscheduler = scheduler
             try:
                 await scheduleNode.run()
-
-                while True:
-                    if scheduler.lock.acquire(blocking=False):
-                        break
-                    # Yield to other tasks
-                    await asyncio.sleep(0)
-                try:
-                    scheduler.completed(scheduleNode)
-                finally:
-                    scheduler.lock.release()
-                    
+                scheduler._post_completion(scheduleNode)
             except Exception as e:
                 print('Error', e)
                 print(traceback.format_exc())
 
-            self.queue.async_q.task_done()
+            queue.async_q.task_done()
 
     def _queue_item(self, node: 'agentgraph.exec.scheduler.ScheduleNode', scheduler):
         isAsync = agentgraph.exec.scheduler._get_async()
-        if (isAsync):
-            self.queue.async_q.put_nowait((node, scheduler))
+        shard = self._get_shard()
+        # The async side of a janus queue may only be used from its
+        # own loop
+        if isAsync and shard is getattr(_loop_local, 'shard', None):
+            shard.queue.async_q.put_nowait((node, scheduler))
         else:
-            self.queue.sync_q.put((node, scheduler))
+            shard.queue.sync_q.put((node, scheduler))
+
+    def _thread_queue_item(self, node: 'agentgraph.exec.scheduler.ScheduleNode', scheduler, pending: dict):
+        """Queues a Python agent task.  pending is the dict of queued
+        tasks of the scheduler that submitted it."""
+
+        self.threadPool.submit(pending, threadrun, self, node, scheduler)
+
+    def _async_queue_item(self, node: 'agentgraph.exec.scheduler.ScheduleNode', scheduler):
+        """Starts an async Python agent as its own task on the event
+        loop, so it does not take a thread or a worker."""
+
+        self._get_shard().loop.call_soon_threadsafe(self._start_async_item, node, scheduler)
+
+    def _start_async_item(self, node: 'agentgraph.exec.scheduler.ScheduleNode', scheduler):
+        task = asyncio.get_running_loop().create_task(asyncrun(node, scheduler))
+        self.asyncTasks.add(task)
+        task.add_done_callback(self.asyncTasks.discard)
+
+    def _process_queue_item(self, node: 'agentgraph.exec.scheduler.ScheduleNode', scheduler, pending: dict):
+        """Queues a Python agent task that runs in a worker process.
+        pending is the dict of queued tasks of the scheduler that
+        submitted it, just as for _thread_queue_item."""
+
+        self.threadPool.submit(pending, processrun, self, node, scheduler)
 
-    def _thread_queue_item(self, node: 'agentgraph.exec.scheduler.ScheduleNode', scheduler):
-        with self._pending_python_task_lock:
-            self._pending_python_task_count += 1
-        scheduler.future = self.threadPool.submit(threadrun, self, node, scheduler)
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        with self._process_lock:
+            if self.processPool is None:
+                from agentgraph.exec.processpool import create_process_pool
+                self.processPool = create_process_pool()
+            return self.processPool
+
+    def _thread_queue_items(self, items: list, pending: dict):
+        """Queues a list of (node, scheduler) Python agent tasks
+        submitted by the scheduler that pending belongs to."""
+
+        self.threadPool.submit_many(pending, [(threadrun, (self, node, scheduler)) for node, scheduler in items])
     
     def _get_pending_python_task_count(self):
         """
         Get number of Python tasks still pending in thread pool
         """
-        with self._pending_python_task_lock:
-            return self._pending_python_task_count
+        return self.threadPool.pending()
         
+    def _record_completions(self, count: int, totalLatency: float, maxLatency: float):
+        with self._completion_lock:
+            self.completionCount += count
+            self.completionLatency += totalLatency
+            self.completionLatencyMax = max(self.completionLatencyMax, maxLatency)
+
+    def get_completion_stats(self) -> dict:
+        """
+        Returns the number of task completions applied and the mean
+        and maximum time in seconds from a task finishing to its
+        completion being applied by its scheduler.
+        """
+        with self._completion_lock:
+            count = self.completionCount
+            mean = self.completionLatency / count if count > 0 else 0.0
+            return {"count": count, "mean_latency": mean, "max_latency": self.completionLatencyMax}
+
     def shutdown(self):
         self.threadPool.shutdown(wait=True)
-        self.queue.sync_q.join()
-        for i in range(self.concurrency):
-            self.queue.sync_q.put(None)
-        self.queue.sync_q.join()
-        self.loop.call_soon_threadsafe(self.loop.stop)
-        self.event_loop_thread.join()
+        if self.processPool is not None:
+            self.processPool.shutdown(wait=True)
+        for shard in self.shards:
+            shard.queue.sync_q.join()
+        for shard in self.shards:
+            for i in range(shard.workers):
+                shard.queue.sync_q.put(None)
+            shard.queue.sync_q.join()
+            shard.loop.call_soon_threadsafe(shard.loop.stop)
+            shard.thread.join()
 
 def threadrun(engine, scheduleNode, scheduler):
     """
     Start a new thread to run child task.
     """
 
-    with engine._pending_python_task_lock:
-        engine._pending_python_task_count -= 1
-
     import agentgraph.exec.scheduler
     agentgraph.exec.scheduler._set_current_task(scheduleNode)
     agentgraph.exec.scheduler._set_current_scheduler(scheduler)
     try:
         scheduleNode._thread_run(scheduler)
-        with scheduler.lock:
-            scheduler.completed(scheduleNode)
+        scheduler._post_completion(scheduleNode)
     except Exception as e:
         print('Error', e)
         print(traceback.format_exc())
 
+async def asyncrun(scheduleNode, scheduler):
+    """
+    Runs an async Python agent on the event loop.
+    """
+
+    import agentgraph.exec.scheduler
+    agentgraph.exec.scheduler._set_async(True)
+    agentgraph.exec.scheduler._set_current_task(scheduleNode)
+    agentgraph.exec.scheduler._set_current_scheduler(scheduler)
+    try:
+        await scheduleNode._async_run(scheduler)
+        scheduler._post_completion(scheduleNode)
+    except Exception as e:
+        print('Error', e)
+        print(traceback.format_exc())
+
+def processrun(engine, scheduleNode, scheduler):
+    """
+    Sends a Python agent to the process pool.  Its completion is
+    posted once the result comes back.
+    """
+
+    from agentgraph.exec.processpool import ProcessCall, run_call
+    try:
+        call = ProcessCall(scheduleNode._get_graph_node(), scheduleNode._get_in_var_map(), scheduleNode.snapshots, scheduleNode._get_refs())
+    except Exception as e:
+        processfailed(e, scheduleNode, scheduler)
+        return
+    try:
+        future = engine._get_process_pool().submit(run_call, call.payload)
+    except Exception as e:
+        call.release()
+        processfailed(e, scheduleNode, scheduler)
+        return
+    future.add_done_callback(lambda f: processdone(f, call, scheduleNode, scheduler))
+
+def processdone(future, call, scheduleNode, scheduler):
+    """
+    Copies the result of a Python agent run in the process pool back
+    and completes its task.
+    """
+
+    try:
+        outVarMap = call.finish(future.result(), scheduleNode)
+    except Exception as e:
+        processfailed(e, scheduleNode, scheduler)
+        return
+    finally:
+        call.release()
+    scheduleNode._set_out_var_map(outVarMap)
+    scheduler._post_completion(scheduleNode)
+
+def processfailed(e, scheduleNode, scheduler):
+    """
+    Completes a Python agent that could not be run in the process
+    pool with the exception as the value of each of its outputs, so
+    that the tasks waiting on it do not hang.  Must be called from an
+    except block.
+    """
+
+    print('Error', e)
+    print(traceback.format_exc())
+    scheduleNode._set_out_var_map({var: e for var in scheduleNode._get_graph_node().get_write_vars()})
+    scheduler._post_completion(scheduleNode)
+
 async def create_queue() -> janus.Queue:
     queue: janus.Queue = janus.Queue()
     return queue
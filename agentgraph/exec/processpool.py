@@ -0,0 +1,184 @@
+import copyreg
+import io
+import multiprocessing
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import AbstractSet, List, Optional
+
+import agentgraph.config
+from agentgraph.core.mutable import Mutable, ReadOnlyProxy
+
+def create_process_pool() -> ProcessPoolExecutor:
+    """Creates the process pool for Python agents run with
+    useProcess."""
+
+    context = multiprocessing.get_context(agentgraph.config.PROCESS_START_METHOD)
+    return ProcessPoolExecutor(max_workers = agentgraph.config.PROCESS_POOL_DEFAULT_SIZE, mp_context = context)
+
+def _get_arg_values(pos: list, kw: dict) -> list:
+    """Returns the arguments of a call, looking inside the dicts and
+    sets that VarDict and VarSet arguments turn into."""
+
+    values = []
+    for value in pos + list(kw.values()):
+        if isinstance(value, dict):
+            values.extend(value.values())
+        elif isinstance(value, set):
+            values.extend(value)
+        else:
+            values.append(value)
+    return values
+
+class _Pickler(pickle.Pickler):
+    """Pickler that moves large str and bytes values into shared
+    memory segments and leaves the ownership and scheduler
+    bookkeeping of Mutables behind, since it only makes sense in
+    this process.
+
+    Sending a call, refs holds the roots of the mutables the task
+    holds and readOnly those it only reads.  Every mutable we pickle
+    must belong to refs, and those we may write are collected in
+    mutables, in the order the worker sees them.  Returning from the
+    worker, received maps the ids of the mutables that came with the
+    call to their index in that list, so they are sent back as
+    references."""
+
+    def __init__(self, file, segments: list, minSize: int, unlink: bool, refs: Optional[AbstractSet] = None, readOnly: AbstractSet = frozenset(), received: Optional[dict] = None):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.segments = segments
+        self.minSize = minSize
+        self.unlink = unlink
+        self.refs = refs
+        self.readOnly = readOnly
+        self.mutables: List[Mutable] = []
+        self.received = received
+
+    def persistent_id(self, obj):
+        if type(obj) is str:
+            if len(obj) < self.minSize:
+                return None
+            data = obj.encode()
+        elif type(obj) is bytes:
+            if len(obj) < self.minSize:
+                return None
+            data = obj
+        elif self.received is not None and isinstance(obj, Mutable):
+            return self.received.get(id(obj))
+        else:
+            return None
+        shm = SharedMemory(create = True, size = len(data))
+        shm.buf[:len(data)] = data
+        self.segments.append(shm)
+        return (shm.name, len(data), type(obj) is str, self.unlink)
+
+    def reducer_override(self, obj):
+        if not isinstance(obj, Mutable):
+            return NotImplemented
+        if self.refs is not None:
+            root = obj._get_root_object()
+            if root not in self.refs:
+                raise TypeError(f'{type(obj).__name__} reached from the arguments of a Python agent run with useProcess is not one of its arguments.  Pass it as an argument so that the scheduler tracks it.')
+            if root not in self.readOnly:
+                self.mutables.append(obj)
+        state = obj.__dict__.copy()
+        if not isinstance(obj._owner, Mutable):
+            state['_owner'] = None
+        state['_schedulers'] = set()
+        return (copyreg.__newobj__, (type(obj),), state)
+
+class _Unpickler(pickle.Unpickler):
+    """Unpickler for _Pickler.  mutables maps the references to
+    mutables sent back from the worker to the originals."""
+
+    def __init__(self, file, mutables: Optional[list] = None):
+        super().__init__(file)
+        self.mutables = mutables
+
+    def persistent_load(self, pid):
+        if type(pid) is int:
+            assert self.mutables is not None
+            return self.mutables[pid]
+        name, size, isStr, unlink = pid
+        shm = SharedMemory(name = name)
+        try:
+            with shm.buf[:size] as view:
+                value = str(view, 'utf-8') if isStr else bytes(view)
+        finally:
+            shm.close()
+            if unlink:
+                shm.unlink()
+        return value
+
+def run_call(payload: bytes) -> bytes:
+    """Runs a Python agent in a worker process.  Returns the pickled
+    return value along with the state of the mutables the agent may
+    have changed, so that it can be copied back."""
+
+    unpickler = _Unpickler(io.BytesIO(payload))
+    func, pos, kw, minSize = unpickler.load()
+    # Pickled after the arguments, so these are the same objects
+    mutables = unpickler.load()
+    # There is no scheduler in the worker, so the agent cannot create
+    # child tasks
+    retval = func(None, *pos, **kw)
+    states = [{key: value for key, value in m.__dict__.items() if key != '_owner' and key != '_schedulers'} for m in mutables]
+    # The worker does not track its segments, so the parent unlinks
+    # them once it has read them
+    file = io.BytesIO()
+    received = {id(m): i for i, m in enumerate(mutables)}
+    _Pickler(file, [], minSize, True, received = received).dump((retval, states))
+    return file.getvalue()
+
+class ProcessCall:
+    """A Python agent call sent to the process pool.  Keeps the shared
+    memory segments of the arguments until the call is done and
+    copies its results back."""
+
+    def __init__(self, agent: 'agentgraph.core.graph.GraphPythonAgent', varMap: dict, snapshots: Optional[dict], refs: AbstractSet):
+        self.agent = agent
+        pos, kw = agent._get_args(varMap, snapshots)
+        # Mutables that are only passed through read only proxies are
+        # not written back
+        readOnly = set()
+        writable = set()
+        for value in _get_arg_values(pos, kw):
+            if isinstance(value, ReadOnlyProxy):
+                readOnly.add(value._mutable._get_root_object())
+            elif isinstance(value, Mutable):
+                writable.add(value._get_root_object())
+        self.segments: List[SharedMemory] = []
+        minSize = agentgraph.config.PROCESS_SHARED_MEMORY_MIN_SIZE
+        file = io.BytesIO()
+        pickler = _Pickler(file, self.segments, minSize, False, refs, readOnly - writable)
+        try:
+            pickler.dump((agent.pythonFunc, pos, kw, minSize))
+            pickler.dump(pickler.mutables)
+        except BaseException:
+            self.release()
+            raise
+        # Every mutable reachable from the arguments that the agent
+        # may write, which it sends back
+        self.mutables: List[Mutable] = pickler.mutables
+        self.payload = file.getvalue()
+
+    def finish(self, result: bytes, owner: 'agentgraph.exec.scheduler.ScheduleNode') -> dict:
+        """Copies the changes to our mutables back, hands mutables the
+        agent created to owner, and returns the output map."""
+
+        retval, states = _Unpickler(io.BytesIO(result), self.mutables).load()
+        for mutable, state in zip(self.mutables, states):
+            mutable._take_state(state)
+        outMap = self.agent._get_out_map(None, retval)
+        for val in outMap.values():
+            if isinstance(val, Mutable) and val._get_root_object()._owner is None:
+                val.set_owning_task(owner)
+        return outMap
+
+    def release(self):
+        """Frees the shared memory segments of the arguments."""
+
+        for shm in self.segments:
+            shm.close()
+            shm.unlink()
+        self.segments = []
@@ -1,4 +1,6 @@
 import asyncio
+import bisect
+import collections
 import contextvars
 import sys
 import threading
@@ -6,7 +8,8 @@ import traceback
 import time
 from typing import Any, Dict, List, Optional, Set, Union
 
-from agentgraph.exec.engine import Engine, threadrun
+from agentgraph.exec.engine import Engine
+from agentgraph.exec.window import WindowController
 from agentgraph.core.graph import VarMap, GraphNested, GraphNode, GraphPythonAgent, GraphVarWait, create_python_agent, create_llm_agent
 from agentgraph.core.var import Var
 from agentgraph.core.vardict import VarDict
@@ -14,6 +17,7 @@ from agentgraph.core.varset import VarSet
 from agentgraph.core.msgseq import MsgSeq
 from agentgraph.core.tools import Tool
 from agentgraph.core.llmmodel import LLMModel
+import agentgraph.core.llmcache
 import agentgraph.config
 
 currentTask = contextvars.ContextVar('currentTask', default = None)
@@ -39,16 +43,29 @@ def _get_current_scheduler():
 def _set_current_scheduler(scheduler):
     currentScheduler.set(scheduler)
 
+# Shared stand-ins for containers that have not been allocated yet.
+# Callers only read them.
+_EMPTY_MAP: Dict = dict()
+_EMPTY_SET: frozenset = frozenset()
+
 class ScheduleNode:
-    """Schedule node to track dependences for a task instance."""
+    """Schedule node to track dependences for a task instance.  We
+    create one per task, so it uses slots and only allocates its
+    containers once something is put in them."""
+
+    __slots__ = ('node', '_wait_map', 'inVarMap', 'outVarMap', 'depCount', 'refs', 'snapshots', 'id', 'startTime')
     
     def __init__(self, node: GraphNode, id: int):
         self.node = node
-        self._wait_map: Dict[Var, list]  = dict()
-        self.inVarMap: Dict[Var, Any] = dict()
+        self._wait_map: Optional[Dict[Var, list]] = None
+        self.inVarMap: Optional[Dict[Var, Any]] = None
+        self.outVarMap: Optional[dict] = None
         self.depCount = 0
-        self.refs: Set['agentgraph.core.mutable.Mutable'] = set()
+        self.refs: Optional[Set['agentgraph.core.mutable.Mutable']] = None
+        # Maps ids of mutables read through snapshots to the snapshots
+        self.snapshots: Optional[dict] = None
         self.id = id
+        self.startTime = 0.0
         
     def _add_ref(self, ref) -> bool:
         """Keeps track of the heap references this task will use.  If
@@ -56,19 +73,24 @@ class ScheduleNode:
         duplicates"""
         
         root = ref._get_root_object()
-        if root in self.refs:
+        refs = self.refs
+        if refs is None:
+            self.refs = {root}
+            return True
+        if root in refs:
             return False
-        self.refs.add(root)
+        refs.add(root)
         return True
 
-    def _get_refs(self) -> set:
-        return self.refs
+    def _get_refs(self) -> Union[set, frozenset]:
+        refs = self.refs
+        return refs if refs is not None else _EMPTY_SET
    
     def _get_id(self) -> int:
         return self.id
 
     def assertOwnership(self):
-        for ref in self.refs:
+        for ref in self._get_refs():
             if isinstance(ref, agentgraph.core.mutable.Mutable):
                 ref.set_owning_task(self)
                 
@@ -94,11 +116,15 @@ class ScheduleNode:
         """Add a schedulenode that is waiting on us for value of the
         variable var and whether it is a reader."""
         
-        if var in self._wait_map:
-            list = self._wait_map[var]
+        waitMap = self._wait_map
+        if waitMap is None:
+            waitMap = dict()
+            self._wait_map = waitMap
+        if var in waitMap:
+            list = waitMap[var]
         else:
             list = []
-            self._wait_map[var] = list
+            waitMap[var] = list
         list.append((node, reader))
 
     def _get_waiters(self) -> dict:
@@ -106,7 +132,8 @@ class ScheduleNode:
         variables to the set of schedule nodes that need that value
         from us."""
         
-        return self._wait_map
+        waitMap = self._wait_map
+        return waitMap if waitMap is not None else _EMPTY_MAP
 
     def _set_out_var_map(self, outVarMap: dict):
         self.outVarMap = outVarMap
@@ -124,12 +151,17 @@ class ScheduleNode:
         still waiting on that value, then it will return the
         ScheduleNode that will provide the value."""
 
-        self.inVarMap[var] = val
+        inVarMap = self.inVarMap
+        if inVarMap is None:
+            inVarMap = dict()
+            self.inVarMap = inVarMap
+        inVarMap[var] = val
 
-    def _get_in_var_map(self):
+    def _get_in_var_map(self) -> dict:
         """Returns the inVarMap mapping."""
-        
-        return self.inVarMap
+
+        inVarMap = self.inVarMap
+        return inVarMap if inVarMap is not None else _EMPTY_MAP
         
     async def run(self):
         """Run the node"""
@@ -138,12 +170,22 @@ class ScheduleNode:
     def _thread_run(self, scheduler: 'Scheduler'):
         """Run the node"""
         assert isinstance(self.node, agentgraph.core.graph.GraphPythonAgent)
-        self.outVarMap = self.node.execute(scheduler, self._get_in_var_map())
+        self.outVarMap = self.node.execute(scheduler, self._get_in_var_map(), self.snapshots)
+
+    async def _async_run(self, scheduler: 'Scheduler'):
+        """Run the node as a coroutine"""
+        assert isinstance(self.node, agentgraph.core.graph.GraphPythonAgent)
+        self.outVarMap = await self.node.execute_async(scheduler, self._get_in_var_map(), self.snapshots)
 
 _dummy_task = ScheduleNode(GraphNode(), 0)
+# Guards lazy creation of Scheduler.condVar and pendingTasks
+_condVarLock = threading.Lock()
             
 class ScoreBoardNode:
-    """ScoreBoard linked list node to track heap dependences."""
+    """ScoreBoard node to track the heap dependences of a group of
+    tasks."""
+
+    __slots__ = ('is_reader', 'waiters', 'idRange')
 
     def __init__(self, is_reader: bool):
         """Create a new scoreboard node.  The is_read parameter is
@@ -151,14 +193,9 @@ class ScoreBoardNode:
         node."""
         
         self.is_reader = is_reader
-        self.waiters: Set[ScheduleNode] = set()
-        self.next: Optional['ScoreBoardNode'] = None
-        self.pred: Optional['ScoreBoardNode'] = None
+        self.waiters: Optional[Set[ScheduleNode]] = None
         self.idRange: Optional[tuple[int, int]] = None
 
-    def clear_pred(self):
-        self.pred = None
-
     def _get_idRange(self) -> tuple[int, int]:
         range = self.idRange
         assert range is not None
@@ -168,22 +205,6 @@ class ScoreBoardNode:
         """Returns true if the node in question is for readers."""
 
         return self.is_reader
-
-    def set_next(self, next: 'ScoreBoardNode'):
-        """Sets the next scoreboard node."""
-        
-        self.next = next
-        next.pred = self
-
-    def _get_pred(self) -> Optional['ScoreBoardNode']:
-        """Returns the previous scoreboard node."""
-
-        return self.pred
-
-    def get_next(self) -> Optional['ScoreBoardNode']:
-        """Returns the next scoreboard node."""
-
-        return self.next
         
     def _add_waiter(self, waiter: ScheduleNode):
         """Adds a waiter to this scoreboard node."""
@@ -193,20 +214,32 @@ class ScoreBoardNode:
             self.idRange = waiter.id, waiter.id
         else:
             self.idRange = min(range[0], waiter.id), max(range[1], waiter.id)
-        self.waiters.add(waiter)
+        waiters = self.waiters
+        if waiters is None:
+            self.waiters = {waiter}
+        else:
+            waiters.add(waiter)
 
     def _get_waiters(self) -> Set[ScheduleNode]:
         """Returns a list of waiting ScheduleNodes for this scoreboard
         node."""
         
-        return self.waiters
+        waiters = self.waiters
+        if waiters is None:
+            # Callers remove from the set they get back
+            waiters = set()
+            self.waiters = waiters
+        return waiters
 
     @staticmethod
-    def split_node(reader: 'ScoreBoardNode', writer: 'ScoreBoardNode') -> tuple['ScoreBoardNode', 'ScoreBoardNode']:
+    def split_node(reader: 'ScoreBoardNode', writer: 'ScoreBoardNode') -> List['ScoreBoardNode']:
+        """Splits reader around writer and returns the resulting
+        nodes in order."""
+
         # writer node should have a single id for id range
         writer_id = writer._get_idRange()[0]
         before_write, after_write = ScoreBoardNode(True), ScoreBoardNode(True)
-        for waiter in reader.waiters:
+        for waiter in reader._get_waiters():
             if waiter._get_id() < writer_id:
                 before_write._add_waiter(waiter)
             elif waiter._get_id() > writer_id:
@@ -214,21 +247,17 @@ class ScoreBoardNode:
 
         # in case the writer is at the start or end of the reader
         # id range and the before/after node is empty
+        nodes = []
         if before_write.idRange != None:
-            before_write.set_next(writer)
-        else:
-            before_write = writer
-        
+            nodes.append(before_write)
+        nodes.append(writer)
         if after_write.idRange != None:
-            writer.set_next(after_write)
-        else:
-            after_write = writer
-
-        return before_write, after_write
+            nodes.append(after_write)
+        return nodes
 
 
     @staticmethod
-    def merge(this: 'ScoreBoardNode', that: 'ScoreBoardNode') -> tuple['ScoreBoardNode', 'ScoreBoardNode']:
+    def merge(this: 'ScoreBoardNode', that: 'ScoreBoardNode') -> List['ScoreBoardNode']:
         """merge two nodes with overlapping id ranges. """
 
         thisRange = this._get_idRange()
@@ -237,9 +266,9 @@ class ScoreBoardNode:
 
         if this.is_reader and that.is_reader:
             reader = ScoreBoardNode(True)
-            reader.waiters = this.waiters | that.waiters
+            reader.waiters = this._get_waiters() | that._get_waiters()
             reader.idRange = min(thisRange[0], thatRange[0]), max(thisRange[1], thatRange[1])
-            return reader, reader
+            return [reader]
 
         writer = ScoreBoardNode(False)
         if this.is_reader:
@@ -252,57 +281,152 @@ class ScoreBoardNode:
             if that.is_reader:
                 reader = that
             else:
-                return writer, writer
+                return [writer]
 
         return ScoreBoardNode.split_node(reader, writer)
 
+class AccessQueue:
+    """Queue of the ScoreBoardNodes for one object, ordered by task
+    id.  The id ranges of the nodes do not overlap, so we keep the
+    start of each range in a parallel list and binary search it to
+    find where a task goes.  The first node holds the tasks that
+    currently have access.  Nodes before head have already been
+    removed from the front."""
+
+    __slots__ = ('nodes', 'starts', 'head')
+
+    def __init__(self, nodes: List[ScoreBoardNode]):
+        self.nodes: List[Optional[ScoreBoardNode]] = list(nodes)
+        self.starts = [node._get_idRange()[0] for node in nodes]
+        self.head = 0
+
+    def __len__(self) -> int:
+        return len(self.nodes) - self.head
+
+    def first(self) -> ScoreBoardNode:
+        node = self.nodes[self.head]
+        assert node is not None
+        return node
+
+    def get(self, index: int) -> Optional[ScoreBoardNode]:
+        """Returns the node at index or None if index is past the
+        end."""
+
+        if index < len(self.nodes):
+            return self.nodes[index]
+        return None
+
+    def get_nodes(self) -> List[ScoreBoardNode]:
+        return self.nodes[self.head:]
+    
+    def find(self, id: int) -> int:
+        """Returns the index of the last node whose id range starts
+        at or before id, or head - 1 if there is none."""
+
+        return bisect.bisect_right(self.starts, id, self.head) - 1
+
+    def update(self, index: int):
+        """Refreshes the start of node index after adding a waiter."""
+
+        self.starts[index] = self.nodes[index]._get_idRange()[0]
+
+    def insert(self, index: int, node: ScoreBoardNode):
+        """Inserts node before index."""
+
+        if index == len(self.nodes):
+            self.nodes.append(node)
+            self.starts.append(node._get_idRange()[0])
+        else:
+            self.nodes.insert(index, node)
+            self.starts.insert(index, node._get_idRange()[0])
+
+    def replace(self, index: int, count: int, nodes: List[ScoreBoardNode]):
+        """Replaces count nodes starting at index with nodes."""
+
+        self.nodes[index:index + count] = nodes
+        self.starts[index:index + count] = [node._get_idRange()[0] for node in nodes]
+
+    def insert_disjoint(self, nodes: List[ScoreBoardNode]) -> bool:
+        """Inserts the ordered list nodes if none of them overlaps one
+        of our nodes and returns whether it did.  Costs O(k log n)
+        plus the list moves for k nodes."""
+
+        positions = []
+        ourNodes = self.nodes
+        for node in nodes:
+            start, end = node._get_idRange()
+            index = self.find(end)
+            if index >= self.head and ourNodes[index]._get_idRange()[1] >= start:
+                return False
+            positions.append(index + 1)
+        # Insert from the back so earlier positions stay valid
+        for i in range(len(nodes) - 1, -1, -1):
+            self.insert(positions[i], nodes[i])
+        return True
+
+    def pop_first(self):
+        """Removes the first node."""
+
+        self.nodes[self.head] = None
+        self.head += 1
+        # Compact once most of the list is dead so the cost stays
+        # amortized constant
+        if self.head > 32 and 2 * self.head > len(self.nodes):
+            del self.nodes[:self.head]
+            del self.starts[:self.head]
+            self.head = 0
+
 class ScoreBoard:
-    """ScoreBoard object to track object dependencies between agents."""
+    """ScoreBoard object to track object dependencies between agents.
+    Each ownership root with an access queue here also records our
+    scheduler so that merging two roots only visits the schedulers
+    involved."""
     
     def __init__(self):
-        self.accesses = dict()
+        self.accesses: Dict[Any, AccessQueue] = dict()
+
+    def _new_queue(self, root, scoreboardnode: ScoreBoardNode, scheduler: 'Scheduler'):
+        self.accesses[root] = AccessQueue([scoreboardnode])
+        root._add_scheduler(scheduler)
 
-    def _add_reader(self, object, node: ScheduleNode) -> bool:
+    def _add_reader(self, object, node: ScheduleNode, scheduler: 'Scheduler') -> bool:
         """Add task node with read dependence on object.  Returns True
         if there is no conflict blocking execution."""
         scoreboardnode = ScoreBoardNode(True)
         scoreboardnode._add_waiter(node)
 
         root = object._get_root_object()
-        if root in self.accesses:
-            # We have a list of waiters.
-
-            start, end = self.accesses[root]
-        else:
+        queue = self.accesses.get(root)
+        if queue is None:
             # If we are at the beginning, we can just return true and
             # do the snapshot.
-            self.accesses[root] = (scoreboardnode, scoreboardnode)
+            self._new_queue(root, scoreboardnode, scheduler)
             return True
 
+        # Nodes after index + 1 start after us and their predecessors
+        # do too, so we can start walking backwards from index + 1
         id = node._get_id()
-        curr = end
+        nodes = queue.nodes
+        head = queue.head
+        index = min(queue.find(id) + 1, len(nodes) - 1)
 
-        while curr is not None:
-            pred = curr._get_pred()
+        while index >= head:
+            curr = nodes[index]
+            pred = nodes[index - 1] if index > head else None
             if not curr.get_is_reader():
                 # Write node...  We should add after as long as our id
                 # is larger.
                 if curr._get_idRange()[1] < id:
-                    oldNext = curr.get_next()
-                    curr.set_next(scoreboardnode)
-                    if curr == end:
-                        self.accesses[root] = (start, scoreboardnode)
-                    else:
-                        scoreboardnode.set_next(oldNext)
-
+                    queue.insert(index + 1, scoreboardnode)
                     return False
             else:
                 # Read node, can add as long as we should not be ahead
                 # of its predecessor
                 if pred is None or pred._get_idRange()[1] < id:
                     curr._add_waiter(node)
-                    return curr == start
-            curr = pred
+                    queue.update(index)
+                    return index == head
+            index -= 1
 
         # Made it to the front of the list.
         #
@@ -315,8 +439,7 @@ class ScoreBoard:
 
         raise RuntimeError("Impossible Case")
 
-            
-    def _add_writer(self, object, node: ScheduleNode) -> bool:
+    def _add_writer(self, object, node: ScheduleNode, scheduler: 'Scheduler') -> bool:
         """Add task node with write dependence on object.  Returns
         True if there is no conflict blocking execution."""
         
@@ -326,50 +449,36 @@ class ScoreBoard:
         scoreboardnode._add_waiter(node)
         
         root = object._get_root_object()
-        if root in self.accesses:
-            # Already have a linked list, so add ourselves to it.
-            start, end = self.accesses[root]
-        else:
+        queue = self.accesses.get(root)
+        if queue is None:
             # We are the first node.
-            self.accesses[root] = (scoreboardnode, scoreboardnode)
+            self._new_queue(root, scoreboardnode, scheduler)
             return True
 
+        # Nodes after index start after us, so we can skip them
         id = node._get_id()
-        curr = end
+        nodes = queue.nodes
+        head = queue.head
+        index = queue.find(id)
 
-        while curr is not None:
+        while index >= head:
+            curr = nodes[index]
             range = curr._get_idRange()
             if id > range[1]:
-                oldNext = curr.get_next()
-                curr.set_next(scoreboardnode)
-                if curr == end:
-                    self.accesses[root] = (start, scoreboardnode)
-                else:
-                    scoreboardnode.set_next(oldNext)
+                queue.insert(index + 1, scoreboardnode)
                 return False
             elif id > range[0]:
                 # We have a write splitting a read node...
-                first, last = ScoreBoardNode.split_node(curr, scoreboardnode)
-                pred = curr._get_pred()
-                succ = curr.get_next()
-                if pred is None:
+                if index == head:
                     # This case shouldn't be possible, because the
                     # only case where we traverse is for returning a
                     # mutable references, and a reader shouldn't be
                     # able to provide a reference to some later
                     # writer...
                     raise RuntimeError("Predecessor should never be None")
-
-                pred.set_next(first)
-
-                if succ is None:
-                    self.accesses[root] = (start, last)
-                    return False
-                else:
-                    last.set_next(succ)
+                queue.replace(index, 1, ScoreBoardNode.split_node(curr, scoreboardnode))
                 return False
-
-            curr = curr._get_pred()
+            index -= 1
 
         # BD: I don't think this case is actually possible since the
         # only case where we are not added at the end is if there is a
@@ -378,149 +487,127 @@ class ScoreBoard:
         # references yet.
         raise RuntimeError("Impossible case")
 
-
     def _change_to_writer(self, object, node: ScheduleNode):
         """Change existing node from reader to writer. Returns
         True if there is no conflict blocking execution or if
         no change was made."""
         root = object._get_root_object()
         # Reference should already been previously added
-        start, end = self.accesses[root]
+        queue = self.accesses[root]
 
         id = node._get_id()
-        curr = end
-
-        while curr is not None:
-            range = curr._get_idRange()
-            if id > range[1]:
-                raise RuntimeError("Impossible case")
-            elif id >= range[0]:
-                assert node in curr._get_waiters()
-                if not curr.get_is_reader():
-                    # Node was already a writer
-                    return True
-                if len(curr._get_waiters()) == 1:
-                    # Schedule node is the only one, just change node to writer
-                    curr.is_reader = False
-                    return True
+        index = queue.find(id)
+        if index < queue.head:
+            raise RuntimeError("Impossible case")
+        curr = queue.nodes[index]
+        if id > curr._get_idRange()[1]:
+            raise RuntimeError("Impossible case")
+
+        assert node in curr._get_waiters()
+        if not curr.get_is_reader():
+            # Node was already a writer
+            return True
+        if len(curr._get_waiters()) == 1:
+            # Schedule node is the only one, just change node to writer
+            curr.is_reader = False
+            return True
                 
-                # Split the node
-                scoreboardnode = ScoreBoardNode(False)
-                scoreboardnode._add_waiter(node)
-                first, last = ScoreBoardNode.split_node(curr, scoreboardnode)
-                pred = curr._get_pred()
-                succ = curr.get_next()
-                if pred is None:
-                    self.accesses[root] = (first, end)
-                else:
-                    pred.set_next(first)
-
-                if succ is None:
-                    self.accesses[root] = (first if pred is None else start, last)
-                else:
-                    last.set_next(succ)
-                # Return false if it now has to wait since it is no longer a reader
-                # unless it previously was already waiting
-                return start != curr or first != scoreboardnode
-
-            curr = curr._get_pred()
-
-        raise RuntimeError("Impossible case")
-
+        # Split the node
+        scoreboardnode = ScoreBoardNode(False)
+        scoreboardnode._add_waiter(node)
+        nodes = ScoreBoardNode.split_node(curr, scoreboardnode)
+        wasFirst = index == queue.head
+        queue.replace(index, 1, nodes)
+        # Return false if it now has to wait since it is no longer a reader
+        # unless it previously was already waiting
+        return not wasFirst or nodes[0] != scoreboardnode
 
     def _remove_waiter(self, object, node: ScheduleNode, scheduler: 'Scheduler') -> bool:
         """Removes a waiting schedulenode from the list.  Returns
         false if that node had already cleared this queue and true if
         it was still waiting."""
         root = object._get_root_object()
-        first, last = self.accesses[root]
-        if node in first._get_waiters():
-            first._get_waiters().remove(node)
-            if len(first._get_waiters()) == 0:
-                if first == last:
+        queue = self.accesses[root]
+        first = queue.first()
+        waiters = first._get_waiters()
+        if node in waiters:
+            waiters.remove(node)
+            if len(waiters) == 0:
+                queue.pop_first()
+                if len(queue) == 0:
                     del self.accesses[root]
+                    root._remove_scheduler(scheduler)
                 else:
-                    newfirst = first.get_next()
-                    newfirst.clear_pred()
-                    self.accesses[root] = (newfirst, last)
-                    #Update scheduler
-                    for nextnode in newfirst._get_waiters():
+                    #Update scheduler.  Copy since starting a
+                    #snapshot reader removes it from the set.
+                    for nextnode in list(queue.first()._get_waiters()):
                         scheduler._dec_dep_count(nextnode)
             return False
         else:
             # BCD: Can this branch ever be called??
-            entry = first.get_next()
-            prev = first
-            while entry is not None:
-                if node in entry._get_waiters():
-                    entry._get_waiters().remove(node)
-                    if len(entry._get_waiters()) == 0:
-                        entry.clear_pred()
-                        prev.set_next(entry.get_next())
-                        #See if we eliminated tail and thus need to update queue
-                        if last == entry:
-                            self.accesses[root] = (first, prev)
-                    break
-                prev = entry
-                entry = entry.get_next()
+            index = queue.find(node._get_id())
+            if index > queue.head:
+                entry = queue.nodes[index]
+                waiters = entry._get_waiters()
+                if node in waiters:
+                    waiters.remove(node)
+                    if len(waiters) == 0:
+                        queue.replace(index, 1, [])
             return True
 
-    def _merge_access_queues(self, source, dest):
+    def _merge_access_queues(self, source, dest, scheduler: 'Scheduler'):
         """
         merge the accesse queue of source to that of dest according to schedule node ids
         """
 
-        if source not in self.accesses:
+        srcQueue = self.accesses.get(source)
+        if srcQueue is None:
             return
+        del self.accesses[source]
+        source._remove_scheduler(scheduler)
+        dest._add_scheduler(scheduler)
 
-        if dest not in self.accesses:
-            self.accesses[dest] = self.accesses[source]
-            del self.accesses[source]
-            return  
-
-        srcNode, srcLast = self.accesses[source]
-        dstNode, dstLast = self.accesses[dest]
+        dstQueue = self.accesses.get(dest)
+        if dstQueue is None:
+            self.accesses[dest] = srcQueue
+            return
 
-        if srcNode._get_idRange()[1] < dstNode._get_idRange()[0]:
-            first = curNode = srcNode
-            srcNode = srcNode.get_next()
-        elif dstNode._get_idRange()[1] < srcNode._get_idRange()[0]:
-            first = curNode = dstNode
-            dstNode = dstNode.get_next()
+        # Usually the queues do not interleave, so insert the smaller
+        # queue's nodes into the larger queue.  Otherwise fall back to
+        # merging the two in order.
+        if len(srcQueue) > len(dstQueue):
+            large, small = srcQueue, dstQueue
         else:
-            first, curNode = ScoreBoardNode.merge(srcNode, dstNode)
-            srcNode = srcNode.get_next()
-            dstNode = dstNode.get_next()
-
-        while srcNode is not None and dstNode is not None:
+            large, small = dstQueue, srcQueue
+        if large.insert_disjoint(small.get_nodes()):
+            self.accesses[dest] = large
+            return
+        
+        srcNodes = srcQueue.get_nodes()
+        dstNodes = dstQueue.get_nodes()
+        merged: List[ScoreBoardNode] = []
+        srcIndex = dstIndex = 0
+        while srcIndex < len(srcNodes) and dstIndex < len(dstNodes):
+            srcNode = srcNodes[srcIndex]
+            dstNode = dstNodes[dstIndex]
             if srcNode._get_idRange()[1] < dstNode._get_idRange()[0]:
-                curNode.set_next(srcNode)
-                curNode = srcNode
-                srcNode = srcNode.get_next()
+                merged.append(srcNode)
+                srcIndex += 1
             elif dstNode._get_idRange()[1] < srcNode._get_idRange()[0]:
-                curNode.set_next(dstNode)
-                curNode = dstNode
-                dstNode = dstNode.get_next()
+                merged.append(dstNode)
+                dstIndex += 1
             else:
-                start, end = ScoreBoardNode.merge(srcNode, dstNode)
-                curNode.set_next(start)
-                curNode = end
-                srcNode = srcNode.get_next()
-                dstNode = dstNode.get_next()
-        
-        if srcNode is not None:
-            curNode.set_next(srcNode)
-            last = srcLast
-        elif dstNode is not None:
-            curNode.set_next(dstNode)
-            last = dstLast
-        else:
-            last = curNode
+                merged.extend(ScoreBoardNode.merge(srcNode, dstNode))
+                srcIndex += 1
+                dstIndex += 1
+        merged.extend(srcNodes[srcIndex:])
+        merged.extend(dstNodes[dstIndex:])
 
-        self.accesses[dest] = first, last
-        del self.accesses[source]
+        self.accesses[dest] = AccessQueue(merged)
 
 class TaskNode:
+    __slots__ = ('node', 'varMap', 'next')
+
     def __init__(self, node: GraphNode, varMap: Dict[Var, Any]):
         self.node = node
         self.varMap = varMap
@@ -560,16 +647,63 @@ class Scheduler:
         self.engine = engine
         self.scoreboard = ScoreBoard()
         self.windowSize = 0
-        self.windowStall = None
+        # 0 for no window
+        self.windowLimit = agentgraph.config.MAX_WINDOW_SIZE
+        self.windowController: Optional[WindowController] = None
+        if agentgraph.config.ADAPTIVE_WINDOW:
+            if self.windowLimit == 0:
+                self.windowLimit = agentgraph.config.MIN_WINDOW_SIZE
+            self.windowController = WindowController(self.windowLimit)
+        # Next graph node to scan once the window has room
+        self.windowStall: Optional[GraphNode] = None
+        # Number of submitters blocked on the window
+        self.windowWaiters = 0
+        # Whether blocked submitters may continue.  Decided under lock
+        # by _resume_window, since waiters hold their condVar and
+        # cannot take lock.
+        self.windowOpen = True
         self.start_tasks: Optional[TaskNode] = None
         self.endTasks: Optional[TaskNode] = None
         self.lock = threading.Lock()
-        self.condVar = threading.Condition()
-        self.sleepVar = threading.Condition()
-        self.dummyVar = Var("Dummy$$$$$")
+        # Completed tasks waiting for whoever holds lock to apply them
+        self.completions: collections.deque = collections.deque()
+        # Python agents to queue at the end of a batched scan
+        self.pendingSubmits: Optional[list] = None
+        # Created on first use since most schedulers never block
+        self.condVar: Optional[threading.Condition] = None
+        # Bumped under condVar whenever stealable work is queued for
+        # us so waiters do not miss a wakeup
+        self.workGeneration = 0
+        # Number of threads in _wait_until, so queueing work only
+        # touches schedulers that someone is waiting in
+        self.waiters = 0
+        # Python agents we queued that have yet to start, which our
+        # waiters may run themselves.  Created on first use.
+        self.pendingTasks: Optional[dict] = None
+        # Nested graphs do not run on a thread of their own, so the
+        # Python agent or main thread running the enclosing code
+        # waits on their tasks
+        self.helpScheduler = self
+        if parent is not None and scope is not None and not isinstance(scope._get_graph_node(), GraphPythonAgent):
+            self.helpScheduler = parent.helpScheduler
+        # Only the root scheduler is waited on for shutdown
+        self.sleepVar = threading.Condition() if parent is None else None
+        self.dummyVar: Optional[Var] = None
         self.nextId = 1
-        self.children: Set['Scheduler'] = set()
-        self.childrenLock = threading.Lock()
+        # Outputs of our scope and heap references it holds in the
+        # parent that have yet to be handed back early.  earlyValues
+        # is where the outputs come from and is None until our scope
+        # can complete early.
+        self.earlyValues: Optional[dict] = None
+        self.earlyOutputs: Optional[set] = None
+        self.earlyRefs: Optional[set] = None
+        if scope is not None and agentgraph.config.EARLY_COMPLETION:
+            if scope.refs:
+                self.earlyRefs = set(scope.refs)
+            graphnode = scope._get_graph_node()
+            if not isinstance(graphnode, GraphPythonAgent):
+                self.earlyValues = self.varMap
+                self.earlyOutputs = set(graphnode.get_write_vars())
 
     def _get_new_id(self) -> int:
         id = self.nextId
@@ -578,86 +712,228 @@ class Scheduler:
 
     def get_default_model(self) -> LLMModel:
         return self.model
+
+    def set_window_size(self, size: int, adaptive: bool = False):
+        """
+        Sets the maximum number of outstanding tasks for this
+        scheduler, or 0 for no limit.  If adaptive is set, the window
+        starts at size and then adapts to task latency and memory use.
+        """
+        assert size > 1 or (size == 0 and not adaptive), "Window must have room for a task besides the scope."
+        self.windowLimit = size
+        self.windowController = WindowController(size) if adaptive else None
         
     def _merge_obj_accesses(self, source, dest):
         """
-        merge accesses from object source in current and all parent schedulers
+        merge accesses from object source in all schedulers that have
+        any.  Other schedulers do not need to be touched.
         """
-        scheduler = self
-        while scheduler is not None:
-            with scheduler.lock:
-                scheduler.scoreboard._merge_access_queues(source, dest)
-            scheduler = scheduler.parent
+        for scheduler in source._get_schedulers():
+            scheduler.lock.acquire()
+            try:
+                scheduler.scoreboard._merge_access_queues(source, dest, scheduler)
+            finally:
+                scheduler._unlock()
         
-    def obj_access(self, mutable, readonly=False):
+    def _get_cond_var(self) -> threading.Condition:
+        condVar = self.condVar
+        if condVar is None:
+            with _condVarLock:
+                if self.condVar is None:
+                    self.condVar = threading.Condition()
+                condVar = self.condVar
+        return condVar
+
+    def _get_pending_tasks(self) -> dict:
         """
-        Waits for object access
+        Returns the dict that Python agents we queue are registered
+        in until they start.
         """
-        gvar = GraphVarWait([self.dummyVar], self.condVar)
+        scheduler = self.helpScheduler
+        pendingTasks = scheduler.pendingTasks
+        if pendingTasks is None:
+            with _condVarLock:
+                if scheduler.pendingTasks is None:
+                    scheduler.pendingTasks = dict()
+                pendingTasks = scheduler.pendingTasks
+        return pendingTasks
+
+    def _add_obj_access(self, mutable, readonly: bool, condVar: Optional[threading.Condition], future: Optional[asyncio.Future] = None) -> GraphVarWait:
+        """
+        Adds a task that completes once we may access mutable.
+        """
+        if self.dummyVar is None:
+            self.dummyVar = Var("Dummy$$$$$")
+        dummyVar = self.dummyVar
+        gvar = GraphVarWait([dummyVar], condVar, future)
         varDict = dict()
         if readonly:
-            varDict[self.dummyVar] = agentgraph.core.mutable.ReadOnly(mutable._get_root_object())
+            varDict[dummyVar] = agentgraph.core.mutable.ReadOnly(mutable._get_root_object())
         else:
-            varDict[self.dummyVar] = mutable._get_root_object()
+            varDict[dummyVar] = mutable._get_root_object()
         self.add_task(gvar, None, varDict)
-        self._wait_on_var_wait(gvar)
+        return gvar
+
+    def obj_access(self, mutable, readonly=False):
+        """
+        Waits for object access
+        """
+        gvar = self._add_obj_access(mutable, readonly, self._get_cond_var())
+        self._wait_until(gvar.get_cond_var(), gvar.is_done)
+
+    async def obj_access_async(self, mutable, readonly=False):
+        """
+        Waits for object access without blocking the event loop.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._add_obj_access(mutable, readonly, None, future)
+        await future
         
     def read_variable(self, var: Var):
         """
         Reads value of variable, stalling if needed.
         """
         
-        gvar = GraphVarWait([var], self.condVar)
+        gvar = GraphVarWait([var], self._get_cond_var())
         self.add_task(gvar)
         #Wait for our task to finish
-        self._wait_on_var_wait(gvar)
+        self._wait_until(gvar.get_cond_var(), gvar.is_done)
+        return gvar[var]
+
+    async def read_variable_async(self, var: Var):
+        """
+        Reads value of variable without blocking the event loop, so
+        async Python agents can wait for values.
+        """
+        
+        future = asyncio.get_running_loop().create_future()
+        gvar = GraphVarWait([var], None, future)
+        self.add_task(gvar)
+        await future
         return gvar[var]
     
-    def _wait_on_var_wait(self, gvar):
+    def _wait_until(self, condVar: threading.Condition, done):
+        """
+        Wait for done() to return True, stealing child tasks while
+        waiting.  We only sleep until either condVar is notified or
+        new stealable work is queued somewhere below us.
         """
-        Wait for condVar or steal a child task on timeout.
+        with condVar:
+            # Registered before our first scan for work, so anyone who
+            # queues work after that scan sees us and wakes us
+            self.waiters += 1
+            try:
+                self._wait_loop(condVar, done)
+            finally:
+                self.waiters -= 1
+
+    def _wait_loop(self, condVar: threading.Condition, done):
+        """Body of _wait_until.  Must hold condVar."""
+
+        while not done():
+            generation = self.workGeneration
+            condVar.release()
+            taskStolen = False
+            try:
+                taskStolen = self._steal_child_task()
+            finally:
+                condVar.acquire()
+            # If we stole a task successfully, loop again
+            # without waiting
+            if taskStolen:
+                continue
+            # Sleep until something we care about changes.  The
+            # generation check covers work that was queued while
+            # we were scanning for a task to steal.
+            if done() or self.workGeneration != generation:
+                continue
+            # Let the pool make up for our thread while it sleeps
+            pool = self.engine.threadPool
+            blocked = pool.block()
+            try:
+                while not done() and self.workGeneration == generation:
+                    condVar.wait()
+            finally:
+                if blocked:
+                    pool.unblock()
+
+    def _window_open(self) -> bool:
+        """Whether a blocked submitter may continue.  We wait for the
+        window to half drain so submitters do not wake up for every
+        completed task.  Must hold lock."""
+
+        return self.windowStall is None and (self.windowLimit == 0 or self.windowSize <= self.windowLimit // 2)
+
+    def _throttle(self):
         """
-        with self.condVar:
-            while not gvar.is_done():
-                if self.engine._get_pending_python_task_count() > 0:
-                    self.condVar.release()
-                    taskStolen = False
-                    try:
-                        taskStolen = self._steal_child_task()
-                    finally:
-                        self.condVar.acquire()
-                        # Make sure we didn't miss the event while we
-                        # tried to steal task.
-                        if gvar.is_done():
-                            return
-                        # If we stole a task successfully, loop again
-                        # without waiting
-                        if taskStolen:
-                            continue
-                # Did not successfully steal task, so wait and give up lock
-                self.condVar.wait(timeout=0.01)
+        Blocks the submitter while the window is full.  Blocked
+        submitters help run queued tasks from their subtree.  The
+        event loop is never blocked.
+        """
+        if _get_async():
+            return
+        with self.lock:
+            if self.windowStall is None:
+                return
+            self.windowWaiters += 1
+        condVar = self._get_cond_var()
+        try:
+            self._wait_until(condVar, lambda: self.windowOpen)
+        finally:
+            with self.lock:
+                self.windowWaiters -= 1
+
+    def _resume_window(self):
+        """
+        Continues a scan that stalled on a full window and wakes
+        blocked submitters once the window has drained.  Must hold
+        lock.
+        """
+        # Wait for a quarter of the window to free up so the scan
+        # and the engine handoff are batched
+        if self.windowStall is not None and (self.windowLimit == 0 or self.windowSize <= self.windowLimit - max(1, self.windowLimit // 4)):
+            node = self.windowStall
+            self.windowStall = None
+            batch = self.pendingSubmits is None
+            if batch:
+                self.pendingSubmits = []
+            try:
+                self.scan(node)
+            finally:
+                if batch:
+                    self._flush_submits()
+        if self.windowWaiters > 0 and self._window_open():
+            condVar = self._get_cond_var()
+            with condVar:
+                self.windowOpen = True
+                condVar.notify_all()
+
+    def _notify_work_queued(self):
+        """
+        Wakes a waiter that may run the newly queued task itself.
+        """
+        scheduler = self.helpScheduler
+        # The task is queued before we get here, and a waiter
+        # registers before it looks for work, so skipping schedulers
+        # without waiters cannot lose a wakeup
+        if scheduler.waiters > 0:
+            condVar = scheduler.condVar
+            assert condVar is not None
+            with condVar:
+                scheduler.workGeneration += 1
+                # One task needs one thief
+                condVar.notify()
 
     def _steal_child_task(self) -> bool:
-        child = self._get_pending_child()
-        if child:
-            threadrun(self.engine, child.scope, child)
-            _set_current_scheduler(self)
-            return True
-        else:
-            return False
-
-    def _get_pending_child(self):
         """
-        Find a child task that has not started running.
+        Runs a queued task that we submitted on this thread.
         """
-        with self.childrenLock:
-            for child in self.children:
-                if child.future.cancel():
-                    return child
-                descendent = child._get_pending_child()
-                if descendent is not None:
-                    return descendent
-
+        task = _get_current_task()
+        stolen = self.engine.threadPool.help(self.helpScheduler.pendingTasks)
+        if stolen:
+            _set_current_task(task)
+            _set_current_scheduler(self)
+        return stolen
 
     def add_task(self, node: GraphNode, vm: Optional[VarMap] = None, varMap: Optional[dict] = None):
         """
@@ -672,14 +948,72 @@ class Scheduler:
             varMap = dict()
         taskNode = TaskNode(node, varMap)
 
-        if self.endTasks is None:
-            self.start_tasks = taskNode
-        else:
-            self.endTasks.set_next(taskNode)
-
-        self.endTasks = taskNode
-        with self.lock:
+        self.lock.acquire()
+        try:
+            # Link under the lock since a completion may resume a
+            # stalled scan of the task list at any time
+            if self.endTasks is None:
+                self.start_tasks = taskNode
+            else:
+                self.endTasks.set_next(taskNode)
+            self.endTasks = taskNode
             self._finish_add_task(varMap, node)
+        finally:
+            self._unlock()
+
+    def add_tasks(self, tasks: list):
+        """
+        Adds several tasks at once.  The lock is taken once, the
+        batch is scanned in one pass, and Python agents are handed
+        to the engine together.
+        tasks - list of GraphNodes or (GraphNode, VarMap) pairs
+        """
+
+        taskNodes = []
+        for task in tasks:
+            if isinstance(task, tuple):
+                node, vm = task
+            else:
+                node, vm = task, None
+            varMap = vm.get_var_map() if vm is not None else dict()
+            taskNodes.append(TaskNode(node, varMap))
+        if len(taskNodes) == 0:
+            return
+        self._throttle()
+        for i in range(1, len(taskNodes)):
+            taskNodes[i - 1].set_next(taskNodes[i])
+
+        self.lock.acquire()
+        try:
+            currSchedulerTask = _get_current_task()
+            for taskNode in taskNodes:
+                self._check_for_mutables(taskNode.get_node(), taskNode.get_var_map(), currSchedulerTask)
+
+            if self.endTasks is None:
+                self.start_tasks = taskNodes[0]
+            else:
+                self.endTasks.set_next(taskNodes[0])
+            self.endTasks = taskNodes[-1]
+
+            if self.start_tasks == taskNodes[0]:
+                # Nothing else is pending, so scan the whole batch
+                self.pendingSubmits = []
+                try:
+                    self._run_task(taskNodes[0])
+                finally:
+                    self._flush_submits()
+        finally:
+            self._unlock()
+
+    def _flush_submits(self):
+        """Hands Python agents started during a batched scan to the
+        engine."""
+
+        submits = self.pendingSubmits
+        self.pendingSubmits = None
+        if submits:
+            self.engine._thread_queue_items(submits, self._get_pending_tasks())
+            self._notify_work_queued()
 
     def _finish_add_task(self, varMap: dict, node: GraphNode):
         self._check_for_mutables(node, varMap)
@@ -718,14 +1052,15 @@ class Scheduler:
             if mutTask == currSchedulerTask:
                 value.set_owning_task(_dummy_task)
             
-    def _check_for_mutables(self, node: Optional[GraphNode], varMap: dict):
+    def _check_for_mutables(self, node: Optional[GraphNode], varMap: dict, currSchedulerTask = None):
         """
         Handle and references to mutable objects.  If a mutable
         object is owned by the parent task, revoke ownership.
         """
 
         writeSet: Set[Var] = set()
-        currSchedulerTask = _get_current_task()
+        if currSchedulerTask is None:
+            currSchedulerTask = _get_current_task()
         while node is not None:
             for var in node._get_read_set():
                 if isinstance(var, VarDict):
@@ -751,18 +1086,40 @@ class Scheduler:
 
         self.scan(task.get_node())
 
-    def run_python_agent(self, pythonFunc, pos: Optional[list] = None, kw: Optional[dict] = None, numOuts: int = 0, vmap: Optional[VarMap] = None):
+    def run_python_agent(self, pythonFunc, pos: Optional[list] = None, kw: Optional[dict] = None, numOuts: int = 0, vmap: Optional[VarMap] = None, useProcess: bool = False):
+        self._throttle()
         out = None
         if numOuts > 0:
             out = list()
             for v in range(numOuts):
                 out.append(agentgraph.Var())
-        self.add_task(create_python_agent(pythonFunc, pos, kw, out).start, vmap)
+        self.add_task(create_python_agent(pythonFunc, pos, kw, out, useProcess).start, vmap)
         if numOuts == 1:
             return out[0]
         return out
+
+    def run_python_agents(self, pythonFunc, posList: list, kw: Optional[dict] = None, numOuts: int = 0, vmap: Optional[VarMap] = None, useProcess: bool = False) -> list:
+        """Runs pythonFunc once for each list of positional
+        arguments in posList, submitting all of the tasks as one
+        batch.  Returns a list with what run_python_agent would have
+        returned for each task."""
+
+        tasks = []
+        outs = []
+        for pos in posList:
+            out = None
+            if numOuts > 0:
+                out = [agentgraph.Var() for v in range(numOuts)]
+            tasks.append((create_python_agent(pythonFunc, pos, kw, out, useProcess).start, vmap))
+            if numOuts == 1:
+                outs.append(out[0])
+            else:
+                outs.append(out)
+        self.add_tasks(tasks)
+        return outs
         
     def run_llm_agent(self, msg: Optional[MsgSeq] = None, conversation: Union[Var, None, 'agentgraph.core.conversation.Conversation'] = None, tools: Optional['agentgraph.core.tools.ToolList'] = None, formatFunc = None, pos: Optional[list] = None, kw: Optional[dict] = None, llmopts: Optional[dict] = None, model: Optional[LLMModel] = None, vmap: Optional[VarMap] = None):
+        self._throttle()
         outVar = Var()
         if tools is not None:
             callVar = Var()
@@ -793,10 +1150,10 @@ class Scheduler:
                 # Add ref and if we are new then add it as a writer and increment depCount...
                 if scheduleNode._add_ref(var):
                     if reader:
-                        if self.scoreboard._add_reader(var, scheduleNode) == False:
+                        if self.scoreboard._add_reader(var, scheduleNode, self) == False:
                             depCount += 1
                     else:
-                        if self.scoreboard._add_writer(var, scheduleNode) == False:
+                        if self.scoreboard._add_writer(var, scheduleNode, self) == False:
                             depCount += 1
                 else:
                     if not reader:
@@ -841,6 +1198,11 @@ class Scheduler:
             if self.scope is not None and node == self.scope._get_graph_node():
                 print("BAD")
                 return
+            if self.windowSize >= self.windowLimit > 0:
+                # Window is full, so completed() picks up from here
+                self.windowStall = node
+                self.windowOpen = False
+                return
             depCount = 0
             inVars = node._get_read_set()
             outVars = node.get_write_vars()
@@ -904,15 +1266,81 @@ class Scheduler:
                 else:
                     return 1
         if reader:
-            if self.scoreboard._add_reader(lookup, scheduleNode):
+            if self.scoreboard._add_reader(lookup, scheduleNode, self):
                 return 0
             else:
                 return 1
-        if self.scoreboard._add_writer(lookup, scheduleNode):
+        if self.scoreboard._add_writer(lookup, scheduleNode, self):
             return 0
         else:
             return 1
         
+    def _post_completion(self, node: ScheduleNode):
+        """
+        Queues the completion of node.  Completions are applied by
+        whoever holds the scheduler lock, so a completing task never
+        waits for the lock.
+        """
+        self.completions.append((node, time.perf_counter(), None))
+        self._drain_completions()
+
+    def _post_early_completion(self, node: ScheduleNode, values: dict, refs: list):
+        """
+        Queues the early completion of part of the nested task node:
+        the output values it has finished and the heap references it
+        no longer needs.
+        """
+        self.completions.append((node, time.perf_counter(), (values, refs)))
+        self._drain_completions()
+
+    def _drain_completions(self):
+        """
+        Applies queued completions unless someone else holds the
+        lock, in which case they will apply them when they release it.
+        """
+        while self.completions:
+            if not self.lock.acquire(blocking=False):
+                return
+            try:
+                self._apply_completions()
+            finally:
+                self.lock.release()
+            # Loop in case a completion was posted after our last
+            # check but before we released the lock
+
+    def _apply_completions(self):
+        """Applies all queued completions.  Must hold lock."""
+
+        count = 0
+        totalLatency = 0.0
+        maxLatency = 0.0
+        completions = self.completions
+        while completions:
+            node, posted, early = completions.popleft()
+            latency = time.perf_counter() - posted
+            count += 1
+            totalLatency += latency
+            maxLatency = max(maxLatency, latency)
+            try:
+                if early is None:
+                    self.completed(node)
+                else:
+                    self.early_completed(node, *early)
+            except Exception as e:
+                print('Error', e)
+                print(traceback.format_exc())
+        if count > 0:
+            self.engine._record_completions(count, totalLatency, maxLatency)
+
+    def _unlock(self):
+        """
+        Releases lock and applies any completions that were posted
+        while we held it.
+        """
+        self.lock.release()
+        if self.completions:
+            self._drain_completions()
+
     def completed(self, node: ScheduleNode):
         """
         Handles the completion of a task.  Forwards variable values
@@ -922,33 +1350,30 @@ class Scheduler:
 
         oldWindowSize = self.windowSize
         self.windowSize = oldWindowSize - 1
-        if oldWindowSize == 1:
+        if oldWindowSize == 1 and self.sleepVar is not None:
             with self.sleepVar:
                 self.sleepVar.notify_all()
         
         if node == self.scope:
             #We just finished a python agent node
+            self._resume_window()
+            if self.windowSize != 0 and agentgraph.config.EARLY_COMPLETION:
+                # Child tasks are still running, so hand back what we
+                # can now
+                self.earlyValues = node._get_out_var_map()
+                self.earlyOutputs = set(self.earlyValues)
+                self._early_complete()
             self.check_finish_scope()
             return
+
+        if self.windowController is not None:
+            self.windowLimit = self.windowController.completed(time.perf_counter() - node.startTime)
         
         # Get list of tasks waiting on variables
         waiters = node._get_waiters()
         for var in waiters:
-            # Get value  of output variable
-            val = node._get_out_var_val(var)
-            # Get list of waiters
-            wlist = waiters[var]
-            for n, reader in wlist:
-                #Forward value
-                n._set_in_var_val(var, val)
-                if isinstance(val, agentgraph.core.mutable.Mutable):
-                    #If variable is mutable, register the heap dependence
-                    if self._handle_reference(n, var, val, reader) == 0:
-                        #Only do decrement if we didn't just transfer the count to a heap dependence
-                        self._dec_dep_count(n)
-                else:
-                    #No heap dependence, so decrement count
-                    self._dec_dep_count(n)
+            # Forward value of output variable
+            self._forward_value(var, node._get_out_var_val(var), waiters[var])
 
         outVarValMap = node._get_out_var_map()
         if outVarValMap is not None:
@@ -964,14 +1389,102 @@ class Scheduler:
             self.scoreboard._remove_waiter(r, node, self)
 
 
-        if self.windowSize < agentgraph.config.MAX_WINDOW_SIZE and self.windowStall is not None:
-            if self.windowStall is not None:
-                tmp = self.windowStall
-                self.windowStall = None
-                self.scan(tmp._get_graph_node())
+        self._resume_window()
+
+        if self.earlyValues is not None:
+            self._early_complete()
 
         #Check if we need to finish scope off
         self.check_finish_scope()
+
+    def early_completed(self, node: ScheduleNode, values: dict, refs: list):
+        """
+        Handles part of a nested task completing early.  Forwards the
+        values of the given output variables and releases the given
+        heap dependences while the rest of the task keeps running.
+        """
+
+        waiters = node._get_waiters()
+        for var in values:
+            val = values[var]
+            wlist = waiters.pop(var, None)
+            if wlist is not None:
+                self._forward_value(var, val, wlist)
+            if self.varMap[var] == node:
+                self.varMap[var] = val
+
+        for r in refs:
+            node.refs.discard(r)
+            self.scoreboard._remove_waiter(r, node, self)
+
+        # The values may finish outputs of our own scope
+        if self.earlyValues is not None:
+            self._early_complete()
+
+    def _forward_value(self, var: Var, val, wlist: list):
+        """Forwards the value of var to the tasks in wlist that are
+        waiting on it."""
+        
+        for n, reader in wlist:
+            #Forward value
+            n._set_in_var_val(var, val)
+            if isinstance(val, agentgraph.core.mutable.Mutable):
+                #If variable is mutable, register the heap dependence
+                if self._handle_reference(n, var, val, reader) == 0:
+                    #Only do decrement if we didn't just transfer the count to a heap dependence
+                    self._dec_dep_count(n)
+            else:
+                #No heap dependence, so decrement count
+                self._dec_dep_count(n)
+
+    def _in_use(self, value) -> bool:
+        """Returns whether value is a mutable that one of our tasks
+        may still access."""
+
+        if isinstance(value, agentgraph.core.mutable.ReadOnly):
+            value = value.get_mutable()
+        if not isinstance(value, agentgraph.core.mutable.Mutable):
+            return False
+        return value._get_root_object() in self.scoreboard.accesses
+
+    def _early_complete(self):
+        """
+        Hands outputs of our scope back to the parent once their last
+        writer has finished, and releases the heap references of our
+        scope once none of our tasks can access them.  The parent can
+        then start tasks that only depend on those while our other
+        child tasks are still running.  Must hold lock.
+        """
+
+        if self.start_tasks is not None or self.windowSize == 0:
+            # Tasks we have yet to scan may still write outputs or
+            # access references, and an empty window finishes the
+            # whole scope anyway
+            return
+
+        values = dict()
+        outputs = self.earlyOutputs
+        if outputs:
+            source = self.earlyValues
+            for var in list(outputs):
+                val = source.get(var, _dummy_task)
+                if not isinstance(val, ScheduleNode) and not self._in_use(val):
+                    values[var] = val
+                    outputs.discard(var)
+
+        refs = []
+        earlyRefs = self.earlyRefs
+        if earlyRefs:
+            for r in list(earlyRefs):
+                if not self._in_use(r):
+                    refs.append(r)
+                    earlyRefs.discard(r)
+
+        if not outputs and not earlyRefs:
+            # Nothing left to hand back
+            self.earlyValues = None
+        if values or refs:
+            self.parent._post_early_completion(self.scope, values, refs)
         
     def _dec_dep_count(self, node: ScheduleNode):
         """Decrement dependence count.  Starts task if dependence
@@ -982,12 +1495,9 @@ class Scheduler:
             self.start_task(node)
 
     def _finish_scope(self):
-        """Finish off a GraphNested node.  For now we require that all
-        child tasks have completed before the nested completes.  More
-        sophisticated implementations are possible that allow nodes to
-        partially complete.
-
-        """
+        """Finish off a GraphNested node once all child tasks have
+        completed.  Outputs and heap references that were ready
+        earlier have already been handed back by _early_complete."""
         
         #See if anyone cares about the end of the scope
         if self.parent is None:
@@ -1004,29 +1514,98 @@ class Scheduler:
                 writeMap[var] = self.varMap[var]
             scheduleNode._set_out_var_map(writeMap)
 
-        with self.parent.lock:
-            self.parent.completed(scheduleNode)
-        with self.parent.childrenLock:
-            self.parent.children.remove(self)
+        self.parent._post_completion(scheduleNode)
 
 
+    def _take_snapshots(self, scheduleNode: ScheduleNode):
+        """
+        Python agents that only read a mutable through ReadOnly
+        arguments get a snapshot of it if the mutable supports them.
+        The task then gives up its place in the mutable's access
+        queue, so later writers do not wait for it to finish.
+        """
+        refs = scheduleNode._get_refs()
+        inVarMap = scheduleNode._get_in_var_map()
+        candidates = []
+        excluded = set()
+        for var in scheduleNode._get_graph_node()._get_read_set():
+            if isinstance(var, VarDict):
+                values = list(var.values())
+            elif isinstance(var, VarSet):
+                values = list(var)
+            else:
+                values = [var]
+            for v in values:
+                if isinstance(v, agentgraph.core.mutable.ReadOnly):
+                    m = v.get_mutable()
+                    if isinstance(m, Var):
+                        m = inVarMap.get(m)
+                    if isinstance(m, agentgraph.core.mutable.Mutable):
+                        root = m._get_root_object()
+                        if root is m:
+                            candidates.append(m)
+                        else:
+                            # A proxy of part of the object reads the
+                            # live object
+                            excluded.add(root)
+                elif isinstance(v, agentgraph.core.mutable.ReadOnlyProxy):
+                    excluded.add(v._mutable._get_root_object())
+
+        for m in candidates:
+            if m in excluded or m not in refs:
+                continue
+            queue = self.scoreboard.accesses.get(m)
+            if queue is None:
+                continue
+            first = queue.first()
+            if not first.get_is_reader() or scheduleNode not in first._get_waiters():
+                # We also write it
+                continue
+            snapshot = m._snapshot()
+            if snapshot is None:
+                excluded.add(m)
+                continue
+            if scheduleNode.snapshots is None:
+                scheduleNode.snapshots = dict()
+            scheduleNode.snapshots[id(m)] = snapshot
+            excluded.add(m)
+            refs.discard(m)
+            self.scoreboard._remove_waiter(m, scheduleNode, self)
+
     def start_nested_task(self, scheduleNode: ScheduleNode):
         """Starts task."""
         
         graphnode = scheduleNode._get_graph_node()
 
+        if scheduleNode.refs is not None and isinstance(graphnode, GraphPythonAgent):
+            self._take_snapshots(scheduleNode)
         scheduleNode.assertOwnership()
+        # Stamped even without a controller, since set_window_size
+        # may add one while the task runs
+        scheduleNode.startTime = time.perf_counter()
         
         if isinstance(graphnode, GraphNested):
             # Need start new Scheduler
             if isinstance(graphnode, GraphPythonAgent):
+                if graphnode.useProcess:
+                    # Runs in a worker process, so it cannot have
+                    # child tasks and completes like an LLM agent
+                    self.engine._process_queue_item(scheduleNode, self, self._get_pending_tasks())
+                    return
                 # Start scheduler for PythonAgent child
                 child = Scheduler(self.model, scheduleNode, self, self.engine)
                 #Add a count for the PythonAgent task
                 child.windowSize = 1
-                with self.childrenLock:
-                    self.children.add(child)
-                    self.engine._thread_queue_item(scheduleNode, child)
+                if graphnode.isAsync:
+                    # Runs as a coroutine on the event loop rather
+                    # than taking a thread
+                    self.engine._async_queue_item(scheduleNode, child)
+                    return
+                if self.pendingSubmits is not None:
+                    self.pendingSubmits.append((scheduleNode, child))
+                else:
+                    self.engine._thread_queue_item(scheduleNode, child, self._get_pending_tasks())
+                    self._notify_work_queued()
                 return
             
             inVarMap = scheduleNode._get_in_var_map()            
@@ -1057,5 +1636,6 @@ class Scheduler:
                     self.sleepVar.wait()
             # All good, shutdown the system
             self.engine.shutdown()
+            agentgraph.core.llmcache.flush_writes()
             if agentgraph.config.VERBOSE > 0:
                 self.get_default_model().print_statistics()
@@ -0,0 +1,63 @@
+import os
+from typing import Optional
+
+import agentgraph.config
+
+def get_rss() -> Optional[int]:
+    """Returns the resident set size of the process in bytes or None
+    if it is not available on this platform."""
+
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+class WindowController:
+    """Adapts the window of a scheduler with additive increase and
+    multiplicative decrease.  Decisions are made once per window's
+    worth of completions.  The window is halved when the process RSS
+    is above WINDOW_MEMORY_LIMIT or when the mean task latency over
+    the last window is more than WINDOW_LATENCY_FACTOR times the
+    baseline latency, which means tasks are queueing (e.g., behind
+    the model's rate limits) rather than running.  Otherwise it grows
+    by MIN_WINDOW_SIZE tasks."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.minimum = agentgraph.config.MIN_WINDOW_SIZE
+        self.maximum = agentgraph.config.ADAPTIVE_MAX_WINDOW_SIZE
+        self.memoryLimit = agentgraph.config.WINDOW_MEMORY_LIMIT
+        self.latencyFactor = agentgraph.config.WINDOW_LATENCY_FACTOR
+        self.baseline: Optional[float] = None
+        self.count = 0
+        self.totalLatency = 0.0
+
+    def completed(self, latency: float) -> int:
+        """Records the latency of a completed task and returns the
+        window size to use."""
+
+        self.count += 1
+        self.totalLatency += latency
+        if self.count < self.limit:
+            return self.limit
+
+        mean = self.totalLatency / self.count
+        self.count = 0
+        self.totalLatency = 0.0
+        # The baseline follows the best window we have seen, but
+        # creeps up so that a permanent shift in latency (e.g., after
+        # a run of cache hits) is eventually accepted
+        if self.baseline is None or mean < self.baseline:
+            self.baseline = mean
+        else:
+            self.baseline *= 1.05
+
+        rss = get_rss() if self.memoryLimit is not None else None
+        if rss is not None and rss > self.memoryLimit:
+            self.limit = max(self.minimum, self.limit // 2)
+        elif mean > self.latencyFactor * self.baseline:
+            self.limit = max(self.minimum, self.limit // 2)
+        else:
+            self.limit = min(self.maximum, self.limit + self.minimum)
+        return self.limit
@@ -0,0 +1,302 @@
+import collections
+import threading
+import time
+import traceback
+from typing import Callable, Deque, List, Optional
+
+class WorkItem:
+    """A queued Python agent.  pending is the dict of queued tasks of
+    the scheduler whose blocked tasks may run this one, or None."""
+
+    __slots__ = ('pending', 'func', 'args')
+
+    def __init__(self, pending: Optional[dict], func: Callable, args: tuple):
+        self.pending = pending
+        self.func = func
+        self.args = args
+
+    def claim(self) -> bool:
+        """Returns whether we get to run the item.  An item is claimed
+        by removing it from pending, so an item that a blocked task
+        already took from pending is skipped when it is popped from a
+        deque later."""
+
+        pending = self.pending
+        return pending is None or pending.pop(self, False)
+
+    def run(self):
+        try:
+            self.func(*self.args)
+        except Exception as e:
+            print('Error', e)
+            print(traceback.format_exc())
+
+class WorkDeque:
+    """Per worker deque.  The owning worker pushes and pops at the
+    right end (LIFO, so nested children run while their parent's data
+    is still hot) and thieves take from the left end (FIFO, so they
+    get the oldest and typically largest pieces of work)."""
+
+    def __init__(self):
+        self.items: Deque[WorkItem] = collections.deque()
+        self.lock = threading.Lock()
+
+    def push(self, item: WorkItem):
+        with self.lock:
+            self.items.append(item)
+
+    def pop(self) -> Optional[WorkItem]:
+        # Unlocked peek so scanning empty deques stays cheap
+        if not self.items:
+            return None
+        with self.lock:
+            if self.items:
+                return self.items.pop()
+            return None
+
+    def steal(self) -> Optional[WorkItem]:
+        if not self.items:
+            return None
+        with self.lock:
+            if self.items:
+                return self.items.popleft()
+            return None
+
+def _claim(take: Callable) -> Optional[WorkItem]:
+    """Calls take until it returns an item we can claim or None."""
+
+    while True:
+        item = take()
+        if item is None or item.claim():
+            return item
+
+# How long a surplus worker stays idle before it exits
+_RETIRE_SECONDS = 1.0
+
+class WorkStealingPool:
+    """Thread pool for Python agents with one deque per worker.
+    Tasks submitted from a worker go to that worker's deque, and
+    tasks submitted from other threads (the event loop or the main
+    program) go to a shared injection deque.  Idle workers first pop
+    their own deque, then take from the injection deque, then steal
+    from other workers.  Each item is also registered in the pending
+    dict of the scheduler that submitted it, which is where its
+    blocked tasks look for work.
+
+    The pool is elastic.  While workers block waiting on other
+    tasks, queued work that finds no idle worker gets a compensating
+    worker, so that size workers stay available, up to max_workers in
+    total.  Surplus workers exit once they have been idle for a while
+    after the blocking ends."""
+
+    def __init__(self, num_workers: int, max_workers: Optional[int] = None):
+        self.size = num_workers
+        self.max_workers = max(num_workers, max_workers) if max_workers is not None else num_workers
+        self.num_workers = 0
+        self.blocked = 0
+        # Indexed by worker slot.  Slots of exited workers are reused.
+        self.deques: List[WorkDeque] = []
+        self.threads: List[Optional[threading.Thread]] = []
+        self.freeSlots: List[int] = []
+        self.injection = WorkDeque()
+        self.local = threading.local()
+        lock = threading.RLock()
+        self.cond = threading.Condition(lock)
+        # Notified when every worker is idle
+        self.allIdle = threading.Condition(lock)
+        self.queued = 0
+        # Bumped on every submission so idle workers can tell whether
+        # work arrived while they were scanning
+        self.submitted = 0
+        self.idle = 0
+        self.stopping = False
+        with self.cond:
+            for i in range(num_workers):
+                self._add_worker()
+            # Let the workers park before anything is submitted, so
+            # that a worker that is still starting up does not race
+            # the submitter for the first tasks
+            while self.idle < self.num_workers:
+                self.allIdle.wait()
+
+    def _add_worker(self):
+        """Starts a worker.  Must hold cond."""
+
+        if self.freeSlots:
+            index = self.freeSlots.pop()
+        else:
+            index = len(self.deques)
+            # Append the deque before the thread so that thieves,
+            # which do not lock the list, never see a missing slot
+            self.deques.append(WorkDeque())
+            self.threads.append(None)
+        self.num_workers += 1
+        thread = threading.Thread(target=self._worker, args=(index,), name=f"agentgraph-worker-{index}", daemon=True)
+        self.threads[index] = thread
+        thread.start()
+
+    def _compensate(self):
+        """Starts a compensating worker if queued work has no idle
+        worker to run it and blocked workers leave us short of size.
+        Must hold cond."""
+
+        if self.queued > 0 and self.idle == 0 and self.num_workers - self.blocked < self.size and self.num_workers < self.max_workers:
+            self._add_worker()
+
+    def block(self) -> bool:
+        """Called by a thread before it blocks waiting on other
+        tasks.  Returns whether the caller is one of our workers and
+        must call unblock once it stops blocking."""
+
+        if self._get_local_deque() is None:
+            return False
+        with self.cond:
+            self.blocked += 1
+            self._compensate()
+        return True
+
+    def unblock(self):
+        with self.cond:
+            self.blocked -= 1
+            if self.idle > 0 and self.num_workers - self.blocked > self.size:
+                # Wake an idle worker so it notices it is surplus
+                self.cond.notify()
+
+    def _get_local_deque(self) -> Optional[WorkDeque]:
+        return getattr(self.local, 'deque', None)
+
+    def submit(self, pending: Optional[dict], func: Callable, *args):
+        """Queues func(*args) to run.  pending is the dict of queued
+        tasks of the submitting scheduler."""
+
+        item = WorkItem(pending, func, args)
+        if pending is not None:
+            pending[item] = True
+        deque = self._get_local_deque()
+        if deque is None:
+            deque = self.injection
+        deque.push(item)
+        with self.cond:
+            self.queued += 1
+            self.submitted += 1
+            if self.idle > 0:
+                self.cond.notify()
+            else:
+                self._compensate()
+
+    def submit_many(self, pending: Optional[dict], items: list):
+        """Queues a list of (func, args) tuples at once."""
+
+        workItems = [WorkItem(pending, func, args) for func, args in items]
+        if pending is not None:
+            for item in workItems:
+                pending[item] = True
+        deque = self._get_local_deque()
+        if deque is None:
+            deque = self.injection
+        with deque.lock:
+            deque.items.extend(workItems)
+        with self.cond:
+            self.queued += len(items)
+            self.submitted += 1
+            if self.idle > 0:
+                self.cond.notify(min(self.idle, len(items)))
+            else:
+                self._compensate()
+
+    def _taken(self):
+        with self.cond:
+            self.queued -= 1
+
+    def _find_work(self, index: int) -> Optional[WorkItem]:
+        deques = self.deques
+        item = _claim(deques[index].pop)
+        if item is None:
+            item = _claim(self.injection.steal)
+        if item is None:
+            count = len(deques)
+            for i in range(1, count):
+                item = _claim(deques[(index + i) % count].steal)
+                if item is not None:
+                    break
+        if item is not None:
+            self._taken()
+        return item
+
+    def _worker(self, index: int):
+        self.local.deque = self.deques[index]
+        idleSince: Optional[float] = None
+        while True:
+            seen = self.submitted
+            item = self._find_work(index)
+            if item is not None:
+                item.run()
+                idleSince = None
+                continue
+            with self.cond:
+                # Items are pushed before they are counted, so if
+                # nothing was submitted since we started scanning, any
+                # queued item has already been taken by a worker that
+                # has yet to call _taken.  Spinning on queued here can
+                # starve that worker of the lock.
+                if self.submitted != seen:
+                    continue
+                if self.stopping:
+                    return
+                timeout = None
+                if self.num_workers - self.blocked > self.size:
+                    # A worker we compensated for has stopped blocking
+                    now = time.monotonic()
+                    if idleSince is None:
+                        idleSince = now
+                    elif now - idleSince >= _RETIRE_SECONDS:
+                        # Our deque is empty since only we push to it
+                        self.num_workers -= 1
+                        self.threads[index] = None
+                        self.freeSlots.append(index)
+                        if self.idle == self.num_workers:
+                            self.allIdle.notify_all()
+                        return
+                    timeout = _RETIRE_SECONDS
+                else:
+                    idleSince = None
+                self.idle += 1
+                if self.idle == self.num_workers:
+                    self.allIdle.notify_all()
+                self.cond.wait(timeout)
+                self.idle -= 1
+
+    def help(self, pending: Optional[dict]) -> bool:
+        """Called by a task blocked in the scheduler that owns
+        pending.  Runs the most recently queued task that scheduler
+        submitted, if there is one, and returns whether it did.  Other
+        work is left alone since it might depend on the blocked task
+        finishing."""
+
+        if not pending:
+            return False
+        try:
+            item, _ = pending.popitem()
+        except KeyError:
+            # Claimed by a worker since we looked
+            return False
+        self._taken()
+        item.run()
+        return True
+
+    def pending(self) -> int:
+        """Returns the number of queued tasks that have not started."""
+
+        with self.cond:
+            return max(0, self.queued)
+
+    def shutdown(self, wait: bool = True):
+        """Stops the workers once the queued tasks have run."""
+
+        with self.cond:
+            self.stopping = True
+            self.cond.notify_all()
+            threads = [thread for thread in self.threads if thread is not None]
+        if wait:
+            for thread in threads:
+                thread.join()
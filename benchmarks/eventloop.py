@@ -0,0 +1,38 @@
+import argparse
+import sys
+
+import agentgraph.config
+from agentgraph.exec.engine import get_loop_factory
+from benchmarks.scheduler import run_workload
+
+LOOPS = ["asyncio", "uvloop"]
+
+def main(argv: list):
+    parser = argparse.ArgumentParser(description="Compares LLM agent throughput across event loop implementations")
+    parser.add_argument("workloads", nargs="*", default=["stream", "llm"], help="workloads to run (default: stream llm)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies the size of each workload")
+    parser.add_argument("--loops", type=int, default=1, help="number of engine event loops")
+    args = parser.parse_args(argv)
+
+    agentgraph.config.VERBOSE = 0
+    agentgraph.config.TIMING = 0
+    agentgraph.config.DEBUG_PATH = None
+    agentgraph.config.EVENT_LOOP_COUNT = args.loops
+
+    print(f"{'workload':10} {'loop':10} {'tasks/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'speedup':>8}")
+    for name in args.workloads:
+        baseline = None
+        for loop in LOOPS:
+            try:
+                get_loop_factory(loop)
+            except ImportError:
+                print(f"{name:10} {loop:10} not installed")
+                continue
+            agentgraph.config.EVENT_LOOP = loop
+            metrics = run_workload(name, args.scale)
+            if baseline is None:
+                baseline = metrics["tasks_per_s"]
+            print(f"{name:10} {loop:10} {metrics['tasks_per_s']:10.1f} {metrics['latency_p50_ms']:9.2f} {metrics['latency_p99_ms']:9.2f} {metrics['tasks_per_s'] / baseline:7.2f}x")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
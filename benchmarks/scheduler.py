@@ -0,0 +1,334 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+import agentgraph
+import agentgraph.config
+from agentgraph.core.mutable import Mutable, ReadOnly, ReadOnlyProxy
+from agentgraph.exec.engine import Engine
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+class Recorder:
+    """Collects per task dispatch latencies (submit to start)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.engine = None
+
+    def record(self, submitted: float):
+        latency = time.perf_counter() - submitted
+        with self.lock:
+            self.latencies.append(latency)
+
+class Counter(Mutable):
+    """Minimal Mutable that supports read only access."""
+
+    def __init__(self, owner = None):
+        super().__init__(owner)
+        self.value = 0
+
+    def get(self) -> int:
+        self.wait_for_read_access()
+        return self.value
+
+    def increment(self):
+        self.wait_for_access()
+        self.value += 1
+
+    def _get_read_only_proxy(self):
+        return CounterReader(self)
+
+class CounterReader(ReadOnlyProxy):
+    def __init__(self, counter: Counter):
+        self._mutable = counter
+
+    def get(self) -> int:
+        return self._mutable.get()
+
+def percentile(values: list, p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))
+    return values[index]
+
+def new_scheduler(recorder: Recorder, model = None, concurrency: int = 0):
+    if model is None:
+        model = agentgraph.MockLLMModel()
+    recorder.engine = Engine(concurrency = concurrency)
+    return agentgraph.get_root_scheduler(model, recorder.engine)
+
+def independent(recorder: Recorder, size: int) -> int:
+    """Independent python agents."""
+
+    def task(scheduler, submitted):
+        recorder.record(submitted)
+        return []
+
+    scheduler = new_scheduler(recorder)
+    for i in range(size):
+        scheduler.run_python_agent(task, pos=[time.perf_counter()])
+    scheduler.shutdown()
+    return size
+
+def independent_batch(recorder: Recorder, size: int) -> int:
+    """Independent python agents submitted with run_python_agents."""
+
+    def task(scheduler, submitted):
+        recorder.record(submitted)
+        return []
+
+    scheduler = new_scheduler(recorder)
+    submitted = time.perf_counter()
+    scheduler.run_python_agents(task, [[submitted] for i in range(size)])
+    scheduler.shutdown()
+    return size
+
+def scoreboard_chain(recorder: Recorder, size: int) -> int:
+    """Alternating runs of readers and writers of one Mutable."""
+
+    def reader(scheduler, counter, submitted):
+        recorder.record(submitted)
+        counter.get()
+        return []
+
+    def writer(scheduler, counter, submitted):
+        recorder.record(submitted)
+        counter.increment()
+        return []
+
+    scheduler = new_scheduler(recorder)
+    counter = Counter()
+    for i in range(size):
+        if i % 4 == 3:
+            scheduler.run_python_agent(writer, pos=[counter, time.perf_counter()])
+        else:
+            scheduler.run_python_agent(reader, pos=[ReadOnly(counter), time.perf_counter()])
+    scheduler.shutdown()
+    return size
+
+def nested(recorder: Recorder, size: int) -> int:
+    """Chains of nested python agents, each stalling on get_value()
+    of its child."""
+
+    depth = 16
+    def node(scheduler, level, submitted):
+        recorder.record(submitted)
+        if level == 0:
+            return [0]
+        child = scheduler.run_python_agent(node, pos=[level - 1, time.perf_counter()], numOuts=1)
+        return [child.get_value() + 1]
+
+    scheduler = new_scheduler(recorder)
+    roots = max(1, size // depth)
+    outs = [scheduler.run_python_agent(node, pos=[depth - 1, time.perf_counter()], numOuts=1) for i in range(roots)]
+    for out in outs:
+        out.get_value()
+    scheduler.shutdown()
+    return roots * depth
+
+def fan_in(recorder: Recorder, size: int) -> int:
+    """Wide VarSet and VarDict fan-in."""
+
+    def produce(scheduler, i, submitted):
+        recorder.record(submitted)
+        return [i]
+
+    def consume(scheduler, s, d, submitted):
+        recorder.record(submitted)
+        return [len(s) + len(d)]
+
+    scheduler = new_scheduler(recorder)
+    varset = agentgraph.VarSet()
+    vardict = agentgraph.VarDict()
+    for i in range(size):
+        var = scheduler.run_python_agent(produce, pos=[i, time.perf_counter()], numOuts=1)
+        varset.add(var)
+        vardict[i] = var
+    out = scheduler.run_python_agent(consume, pos=[varset, vardict, time.perf_counter()], numOuts=1)
+    out.get_value()
+    scheduler.shutdown()
+    return size + 1
+
+def held(recorder: Recorder, size: int) -> int:
+    """Python agents held in the window behind one gate task, so the
+    peak memory is dominated by the scheduler's per task state."""
+
+    release = threading.Event()
+    def gate(scheduler):
+        release.wait()
+        return [0]
+
+    def task(scheduler, value, submitted):
+        recorder.record(submitted)
+        return []
+
+    scheduler = new_scheduler(recorder)
+    var = scheduler.run_python_agent(gate, numOuts=1)
+    for i in range(size):
+        scheduler.run_python_agent(task, pos=[var, time.perf_counter()])
+    release.set()
+    scheduler.shutdown()
+    return size
+
+def llm(recorder: Recorder, size: int) -> int:
+    """Independent LLM agents against a zero latency mock model."""
+
+    submitted = dict()
+    def respond(messages, tools, llmopts):
+        recorder.record(submitted[messages[-1]["content"]])
+        return "answer"
+
+    model = agentgraph.MockLLMModel(respond)
+    scheduler = new_scheduler(recorder, model)
+    varmap = agentgraph.VarMap()
+    system = varmap.map_to_str(val="system")
+    outs = []
+    for i in range(size):
+        question = varmap.map_to_str(val=f"question {i}")
+        submitted[f"question {i}"] = time.perf_counter()
+        outs.append(scheduler.run_llm_agent(msg=system ** question, vmap=varmap))
+        varmap = agentgraph.VarMap()
+    for out in outs:
+        out.get_value()
+    scheduler.shutdown()
+    return size
+
+def stream(recorder: Recorder, size: int) -> int:
+    """Concurrent streamed LLM agents, so the time goes into the event
+    loop's timer and callback handling."""
+
+    submitted = dict()
+    def respond(messages, tools, llmopts):
+        recorder.record(submitted[messages[-1]["content"]])
+        return "answer"
+
+    model = agentgraph.MockLLMModel(respond, latency=0.001, chunk_latency=0.0001, chunks=STREAM_CHUNKS, stream=True)
+    scheduler = new_scheduler(recorder, model, STREAM_CONCURRENCY)
+    outs = []
+    for i in range(size):
+        varmap = agentgraph.VarMap()
+        system = varmap.map_to_str(val="system")
+        question = varmap.map_to_str(val=f"question {i}")
+        submitted[f"question {i}"] = time.perf_counter()
+        outs.append(scheduler.run_llm_agent(msg=system ** question, vmap=varmap))
+    for out in outs:
+        out.get_value()
+    scheduler.shutdown()
+    return size
+
+# Chunks per streamed response and concurrent streams
+STREAM_CHUNKS = 50
+STREAM_CONCURRENCY = 200
+
+WORKLOADS = {
+    "independent": (independent, 5000),
+    "independent_batch": (independent_batch, 5000),
+    "scoreboard_chain": (scoreboard_chain, 2000),
+    "nested": (nested, 1024),
+    "fan_in": (fan_in, 2000),
+    "held": (held, 20000),
+    "llm": (llm, 2000),
+    "stream": (stream, 2000),
+}
+
+def run_workload(name: str, scale: float) -> dict:
+    func, size = WORKLOADS[name]
+    size = max(1, int(size * scale))
+
+    recorder = Recorder()
+    start = time.perf_counter()
+    tasks = func(recorder, size)
+    wall = time.perf_counter() - start
+
+    # Separate pass for memory since tracing slows execution down
+    tracemalloc.start()
+    func(Recorder(), size)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = recorder.latencies
+    completions = recorder.engine.get_completion_stats()
+    return {
+        "tasks": tasks,
+        "wall_s": wall,
+        "tasks_per_s": tasks / wall,
+        "overhead_us_per_task": wall / tasks * 1e6,
+        "latency_p50_ms": percentile(latencies, 50) * 1e3,
+        "latency_p99_ms": percentile(latencies, 99) * 1e3,
+        "peak_memory_bytes": peak,
+        "bytes_per_task": peak / tasks,
+        "completion_apply_mean_us": completions["mean_latency"] * 1e6,
+        "completion_apply_max_us": completions["max_latency"] * 1e6,
+    }
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(old: dict, new: dict):
+    """Prints the ratio new/old for each metric."""
+
+    print(f"Comparing {old['revision']} -> {new['revision']}")
+    print(f"{'workload':18} {'metric':22} {'old':>14} {'new':>14} {'ratio':>8}")
+    for name, metrics in new["workloads"].items():
+        if name not in old["workloads"]:
+            continue
+        oldmetrics = old["workloads"][name]
+        for metric, value in metrics.items():
+            oldvalue = oldmetrics.get(metric)
+            if not oldvalue:
+                continue
+            print(f"{name:18} {metric:22} {oldvalue:14.3f} {value:14.3f} {value / oldvalue:7.2f}x")
+
+def main(argv: list):
+    parser = argparse.ArgumentParser(description="Scheduler benchmarks")
+    parser.add_argument("workloads", nargs="*", help="workloads to run (default: all)")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies the size of each workload")
+    parser.add_argument("--out", help="JSON result file (default: benchmarks/results/REVISION.json)")
+    parser.add_argument("--compare", help="earlier JSON result file to compare against")
+    parser.add_argument("--loops", type=int, default=1, help="number of engine event loops")
+    parser.add_argument("--loop", default="asyncio", help="event loop implementation (asyncio, uvloop or auto)")
+    args = parser.parse_args(argv)
+
+    agentgraph.config.VERBOSE = 0
+    agentgraph.config.TIMING = 0
+    agentgraph.config.DEBUG_PATH = None
+    agentgraph.config.EVENT_LOOP_COUNT = args.loops
+    agentgraph.config.EVENT_LOOP = args.loop
+
+    names = args.workloads if args.workloads else list(WORKLOADS)
+    revision = git_revision()
+    results = {
+        "revision": revision,
+        "python": platform.python_version(),
+        "scale": args.scale,
+        "loops": args.loops,
+        "loop": args.loop,
+        "workloads": {},
+    }
+    for name in names:
+        metrics = run_workload(name, args.scale)
+        results["workloads"][name] = metrics
+        print(f"{name:18} {metrics['tasks']:7d} tasks {metrics['tasks_per_s']:10.1f} tasks/s {metrics['overhead_us_per_task']:9.1f} us/task p50 {metrics['latency_p50_ms']:8.2f} ms p99 {metrics['latency_p99_ms']:8.2f} ms peak {metrics['peak_memory_bytes'] / 1e6:8.2f} MB {metrics['bytes_per_task']:8.0f} B/task")
+
+    out = Path(args.out) if args.out is not None else RESULTS_DIR / f"{revision}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, indent=2))
+    print(f"Results written to {out}")
+
+    if args.compare is not None:
+        compare(json.loads(Path(args.compare).read_text()), results)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
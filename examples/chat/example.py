@@ -3,7 +3,7 @@ import os
 import time
 
 
-model = agentgraph.LLMModel("https://demskygroupgpt4.openai.azure.com/", os.getenv("OPENAI_API_KEY"), "GPT4-8k", "GPT-32K", 34000)
+model = agentgraph.LLMModel("https://demskygroupgpt4.openai.azure.com/", os.getenv("OPENAI_API_KEY"), "GPT4-8k", "GPT-32K", 8192)
 scheduler = agentgraph.get_root_scheduler(model)
 prompts = agentgraph.Prompts("./examples/chat/prompts/")
 
@@ -6,7 +6,7 @@ import subprocess
 from .file_utils import *
 
 
-model = agentgraph.LLMModel("https://demskygroupgpt4.openai.azure.com/", os.getenv("OPENAI_API_KEY"), "GPT4-8k", "GPT-32K", 34000)
+model = agentgraph.LLMModel("https://demskygroupgpt4.openai.azure.com/", os.getenv("OPENAI_API_KEY"), "GPT4-8k", "GPT-32K", 8192)
 scheduler = agentgraph.get_root_scheduler(model)
 cur_dir = os.path.dirname(os.path.abspath(__file__))
 prompts = agentgraph.Prompts(cur_dir + "/prompts/")
@@ -24,7 +24,7 @@ def get_n_day_weather_forecast(location: str, format: str, num_days: int):
     '''
     return ["70°F, cloudy", "75°F, sunny"]
 
-model = agentgraph.LLMModel("https://demskygroupgpt4.openai.azure.com/", os.getenv("OPENAI_API_KEY"), "GPT4-8k", "GPT-32K", 34000, "2023-12-01-preview")
+model = agentgraph.LLMModel("https://demskygroupgpt4.openai.azure.com/", os.getenv("OPENAI_API_KEY"), "GPT4-8k", "GPT-32K", 8192, "2023-12-01-preview")
 scheduler = agentgraph.get_root_scheduler(model)
 cur_dir = os.path.dirname(os.path.abspath(__file__))
 prompts = agentgraph.Prompts(cur_dir + "/prompts/")
@@ -46,7 +46,7 @@ def testFuncB3(scheduler, i, start) -> list:
     print("TestB3", i, time.time() - start)
     return [i + 1]
 
-model = agentgraph.LLMModel("https://demskygroupgpt4.openai.azure.com/", os.getenv("OPENAI_API_KEY"), "GPT4-8k", "GPT-32K", 34000)
+model = agentgraph.LLMModel("https://demskygroupgpt4.openai.azure.com/", os.getenv("OPENAI_API_KEY"), "GPT4-8k", "GPT-32K", 8192)
 NUM_THREADS = 1
 scheduler = agentgraph.get_root_scheduler(model, Engine(concurrency=NUM_THREADS))
 start = time.time()
@@ -34,7 +34,7 @@ prompts = agentgraph.Prompts(cur_dir + "/prompts/")
 sys = prompts.load_prompt("System")
 toollist = agentgraph.tools_from_functions([reg.setValue])
 callVar = agentgraph.Var("Call")
-model = agentgraph.LLMModel("https://demskygroupgpt4.openai.azure.com/", os.getenv("OPENAI_API_KEY"), "GPT4-8k", "GPT-32K", 34000, api_version="2023-12-01-preview")
+model = agentgraph.LLMModel("https://demskygroupgpt4.openai.azure.com/", os.getenv("OPENAI_API_KEY"), "GPT4-8k", "GPT-32K", 8192, api_version="2023-12-01-preview")
 scheduler = agentgraph.get_root_scheduler(model)
 
 for i in range(1, 11, 2):
@@ -0,0 +1,53 @@
+import agentgraph
+import asyncio
+import os
+
+COUNT = 1000
+started = 0
+
+async def gather(scheduler, i: int) -> list:
+    # Only finishes if all of the agents run at once, which is far
+    # more than there are pool threads
+    global started
+    started += 1
+    for tries in range(5000):
+        if started >= COUNT:
+            break
+        await asyncio.sleep(0.001)
+    return [started >= COUNT]
+
+def square(scheduler, x: int) -> list:
+    return [x * x]
+
+async def fetch(scheduler, x: int) -> list:
+    child = scheduler.run_python_agent(square, pos=[x], numOuts=1)
+    value = await child.get_value_async()
+    # Vars we return are read for us
+    return [value, scheduler.run_python_agent(square, pos=[value], numOuts=1)]
+
+def append(scheduler, fs) -> list:
+    fs["log"] = fs["log"] + " child"
+    return []
+
+async def log(scheduler, fs) -> list:
+    fs["log"] = "parent"
+    scheduler.run_python_agent(append, pos=[fs])
+    # The child owns fs now, so wait for it
+    await fs.wait_for_access_async()
+    fs["log"] = fs["log"] + " done"
+    return []
+
+model = agentgraph.LLMModel("https://demskygroupgpt4.openai.azure.com/", os.getenv("OPENAI_API_KEY"), "GPT4-8k", "GPT-32K", 8192)
+scheduler = agentgraph.get_root_scheduler(model)
+
+outs = [scheduler.run_python_agent(gather, pos=[i], numOuts=1) for i in range(COUNT)]
+print(all(out.get_value() for out in outs))
+
+first, second = scheduler.run_python_agent(fetch, pos=[3], numOuts=2)
+print(first.get_value(), second.get_value())
+
+fs = agentgraph.FileStore()
+scheduler.run_python_agent(log, pos=[fs])
+print(fs["log"])
+
+scheduler.shutdown()
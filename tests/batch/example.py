@@ -0,0 +1,30 @@
+import agentgraph
+import os
+
+def square(scheduler, x: int) -> list:
+    return [x * x]
+
+def record(scheduler, fs, key: str) -> list:
+    fs[key] = str(len(fs.get_files()))
+    return []
+
+def total(scheduler, values) -> list:
+    return [sum(values)]
+
+model = agentgraph.LLMModel("https://demskygroupgpt4.openai.azure.com/", os.getenv("OPENAI_API_KEY"), "GPT4-8k", "GPT-32K", 8192)
+scheduler = agentgraph.get_root_scheduler(model)
+
+squares = scheduler.run_python_agents(square, [[i] for i in range(10)], numOuts=1)
+print([v.get_value() for v in squares])
+
+fs = agentgraph.FileStore()
+scheduler.run_python_agents(record, [[fs, f"f{i}"] for i in range(5)])
+for key in sorted(fs.get_files()):
+    print(key, fs[key])
+
+varset = agentgraph.VarSet()
+for v in squares:
+    varset.add(v)
+print(scheduler.run_python_agent(total, pos=[varset], numOuts=1).get_value())
+
+scheduler.shutdown()
@@ -0,0 +1,78 @@
+import agentgraph
+import agentgraph.config
+import os
+import time
+
+agentgraph.config.VERBOSE = 0
+
+times = dict()
+# Slow LLM agents run on the event loop, so a task waiting in our
+# scheduler can never pick them up and block on them
+slow = agentgraph.MockLLMModel("answer", latency=0.5)
+
+def ask(scheduler):
+    varmap = agentgraph.VarMap()
+    question = varmap.map_to_str(val="Question")
+    return scheduler.run_llm_agent(msg=varmap.map_to_str(val="You are a test.") ** question, model=slow, vmap=varmap)
+
+def done(scheduler, name, answer) -> list:
+    times[name] = time.monotonic()
+    return []
+
+def spawn(scheduler, value: int) -> list:
+    # Returns while its child tasks are still running
+    scheduler.run_python_agent(done, pos=["background", ask(scheduler)])
+    return [value]
+
+def outer(scheduler) -> list:
+    inner = scheduler.run_python_agent(spawn, pos=[1], numOuts=1)
+    return [inner.get_value() + 1]
+
+def release(scheduler, value: int) -> list:
+    times["release"] = time.monotonic()
+    return [value]
+
+def hold(scheduler, fs) -> list:
+    # Our children do not touch fs, so the parent can have it back
+    scheduler.run_python_agent(done, pos=["held", ask(scheduler)])
+    fs["a"] = "1"
+    return []
+
+def write(scheduler, fs) -> list:
+    fs["a"] = "2"
+    times["write"] = time.monotonic()
+    return []
+
+def slow_write(scheduler, fs) -> list:
+    time.sleep(0.2)
+    fs["a"] = "child"
+    return []
+
+def create(scheduler) -> list:
+    # The output is still being written by our child
+    fs = agentgraph.FileStore()
+    scheduler.run_python_agent(slow_write, pos=[fs])
+    return [fs]
+
+def read(scheduler, fs) -> list:
+    return [fs["a"]]
+
+model = agentgraph.LLMModel("https://demskygroupgpt4.openai.azure.com/", os.getenv("OPENAI_API_KEY"), "GPT4-8k", "GPT-32K", 8192)
+scheduler = agentgraph.get_root_scheduler(model)
+
+value = scheduler.run_python_agent(outer, numOuts=1)
+out = scheduler.run_python_agent(release, pos=[value], numOuts=1)
+print(out.get_value())
+
+fs = agentgraph.FileStore()
+scheduler.run_python_agent(hold, pos=[fs])
+scheduler.run_python_agent(write, pos=[fs])
+print(fs["a"])
+
+created = scheduler.run_python_agent(create, numOuts=1)
+print(scheduler.run_python_agent(read, pos=[created], numOuts=1).get_value())
+
+scheduler.shutdown()
+# Whether the dependent tasks ran before the children of the tasks
+# they depend on finished
+print(times["release"] < times["background"], times["write"] < times["held"])
@@ -0,0 +1,52 @@
+import agentgraph
+import agentgraph.config
+import asyncio
+import threading
+from agentgraph.exec.engine import Engine
+
+agentgraph.config.DEBUG_PATH = None
+agentgraph.config.VERBOSE = 0
+
+otherRan = threading.Event()
+askDone = threading.Event()
+
+class GatedModel(agentgraph.MockLLMModel):
+    """Answers once the other agent has run."""
+
+    async def send_data(self, message_to_send, tools, llmopts):
+        ran = await asyncio.get_running_loop().run_in_executor(None, otherRan.wait, 30)
+        print("other ran first:", ran)
+        return await super().send_data(message_to_send, tools, llmopts)
+
+def ask(scheduler) -> list:
+    # Nothing to steal while the LLM agent runs, so our thread sleeps
+    varmap = agentgraph.VarMap()
+    system = varmap.map_to_str(val="You are a test.")
+    question = varmap.map_to_str(val="Question")
+    out = scheduler.run_llm_agent(msg=system ** question, vmap=varmap)
+    answer = out.get_value()
+    askDone.set()
+    return [answer]
+
+def other(scheduler) -> list:
+    otherRan.set()
+    return []
+
+model = GatedModel("answer")
+engine = Engine(concurrency=1)
+scheduler = agentgraph.get_root_scheduler(model, engine)
+
+answer = scheduler.run_python_agent(ask, numOuts=1)
+# other can only run on a compensating worker while ask is blocked
+scheduler.run_python_agent(other)
+# Wait on the event rather than on answer, since waiting from here
+# would run other on this thread
+askDone.wait()
+print(answer.get_value())
+
+# The compensating worker exits once it has been idle for a while
+pool = engine.threadPool
+with pool.cond:
+    print(pool.allIdle.wait_for(lambda: pool.num_workers == 1 and pool.idle == 1, 30))
+
+scheduler.shutdown()
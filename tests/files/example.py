@@ -11,7 +11,7 @@ def testFunc2(scheduler, fs) -> list:
     fs["a"] = fs["a"] + "2"
     return [4]
 
-model = agentgraph.LLMModel("https://demskygroupgpt4.openai.azure.com/", os.getenv("OPENAI_API_KEY"), "GPT4-8k", "GPT-32K", 34000)
+model = agentgraph.LLMModel("https://demskygroupgpt4.openai.azure.com/", os.getenv("OPENAI_API_KEY"), "GPT4-8k", "GPT-32K", 8192)
 scheduler = agentgraph.get_root_scheduler(model)
 fs = agentgraph.FileStore()
 fs["a"]="0"
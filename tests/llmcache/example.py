@@ -0,0 +1,63 @@
+import contextlib
+import io
+import tempfile
+
+from agentgraph.core.llmcache import LLMCache, LogCache, LRUCache, SqliteCache, flush_writes, lookup_entry, open_cache, store_entry
+
+class BrokenCache(LLMCache):
+    def lookup(self, hash: str, encoded: str):
+        return None
+
+    def store(self, hash: str, encoded: str, value: str):
+        raise OSError("disk full")
+
+broken = BrokenCache()
+store_entry(broken, "0", "request", "response")
+# The error is also printed by the cache thread
+try:
+    with contextlib.redirect_stdout(io.StringIO()):
+        flush_writes()
+except OSError as e:
+    print("flush failed:", e)
+print(lookup_entry(broken, "0", "request"))
+flush_writes()
+print("flushed")
+
+for kind, reopen in (("log", LogCache), ("sqlite", SqliteCache)):
+    with tempfile.TemporaryDirectory() as path:
+        cache = open_cache(path, kind)
+        store_entry(cache, "1", "request", "response")
+        store_entry(cache, "1", "request2", "response2")
+        print(kind, "pending:", lookup_entry(cache, "1", "request"))
+        flush_writes()
+        print(kind, "stored:", lookup_entry(cache, "1", "request2"))
+        print(kind, "missing:", lookup_entry(cache, "1", "request3"))
+        cache.close()
+        # A fresh instance reads the entries back from disk
+        cache = reopen(path)
+        print(kind, "reopened:", cache.lookup("1", "request"), cache.lookup("1", "request2"))
+        cache.close()
+
+lru = LRUCache(max_entries = 2, max_bytes = 100)
+lru.put("a", "ka", {"content": "A", "tool_calls": [{"id": 1}]}, 10)
+lru.put("b", "kb", {"content": "B"}, 10)
+lru.get("a", "ka")
+# Evicts b, the least recently used entry
+lru.put("c", "kc", {"content": "C"}, 10)
+print("lru count:", sorted(lru.entries), lru.get("b", "kb"))
+# Evicts by size
+sized = LRUCache(max_entries = 10, max_bytes = 100)
+for key in "xyz":
+    sized.put(key, "k" + key, {"content": key}, 40)
+print("lru bytes:", sorted(sized.entries), sized.bytes)
+# Entries that are too large are not cached
+lru.put("e", "ke", {"content": "E"}, 101)
+print("lru oversized:", lru.get("e", "ke"))
+# Hash collisions miss
+print("lru collision:", lru.get("c", "kx"))
+lru = LRUCache(max_entries = 2, max_bytes = 100)
+lru.put("a", "ka", {"content": "A", "tool_calls": [{"id": 1}]}, 10)
+response = lru.get("a", "ka")
+response["tool_calls"][0]["id"] = 2
+print("lru copy:", lru.get("a", "ka"))
+print("lru hits:", lru.hits, "misses:", lru.misses)
@@ -0,0 +1,134 @@
+import asyncio
+from types import SimpleNamespace
+
+import tiktoken
+from openai import BadRequestError
+
+import agentgraph.config
+from agentgraph.core.llmmodel import LLMModel
+from agentgraph.core.modelrouter import ModelTier, TieredRouter
+
+agentgraph.config.DEBUG_PATH = None
+agentgraph.config.TIMING = 0
+
+class StubModel(LLMModel):
+    """LLMModel whose endpoint requests wait for release."""
+
+    def __init__(self):
+        super().__init__(None, "fake", "small", "large", 1000, useOpenAI=True, tokenizer_str=None)
+        self.sent = 0
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def _send_request(self, request_params, encoded, message_to_send, tools):
+        self.sent += 1
+        self.started.set()
+        await self.release.wait()
+        return {"role": "assistant", "content": "Response " + str(self.sent)}
+
+async def coalescing():
+    model = StubModel()
+    msg = [{"role": "user", "content": "Hi"}]
+    leader = asyncio.create_task(model.send_data(msg, None, None))
+    await model.started.wait()
+    followers = [asyncio.create_task(model.send_data(msg, None, None)) for _ in range(2)]
+    await asyncio.sleep(0)
+    # Cancelling the leader hands the request to a follower
+    model.started.clear()
+    leader.cancel()
+    try:
+        await asyncio.wait_for(model.started.wait(), 10)
+    except asyncio.TimeoutError:
+        print("no follower took over")
+    model.release.set()
+    try:
+        await leader
+    except asyncio.CancelledError:
+        print("leader cancelled")
+    for follower in followers:
+        print(await follower)
+    print("requests sent:", model.sent)
+
+async def follower_cancel():
+    model = StubModel()
+    msg = [{"role": "user", "content": "Hello"}]
+    leader = asyncio.create_task(model.send_data(msg, None, None))
+    await model.started.wait()
+    followers = [asyncio.create_task(model.send_data(msg, None, None)) for _ in range(2)]
+    await asyncio.sleep(0)
+    # Cancelling a follower leaves the shared request alone
+    followers[0].cancel()
+    await asyncio.sleep(0)
+    model.release.set()
+    print(await leader)
+    print(await followers[1])
+    print("follower cancelled:", followers[0].cancelled(), "requests sent:", model.sent, "coalesced:", model.coalesced_requests)
+
+asyncio.run(coalescing())
+asyncio.run(follower_cancel())
+
+class CountingEncoding:
+    """Splits on whitespace and counts encode calls."""
+
+    def __init__(self):
+        self.encoded = 0
+
+    def encode(self, text):
+        self.encoded += 1
+        return text.split()
+
+resolved = []
+def encoding_for_model(name):
+    resolved.append(name)
+    return encoding
+
+# Avoids downloading the real encodings
+encoding = CountingEncoding()
+tiktoken.encoding_for_model = encoding_for_model
+
+model = LLMModel(None, "fake", "small", "large", 1000, useOpenAI=True)
+conversation = [{"role": "system", "content": "You are a test."}, {"role": "user", "content": "Hi there"}]
+print("tokens:", model.num_tokens_from_messages(conversation, model.tokenizer_str), "encoded:", encoding.encoded)
+conversation += [{"role": "assistant", "content": "Hello"}, {"role": "user", "content": "Bye now"}]
+# Only the new messages get encoded
+print("tokens:", model.num_tokens_from_messages(conversation, model.tokenizer_str), "encoded:", encoding.encoded)
+print("tokens:", model.num_tokens_from_messages(conversation, model.tokenizer_str), "encoded:", encoding.encoded)
+print("resolved:", resolved)
+
+router = TieredRouter([ModelTier("small", 100), ModelTier("medium", 1000), ModelTier("large")], completion_reserve=50)
+print("select:", router.select(40, None), router.select(60, None), router.select(60, 10), router.select(5000, None))
+print("escalate:", router.escalate(0), router.escalate(1), router.escalate(2))
+
+def bad_request(message):
+    # The endpoint's HTTP response is not needed
+    error = BadRequestError.__new__(BadRequestError)
+    Exception.__init__(error, message)
+    return error
+
+class FakeCompletions:
+    """Records the model of each request and rejects the small model
+    for prompts mentioning "reject"."""
+
+    def __init__(self):
+        self.models = []
+
+    async def create(self, messages, model, **kwargs):
+        self.models.append(model)
+        if model == "small" and "reject" in messages[-1]["content"]:
+            raise bad_request("context length exceeded")
+        message = {"role": "assistant", "content": "From " + model}
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(model_dump=lambda exclude_unset: dict(message)))], usage=SimpleNamespace(prompt_tokens=1, completion_tokens=1))
+
+async def routing():
+    # No tokenizer, so prompt sizes are estimated from their length
+    model = LLMModel(None, "fake", "small", "large", 20, useOpenAI=True, tokenizer_str=None)
+    completions = FakeCompletions()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    model._get_client = lambda: client
+    await model.send_data([{"role": "user", "content": "Short"}], None, None)
+    await model.send_data([{"role": "user", "content": "Long " * 40}], None, None)
+    await model.send_data([{"role": "user", "content": "Short, long answer"}], None, {"max_tokens": 100})
+    await model.send_data([{"role": "user", "content": "Please reject"}], None, None)
+    print("models:", completions.models)
+
+asyncio.run(routing())
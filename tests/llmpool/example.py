@@ -0,0 +1,64 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from openai import AuthenticationError, RateLimitError
+
+import agentgraph.config
+from agentgraph.core.llmmodel import LLMModel, LLMRetryError
+from agentgraph.core.llmpool import LLMModelPool
+from agentgraph.core.mockmodel import MockLLMModel
+
+agentgraph.config.DEBUG_PATH = None
+agentgraph.config.TIMING = 0
+
+def endpoint_error(kind, message):
+    # The endpoint's HTTP response is not needed
+    error = kind.__new__(kind)
+    Exception.__init__(error, message)
+    return error
+
+class RateLimitedCompletions:
+    def __init__(self):
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        raise endpoint_error(RateLimitError, "rate limited")
+
+async def failover():
+    limited = LLMModel(None, "fake", "small", "large", 1000, useOpenAI=True, tokenizer_str=None)
+    completions = RateLimitedCompletions()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    limited._get_client = lambda: client
+    backup = MockLLMModel(responses="Backup response", latency=0.01)
+    pool = LLMModelPool([limited, backup])
+    print("client retries:", limited.client.max_retries)
+    start = time.monotonic()
+    print(await pool.send_data([{"role": "user", "content": "Hi"}], None, None))
+    # The rate limited endpoint must not retry before failing over
+    print("fast failover:", time.monotonic() - start < 1, "endpoint calls:", completions.calls, "failovers:", pool.failovers)
+
+asyncio.run(failover())
+
+def failing(error):
+    attempts = []
+    def respond(messages, tools, llmopts):
+        attempts.append(error)
+        raise endpoint_error(error, "failed")
+    return respond, attempts
+
+async def exhausted(error):
+    respond1, attempts1 = failing(error)
+    respond2, attempts2 = failing(error)
+    pool = LLMModelPool([MockLLMModel(responses=respond1), MockLLMModel(responses=respond2)])
+    try:
+        await pool.send_data([{"role": "user", "content": "Hi"}], None, None)
+    except Exception as e:
+        print(type(e).__name__, "after", len(attempts1) + len(attempts2), "attempts")
+
+agentgraph.config.LLM_MAX_RETRIES = 2
+agentgraph.config.LLM_BACKOFF_BASE = 0
+# Rate limits are retried by the pool, authentication errors are not
+asyncio.run(exhausted(RateLimitError))
+asyncio.run(exhausted(AuthenticationError))
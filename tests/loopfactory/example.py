@@ -0,0 +1,33 @@
+import agentgraph
+import agentgraph.config
+import asyncio
+from agentgraph.exec.engine import Engine
+
+agentgraph.config.DEBUG_PATH = None
+agentgraph.config.VERBOSE = 0
+
+created = []
+
+def factory():
+    loop = asyncio.new_event_loop()
+    created.append(loop)
+    return loop
+
+engine = Engine(concurrency=4, loops=2, loopFactory=factory)
+scheduler = agentgraph.get_root_scheduler(agentgraph.MockLLMModel("answer"), engine)
+varmap = agentgraph.VarMap()
+question = varmap.map_to_str(val="Question")
+out = scheduler.run_llm_agent(msg=varmap.map_to_str(val="You are a test.") ** question, vmap=varmap)
+print(out.get_value())
+print(len(created), created[0] is engine.loop)
+scheduler.shutdown()
+
+try:
+    Engine(loopFactory="bogus")
+except ValueError as e:
+    print(e)
+
+# uvloop is only used when asked for
+engine = Engine(concurrency=1)
+print(type(engine.loop).__module__.split(".")[0])
+engine.shutdown()
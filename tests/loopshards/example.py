@@ -0,0 +1,46 @@
+import agentgraph
+import agentgraph.config
+import threading
+from agentgraph.exec.engine import Engine
+
+agentgraph.config.DEBUG_PATH = None
+agentgraph.config.VERBOSE = 0
+
+COUNT = 200
+loops = set()
+lock = threading.Lock()
+
+def respond(messages, tools, llmopts):
+    with lock:
+        loops.add(threading.current_thread().name)
+    return "Echo: " + messages[-1]["content"]
+
+async def check(scheduler, answer) -> list:
+    with lock:
+        loops.add(threading.current_thread().name)
+    return [answer.startswith("Echo")]
+
+def ask(scheduler, i) -> list:
+    # LLM agents started from a thread get spread over the loops too
+    varmap = agentgraph.VarMap()
+    question = varmap.map_to_str(val=f"Question {i}")
+    out = scheduler.run_llm_agent(msg=varmap.map_to_str(val="You are a test.") ** question, vmap=varmap)
+    return [out.get_value()]
+
+model = agentgraph.MockLLMModel(responses=respond, latency=0.01)
+engine = Engine(concurrency=16, loops=4)
+scheduler = agentgraph.get_root_scheduler(model, engine)
+
+outs = []
+for i in range(COUNT):
+    varmap = agentgraph.VarMap()
+    question = varmap.map_to_str(val=f"Question {i}")
+    outs.append(scheduler.run_llm_agent(msg=varmap.map_to_str(val="You are a test.") ** question, vmap=varmap))
+checks = [scheduler.run_python_agent(check, pos=[out], numOuts=1) for out in outs]
+nested = [scheduler.run_python_agent(ask, pos=[i], numOuts=1) for i in range(COUNT)]
+
+print(outs[7].get_value())
+print(all(check.get_value() for check in checks))
+print(nested[3].get_value())
+print(sorted(loops))
+scheduler.shutdown()
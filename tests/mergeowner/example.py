@@ -45,7 +45,7 @@ class RegisterList(agentgraph.core.mutable.Mutable):
     def pop(self, *args) -> Register:
         return self.list.pop(*args)
 
-model = agentgraph.LLMModel("https://demskygroupgpt4.openai.azure.com/", os.getenv("OPENAI_API_KEY"), "GPT4-8k", "GPT-32K", 34000)
+model = agentgraph.LLMModel("https://demskygroupgpt4.openai.azure.com/", os.getenv("OPENAI_API_KEY"), "GPT4-8k", "GPT-32K", 8192)
 scheduler = agentgraph.get_root_scheduler(model)
 reg = Register()
 reglist = RegisterList()
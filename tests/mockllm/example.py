@@ -0,0 +1,43 @@
+import agentgraph
+import agentgraph.config
+
+agentgraph.config.DEBUG_PATH = None
+agentgraph.config.VERBOSE = 0
+
+def add(a: int, b: int):
+    """Adds two numbers
+
+    Arguments:
+    a --- first number
+    b --- second number
+    """
+    return a + b
+
+def respond(messages, tools, llmopts):
+    if tools is not None:
+        return {"content": None, "tool_calls": [agentgraph.mock_tool_call("add", {"a": 2, "b": 3}, "call_0")]}
+    return "Echo: " + messages[-1]["content"]
+
+model = agentgraph.MockLLMModel(responses=respond, latency=("uniform", 0.01, 0.05), seed=1)
+scheduler = agentgraph.get_root_scheduler(model)
+
+varmap = agentgraph.VarMap()
+system = varmap.map_to_str(val="You are a test.")
+question = varmap.map_to_str(val="Question")
+conv = varmap.map_to_conversation()
+
+out1 = scheduler.run_llm_agent(msg=system ** question, vmap=varmap)
+out2 = scheduler.run_llm_agent(msg=system ** out1)
+out3 = scheduler.run_llm_agent(conversation=conv, msg=conv > (conv & out2 | system ** out2))
+out4, calls = scheduler.run_llm_agent(msg=system ** question, tools=agentgraph.tools_from_functions([add]))
+
+print(out1.get_value())
+print(out2.get_value())
+print(out3.get_value())
+print(out4.get_value())
+call = calls.get_value()[0]
+print(call["function"]["name"], call["function"]["arguments"], call["return"])
+print(conv.get_value().size_msgs())
+
+scheduler.shutdown()
+model.print_statistics()
@@ -1,10 +1,16 @@
 import agentgraph
 import os
+import threading
 import time
 
+# Orders the prints of the main thread and testFunc1
+started = threading.Event()
+dispatched = threading.Event()
 
 def testFunc1(scheduler, fs) -> list:
     print("testFunc1 start")
+    started.set()
+    dispatched.wait()
     scheduler.run_python_agent(testFunc2, pos=[fs])
     print("testFunc1 end")
     return []
@@ -15,13 +21,15 @@ def testFunc2(scheduler, fs) -> list:
     return []
 
 
-model = agentgraph.LLMModel("https://demskygroupgpt4.openai.azure.com/", os.getenv("OPENAI_API_KEY"), "GPT4-8k", "GPT-32K", 34000)
+model = agentgraph.LLMModel("https://demskygroupgpt4.openai.azure.com/", os.getenv("OPENAI_API_KEY"), "GPT4-8k", "GPT-32K", 8192)
 scheduler = agentgraph.get_root_scheduler(model)
 fs = agentgraph.FileStore()
 fs["a"]="0"
 scheduler.run_python_agent(testFunc1, pos=[fs])
 
+started.wait()
 print("Dispatched all")
+dispatched.set()
 print(1,fs["a"])
 
 scheduler.shutdown()
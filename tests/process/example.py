@@ -0,0 +1,59 @@
+import agentgraph
+import multiprocessing
+import os
+from agentgraph.core.mutable import ReadOnly
+
+def count_words(scheduler, text: str) -> list:
+    # Runs in a worker process, so there is no scheduler
+    return [scheduler is None, len(text.split()), multiprocessing.parent_process() is not None]
+
+def edit(scheduler, fs, suffix: str) -> list:
+    for name in fs.get_files():
+        fs[name] = fs[name] + suffix
+    fs["big"] = "y" * 100000
+    return []
+
+def summarize(scheduler, fs) -> list:
+    return [sorted((name, len(fs[name])) for name in fs)]
+
+def create(scheduler, name: str) -> list:
+    fs = agentgraph.FileStore()
+    fs[name] = "created"
+    return [fs]
+
+def read(scheduler, fs) -> list:
+    return [fs["new"]]
+
+def nested(scheduler, fs, wrapped) -> list:
+    wrapped[0][0]["nested"] = "changed"
+    return [wrapped[0][0] is fs]
+
+if __name__ == "__main__":
+    model = agentgraph.LLMModel("https://demskygroupgpt4.openai.azure.com/", os.getenv("OPENAI_API_KEY"), "GPT4-8k", "GPT-32K", 8192)
+    scheduler = agentgraph.get_root_scheduler(model)
+
+    # Large enough to go through shared memory
+    text = "word " * 50000
+    out = scheduler.run_python_agent(count_words, pos=[text], numOuts=3, useProcess=True)
+    print([v.get_value() for v in out])
+
+    fs = agentgraph.FileStore()
+    fs["a"] = "x"
+    fs["b"] = "x" * 70000
+    scheduler.run_python_agent(edit, pos=[fs, "!"], useProcess=True)
+    sizes = scheduler.run_python_agent(summarize, pos=[ReadOnly(fs)], numOuts=1, useProcess=True)
+    print(sizes.get_value())
+    print(fs["a"], len(fs["b"]), fs["big"][:3])
+
+    created = scheduler.run_python_agent(create, pos=["new"], numOuts=1, useProcess=True)
+    print(scheduler.run_python_agent(read, pos=[created], numOuts=1).get_value())
+
+    same = scheduler.run_python_agent(nested, pos=[fs, [[fs]]], numOuts=1, useProcess=True)
+    print(same.get_value(), fs["nested"])
+
+    try:
+        scheduler.run_python_agent(lambda scheduler: [], useProcess=True)
+    except TypeError:
+        print("not picklable")
+
+    scheduler.shutdown()
@@ -10,7 +10,7 @@ def testFunc2(scheduler, bar: int) -> list:
     print("TestB", bar)
     return []
 
-model = agentgraph.LLMModel("https://demskygroupgpt4.openai.azure.com/", os.getenv("OPENAI_API_KEY"), "GPT4-8k", "GPT-32K", 34000)
+model = agentgraph.LLMModel("https://demskygroupgpt4.openai.azure.com/", os.getenv("OPENAI_API_KEY"), "GPT4-8k", "GPT-32K", 8192)
 scheduler = agentgraph.get_root_scheduler(model)
 scheduler.run_python_agent(testFunc1, pos=[3])
 scheduler.run_python_agent(testFunc2, pos=[3])
@@ -0,0 +1,79 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from agentgraph.core.ratelimit import ConcurrencyLimiter, RateLimiter, TokenBucket, backoff_delay
+
+async def handoff():
+    limiter = ConcurrencyLimiter(1)
+    order = []
+
+    async def request(name):
+        await limiter.acquire()
+        order.append(name)
+
+    await limiter.acquire()
+    waiters = [asyncio.create_task(request(name)) for name in "abc"]
+    await asyncio.sleep(0)
+    # A cancelled waiter passes the slot on to the next one
+    waiters[0].cancel()
+    await asyncio.sleep(0)
+    limiter.release()
+    await waiters[1]
+    print("waiting:", len(limiter.waiters), "count:", limiter.count)
+    limiter.release()
+    await waiters[2]
+    limiter.release()
+    print("order:", order, "count:", limiter.count)
+
+asyncio.run(handoff())
+
+async def cross_loop():
+    limiter = ConcurrencyLimiter(1)
+    await limiter.acquire()
+    waiting = threading.Event()
+    acquired = threading.Event()
+
+    async def other():
+        task = asyncio.create_task(limiter.acquire())
+        while not limiter.waiters:
+            await asyncio.sleep(0)
+        waiting.set()
+        await task
+        acquired.set()
+        limiter.release()
+
+    thread = threading.Thread(target = lambda: asyncio.run(other()))
+    thread.start()
+    await asyncio.get_running_loop().run_in_executor(None, waiting.wait)
+    # The slot is handed to the waiter on the other loop
+    limiter.release()
+    await asyncio.get_running_loop().run_in_executor(None, thread.join)
+    print("other loop acquired:", acquired.is_set(), "count:", limiter.count)
+
+asyncio.run(cross_loop())
+
+bucket = TokenBucket(60, capacity = 2)
+print("bucket delays:", [round(bucket.reserve(1)) for _ in range(4)])
+
+async def rate_limited():
+    limiter = RateLimiter(max_inflight = 1, tpm = 60)
+    await limiter.acquire(60)
+    limiter.release()
+    # The bucket is empty, so a cancelled request gives its slot back
+    task = asyncio.create_task(limiter.acquire(30))
+    await asyncio.sleep(0)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    print("rate limiter count:", limiter.inflight.count)
+
+asyncio.run(rate_limited())
+
+print("backoff bounded:", all(0 <= backoff_delay(attempt, 0.5, 4) <= min(4, 0.5 * 2 ** attempt) for attempt in range(10) for _ in range(100)))
+error = SimpleNamespace(response = SimpleNamespace(headers = {"retry-after": "3"}))
+print("retry after:", backoff_delay(0, 0.5, 60, error), backoff_delay(0, 0.5, 2, error))
+error = SimpleNamespace(response = SimpleNamespace(headers = {"retry-after": "soon"}))
+print("bad retry after:", backoff_delay(0, 0.5, 60, error) <= 0.5)
@@ -1,11 +1,15 @@
 import agentgraph
 import os
-import time
+import threading
 
+# Orders the prints of the main thread and testFunc1
+started = threading.Event()
+dispatched = threading.Event()
 
 def testFunc1(scheduler, fs) -> list:
     print("testFunc1 start")
-    time.sleep(2)
+    started.set()
+    dispatched.wait()
     print(0, fs["a"])
     fs["a"]="1"
     print("testFunc1 end")
@@ -26,7 +30,7 @@ def testFunc4(scheduler, fs) -> list:
     fs["a"]="4"
     return []
 
-model = agentgraph.LLMModel("https://demskygroupgpt4.openai.azure.com/", os.getenv("OPENAI_API_KEY"), "GPT4-8k", "GPT-32K", 34000)
+model = agentgraph.LLMModel("https://demskygroupgpt4.openai.azure.com/", os.getenv("OPENAI_API_KEY"), "GPT4-8k", "GPT-32K", 8192)
 scheduler = agentgraph.get_root_scheduler(model)
 fs = agentgraph.FileStore()
 fs["a"]="0"
@@ -35,7 +39,9 @@ out2=scheduler.run_python_agent(testFunc2, numOuts=1, pos=[out])
 scheduler.run_python_agent(testFunc3, pos=[out2])
 scheduler.run_python_agent(testFunc4, pos=[fs])
 
+started.wait()
 print("Dispatched all")
+dispatched.set()
 print(4,fs["a"])
 
 scheduler.shutdown()
@@ -0,0 +1,85 @@
+from agentgraph.core.mutable import Mutable
+from agentgraph.exec.scheduler import ScheduleNode, ScoreBoard
+
+class StubScheduler:
+    """Records the tasks whose dependences cleared."""
+
+    def __init__(self):
+        self.ready = []
+
+    def _dec_dep_count(self, node):
+        self.ready.append(node.id)
+
+def show(label, scoreboard, root):
+    queue = scoreboard.accesses.get(root)
+    if queue is None:
+        print(label, "empty")
+        return
+    print(label, " ".join(("R" if n.get_is_reader() else "W") + str(sorted(w.id for w in n._get_waiters())) for n in queue.get_nodes()))
+
+scheduler = StubScheduler()
+scoreboard = ScoreBoard()
+tasks = {id: ScheduleNode(None, id) for id in range(20)}
+obj = Mutable()
+
+# Middle insertion
+print(scoreboard._add_reader(obj, tasks[1], scheduler))
+print(scoreboard._add_writer(obj, tasks[5], scheduler))
+print(scoreboard._add_writer(obj, tasks[9], scheduler))
+show("appended:", scoreboard, obj)
+print(scoreboard._add_reader(obj, tasks[7], scheduler))
+print(scoreboard._add_writer(obj, tasks[3], scheduler))
+print(scoreboard._add_reader(obj, tasks[2], scheduler))
+show("inserted:", scoreboard, obj)
+
+# A writer splits a reader node
+print(scoreboard._add_reader(obj, tasks[12], scheduler))
+print(scoreboard._add_reader(obj, tasks[14], scheduler))
+show("readers:", scoreboard, obj)
+print(scoreboard._add_writer(obj, tasks[13], scheduler))
+show("split:", scoreboard, obj)
+
+# Out of order removal of tasks that have not cleared the queue
+print(scoreboard._remove_waiter(obj, tasks[7], scheduler))
+print(scoreboard._remove_waiter(obj, tasks[13], scheduler))
+show("removed:", scoreboard, obj)
+
+# In order removal wakes the next node
+print(scoreboard._remove_waiter(obj, tasks[1], scheduler), scheduler.ready)
+print(scoreboard._remove_waiter(obj, tasks[2], scheduler), scheduler.ready)
+show("popped:", scoreboard, obj)
+
+# Merging queues that do not interleave
+source, dest = Mutable(), Mutable()
+scoreboard._add_writer(source, tasks[15], scheduler)
+scoreboard._add_reader(source, tasks[16], scheduler)
+scoreboard._add_writer(dest, tasks[10], scheduler)
+scoreboard._add_reader(dest, tasks[11], scheduler)
+scoreboard._merge_access_queues(source, dest, scheduler)
+show("disjoint source:", scoreboard, source)
+show("disjoint merge:", scoreboard, dest)
+print(scheduler in dest._get_schedulers(), scheduler in source._get_schedulers())
+
+# Merging interleaved queues merges overlapping readers
+source, dest = Mutable(), Mutable()
+for id in (2, 6):
+    scoreboard._add_reader(source, tasks[id], scheduler)
+scoreboard._add_writer(source, tasks[8], scheduler)
+scoreboard._add_reader(source, tasks[12], scheduler)
+scoreboard._add_reader(dest, tasks[3], scheduler)
+scoreboard._add_writer(dest, tasks[10], scheduler)
+for id in (11, 13):
+    scoreboard._add_reader(dest, tasks[id], scheduler)
+show("source:", scoreboard, source)
+show("dest:", scoreboard, dest)
+scoreboard._merge_access_queues(source, dest, scheduler)
+show("interleaved merge:", scoreboard, dest)
+
+# and splits readers around writers
+source, dest = Mutable(), Mutable()
+scoreboard._add_writer(source, tasks[5], scheduler)
+for id in (3, 7):
+    scoreboard._add_reader(dest, tasks[id], scheduler)
+scoreboard._add_writer(dest, tasks[9], scheduler)
+scoreboard._merge_access_queues(source, dest, scheduler)
+show("split merge:", scoreboard, dest)
@@ -0,0 +1,62 @@
+import agentgraph
+import os
+import threading
+import time
+from agentgraph.core.mutable import ReadOnly
+
+released = threading.Event()
+
+def write(scheduler, fs, value: str) -> list:
+    time.sleep(0.2)
+    fs["a"] = value
+    return []
+
+def read(scheduler, fs, wait: bool) -> list:
+    # The writer after us sets released, which only works if it does
+    # not wait for us to finish
+    if wait:
+        released.wait(5)
+    return [type(fs).__name__, fs["a"]]
+
+def release(scheduler, fs) -> list:
+    fs["a"] = "3"
+    released.set()
+    return []
+
+def nested(scheduler, fs) -> list:
+    out = scheduler.run_python_agent(read, pos=[ReadOnly(fs), False], numOuts=2)
+    return [out[0].get_value(), out[1].get_value()]
+
+def history(scheduler, conv) -> list:
+    return [type(conv).__name__, conv.size_msgs(), conv.get_msgs(0)["content"]]
+
+model = agentgraph.LLMModel("https://demskygroupgpt4.openai.azure.com/", os.getenv("OPENAI_API_KEY"), "GPT4-8k", "GPT-32K", 8192)
+scheduler = agentgraph.get_root_scheduler(model)
+
+fs = agentgraph.FileStore()
+fs["a"] = "0"
+scheduler.run_python_agent(write, pos=[fs, "1"])
+first = scheduler.run_python_agent(read, pos=[ReadOnly(fs), True], numOuts=2)
+scheduler.run_python_agent(write, pos=[fs, "2"])
+second = scheduler.run_python_agent(read, pos=[ReadOnly(fs), False], numOuts=2)
+scheduler.run_python_agent(release, pos=[fs])
+print(first[0].get_value(), first[1].get_value(), released.is_set())
+print(second[0].get_value(), second[1].get_value())
+print(fs["a"])
+
+# FileStore has no read only proxy, so this used to raise
+# NotImplementedError
+other = agentgraph.FileStore()
+other["a"] = "4"
+out = scheduler.run_python_agent(read, pos=[ReadOnly(other), False], numOuts=2)
+print(out[0].get_value(), out[1].get_value())
+out = scheduler.run_python_agent(nested, pos=[other], numOuts=2)
+print(out[0].get_value(), out[1].get_value())
+
+conv = agentgraph.Conversation()
+conv.push_item({"role": "user", "content": "hello"})
+out = scheduler.run_python_agent(history, pos=[ReadOnly(conv)], numOuts=3)
+conv.push_item({"role": "assistant", "content": "hi"})
+print([v.get_value() for v in out], conv.size_msgs())
+
+scheduler.shutdown()
@@ -0,0 +1,51 @@
+import agentgraph
+import agentgraph.config
+import threading
+import time
+from agentgraph.exec.engine import Engine
+
+agentgraph.config.DEBUG_PATH = None
+agentgraph.config.VERBOSE = 0
+
+lock = threading.Condition()
+running = 0
+maxRunning = 0
+ran = 0
+release = threading.Event()
+
+def task(scheduler) -> list:
+    global running, maxRunning, ran
+    with lock:
+        running += 1
+        maxRunning = max(maxRunning, running)
+        lock.notify_all()
+    release.wait()
+    with lock:
+        running -= 1
+        ran += 1
+    return []
+
+model = agentgraph.MockLLMModel("answer")
+engine = Engine(concurrency=8)
+scheduler = agentgraph.get_root_scheduler(model, engine)
+scheduler.set_window_size(4)
+
+def releaser():
+    # Lets the tasks finish once the window is full and the submitter
+    # is blocked on it
+    with lock:
+        lock.wait_for(lambda: running == 4, 30)
+    deadline = time.monotonic() + 30
+    while scheduler.windowWaiters == 0 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    print("submitter blocked:", scheduler.windowWaiters > 0)
+    release.set()
+
+thread = threading.Thread(target=releaser)
+thread.start()
+for i in range(20):
+    scheduler.run_python_agent(task)
+thread.join()
+scheduler.shutdown()
+print("max running:", maxRunning)
+print("ran:", ran)